@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+''' Affine transforms as 6-tuples, SVG transform attributes, and decomposition into Pensool specs. '''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+"""
+Affine transforms.
+
+A transform is a tuple (a, b, c, d, e, f) as in SVG and cairo:
+x' = a*x + c*y + e
+y' = b*x + d*y + f
+
+Pensool transforms are specified as scale, then rotation, then translation
+(see Transformer.derive_transform()).
+decompose() returns those specs, and whether the transform also skews,
+which the specs cannot represent.
+
+Plain tuples, without cairo, so an importer can parse without a context.
+
+To test: python -m doctest -v base/affine.py
+
+>>> parse("translate(10, 20) scale(2)")
+(2.0, 0.0, 0.0, 2.0, 10.0, 20.0)
+>>> parse("")
+(1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+>>> [round(value, 9) for value in apply(parse("rotate(90)"), 1, 0)]
+[0.0, 1.0]
+>>> [round(value, 9) for value in apply(parse("rotate(90, 1, 1)"), 1, 0)]
+[2.0, 1.0]
+
+# Rightmost transform is applied first
+>>> apply(parse("translate(10,0) scale(2,3)"), 1, 1)
+(12.0, 3.0)
+>>> apply(parse("matrix(1 0 0 1 5 6)"), 0, 0)
+(5.0, 6.0)
+
+>>> tx, ty, sx, sy, rotation, skewed = decompose(parse("translate(10,20) rotate(90) scale(2,3)"))
+>>> (tx, ty, round(sx, 6), round(sy, 6), round(rotation, 6), skewed)
+(10.0, 20.0, 2.0, 3.0, 1.570796, False)
+>>> decompose(parse("skewX(30)"))[5]
+True
+>>> parse("frobnicate(1)")
+Traceback (most recent call last):
+...
+ValueError: Unknown transform frobnicate
+>>> parse("translate()")
+Traceback (most recent call last):
+...
+ValueError: Wrong count of arguments of translate: 0
+"""
+
+import math
+import re
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+_COMMAND = re.compile(r'(\w+)\s*\(([^)]*)\)')
+_NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_ARGUMENT_COUNTS = {'matrix': (6,), 'translate': (1, 2), 'scale': (1, 2), 'rotate': (1, 3),
+  'skewX': (1,), 'skewY': (1,)}
+
+
+def multiply(first, second):
+  ''' Return transform applying second, then first (as SVG lists them: first second.) '''
+  a1, b1, c1, d1, e1, f1 = first
+  a2, b2, c2, d2, e2, f2 = second
+  return (a1*a2 + c1*b2, b1*a2 + d1*b2,
+    a1*c2 + c1*d2, b1*c2 + d1*d2,
+    a1*e2 + c1*f2 + e1, b1*e2 + d1*f2 + f1)
+
+
+def apply(transform, x, y):
+  ''' Return point x, y transformed. '''
+  a, b, c, d, e, f = transform
+  return (a*x + c*y + e, b*x + d*y + f)
+
+
+def numbers(text):
+  ''' Return list of floats in text, e.g. an SVG list of numbers. '''
+  return [float(number) for number in _NUMBER.findall(text)]
+
+
+def _command(name, args):
+  if name not in _ARGUMENT_COUNTS:
+    raise ValueError("Unknown transform " + name)
+  if len(args) not in _ARGUMENT_COUNTS[name]:
+    raise ValueError("Wrong count of arguments of %s: %d" % (name, len(args)))
+  if name == 'matrix':
+    return tuple(args)
+  if name == 'translate':
+    return (1.0, 0.0, 0.0, 1.0, args[0], args[1] if len(args) > 1 else 0.0)
+  if name == 'scale':
+    return (args[0], 0.0, 0.0, args[1] if len(args) > 1 else args[0], 0.0, 0.0)
+  if name == 'rotate':
+    angle = math.radians(args[0])
+    cos, sin = math.cos(angle), math.sin(angle)
+    rotation = (cos, sin, -sin, cos, 0.0, 0.0)
+    if len(args) == 3: # About a center
+      return multiply(multiply((1.0, 0.0, 0.0, 1.0, args[1], args[2]), rotation),
+        (1.0, 0.0, 0.0, 1.0, -args[1], -args[2]))
+    return rotation
+  if name == 'skewX':
+    return (1.0, 0.0, math.tan(math.radians(args[0])), 1.0, 0.0, 0.0)
+  # skewY
+  return (1.0, math.tan(math.radians(args[0])), 0.0, 1.0, 0.0, 0.0)
+
+
+def parse(text):
+  ''' Return transform of an SVG transform attribute.  Raise ValueError if malformed. '''
+  result = IDENTITY
+  for name, args in _COMMAND.findall(text):
+    result = multiply(result, _command(name, numbers(args)))
+  return result
+
+
+def decompose(transform):
+  '''
+  Return (translation x, y, scale x, y, rotation, skewed) of transform.
+  If skewed, the specs approximate the transform.
+  '''
+  a, b, c, d, e, f = transform
+  scale_x = math.hypot(a, b)
+  if scale_x == 0:
+    return (e, f, 0.0, 0.0, 0.0, True)
+  rotation = math.atan2(b, a)
+  scale_y = (a*d - b*c) / scale_x
+  skewed = abs(a*c + b*d) > 1e-9 * scale_x * max(abs(scale_y), 1.0)
+  return (e, f, scale_x, scale_y, rotation, skewed)
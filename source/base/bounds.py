@@ -142,6 +142,18 @@ class Bounds(object):
   (2.0,2.0)
   (1.0,2.0)
   
+  # region tests: inside, and overlap (sharing only an edge does not overlap)
+  >>> Bounds(1,1,1,1).is_inside(Bounds(0,0,3,3))
+  True
+  >>> Bounds(1,1,3,3).is_inside(Bounds(0,0,3,3))
+  False
+  >>> Bounds(1,1,3,3).is_overlap(Bounds(0,0,3,3))
+  True
+  >>> Bounds(3,0,1,1).is_overlap(Bounds(0,0,3,3))
+  False
+  >>> Bounds().is_inside(Bounds(0,0,3,3)) or Bounds().is_overlap(Bounds(0,0,3,3))
+  False
+
   # generate sides
   >>> for side in Bounds(1,1,1,1).sides(): side
   ((1.0,1.0), (2.0,1.0))
@@ -261,6 +273,26 @@ class Bounds(object):
       and point.y <= (self.y + self.height)
     
     
+  def is_inside(self, bounds):
+    ''' Return boolean whether self lies wholly within bounds.  A null bounds is inside nothing. '''
+    if self.is_null():
+      return False
+    return self.x >= bounds.x \
+      and self.y >= bounds.y \
+      and self.x + self.width <= bounds.x + bounds.width \
+      and self.y + self.height <= bounds.y + bounds.height
+
+
+  def is_overlap(self, bounds):
+    ''' Return boolean whether self and bounds share some area.  A null bounds overlaps nothing. '''
+    if self.is_null() or bounds.is_null():
+      return False
+    return self.x < bounds.x + bounds.width \
+      and bounds.x < self.x + self.width \
+      and self.y < bounds.y + bounds.height \
+      and bounds.y < self.y + self.height
+
+
   def from_context_stroke(self, context):
     '''
     Get the DCS bounds of the path in the graphics context.
@@ -23,7 +23,7 @@ class Command(object):
   '''
   Pattern: Command.
   Disconnects most gui code from app logic.
-  Also supports Undo?
+  Undo is not by commands, but by history of changes to the model: see history.py.
   Note callables should usually be defined (..., *args)
   as call time args may vary.
   '''
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+''' Spatial hash: index of items by rectangular bounds, on a uniform grid. '''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+"""
+Spatial hash.
+
+An item is inserted with its bounds (any object with x, y, width, height)
+into every cell of the grid its bounds overlap.
+A query of a rectangle returns items in the cells the rectangle overlaps:
+a superset of items whose bounds intersect the rectangle.
+Callers refine candidates by exact distance.
+
+A grid may have a clip rectangle: bounds are clipped to it when inserted,
+so a huge item costs no more cells than the clip,
+and an item outside the clip is not inserted.  Queries outside the clip find nothing.
+
+Good for many small items of similar size, e.g. edges of morphs in DCS.
+
+To test: python -m doctest -v base/grid.py
+
+Examples:
+
+>>> import collections
+>>> Rect = collections.namedtuple('Rect', 'x y width height')
+>>> grid = SpatialHash(10)
+>>> grid.insert("a", Rect(0, 0, 5, 5))
+True
+>>> grid.insert("b", Rect(25, 25, 30, 5))
+True
+>>> len(grid)
+2
+>>> grid.query(1, 1, 2, 2)
+['a']
+>>> grid.query(0, 0, 30, 30)
+['a', 'b']
+
+# Items spanning many cells are returned once
+>>> grid.query(20, 20, 60, 40)
+['b']
+>>> grid.query(100, 100, 110, 110)
+[]
+
+# Removing an item removes it from all its cells
+>>> grid.remove("b")
+>>> grid.query(0, 0, 60, 60), len(grid)
+(['a'], 1)
+
+# Clipped: a huge item takes only the cells of the clip
+>>> clipped = SpatialHash(10, (0, 0, 99, 99))
+>>> clipped.insert("huge", Rect(-100000, -100000, 200000, 200000))
+True
+>>> len(clipped.cells)
+100
+>>> clipped.insert("outside", Rect(500, 500, 5, 5))
+False
+"""
+
+import math
+
+
+class SpatialHash(object):
+  ''' Uniform grid of cells, each a list of items overlapping it. '''
+
+  def __init__(self, cell_size, clip=None):
+    self.cell_size = float(cell_size)
+    self.cells = {}  # (column, row) -> list of items
+    self.spans = {}  # id(item) -> (first column, last column, first row, last row)
+    if clip is not None:
+      clip = self._span(*clip)
+    self.clip = clip  # span of cells of the clip rectangle (minx, miny, maxx, maxy), or None
+
+  def __len__(self):
+    return len(self.spans)
+
+  def __contains__(self, item):
+    return id(item) in self.spans
+
+  def _span(self, minx, miny, maxx, maxy):
+    ''' Return first and last columns and rows overlapped by rectangle. '''
+    size = self.cell_size
+    return (int(math.floor(minx / size)), int(math.floor(maxx / size)),
+      int(math.floor(miny / size)), int(math.floor(maxy / size)))
+
+  def insert(self, item, bounds):
+    ''' Index item by bounds.  Return False if not inserted: outside the clip. '''
+    first_column, last_column, first_row, last_row = self._span(bounds.x, bounds.y,
+      bounds.x + bounds.width, bounds.y + bounds.height)
+    if self.clip is not None:
+      clip_first_column, clip_last_column, clip_first_row, clip_last_row = self.clip
+      first_column = max(first_column, clip_first_column)
+      last_column = min(last_column, clip_last_column)
+      first_row = max(first_row, clip_first_row)
+      last_row = min(last_row, clip_last_row)
+      if first_column > last_column or first_row > last_row:
+        return False
+    self.remove(item)
+    for column in range(first_column, last_column + 1):
+      for row in range(first_row, last_row + 1):
+        self.cells.setdefault((column, row), []).append(item)
+    self.spans[id(item)] = (first_column, last_column, first_row, last_row)
+    return True
+
+  def remove(self, item):
+    ''' Remove item, if indexed. '''
+    span = self.spans.pop(id(item), None)
+    if span is None:
+      return
+    first_column, last_column, first_row, last_row = span
+    for column in range(first_column, last_column + 1):
+      for row in range(first_row, last_row + 1):
+        cell = self.cells[(column, row)]
+        for index, other in enumerate(cell):
+          if other is item:
+            del cell[index]
+            break
+        if not cell:
+          del self.cells[(column, row)]
+
+  def query(self, minx, miny, maxx, maxy):
+    '''
+    Return list of items in cells overlapped by rectangle, in order of insertion per cell,
+    without duplicates.
+    '''
+    first_column, last_column, first_row, last_row = self._span(minx, miny, maxx, maxy)
+    if self.clip is not None:
+      first_column = max(first_column, self.clip[0])
+      last_column = min(last_column, self.clip[1])
+      first_row = max(first_row, self.clip[2])
+      last_row = min(last_row, self.clip[3])
+    result = []
+    seen = set()
+    for column in range(first_column, last_column + 1):
+      for row in range(first_row, last_row + 1):
+        for item in self.cells.get((column, row), ()):
+          if id(item) not in seen:
+            seen.add(id(item))
+            result.append(item)
+    return result
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+''' Least recently used cache, capped by total cost (e.g. bytes.) '''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+"""
+LRU cache.
+
+Each value has a cost, e.g. an estimate of its memory.
+When the total cost exceeds the capacity, least recently used values are evicted.
+Counts hits and misses, for telemetry.
+
+To test: python -m doctest -v base/lru.py
+
+Examples:
+
+>>> cache = LRUCache(10)
+>>> cache.put("a", "A", 4)
+>>> cache.put("b", "B", 4)
+>>> cache.get("a")
+'A'
+
+# Exceeding capacity evicts least recently used: b
+>>> cache.put("c", "C", 4)
+>>> cache.get("b") is None
+True
+>>> sorted(cache.keys()), cache.cost
+(['a', 'c'], 8)
+
+>>> sorted(cache.stats().items())
+[('cost', 8), ('entries', 2), ('hit_rate', 0.5), ('hits', 1), ('misses', 1)]
+
+# A value costing more than capacity is not kept
+>>> cache.put("d", "D", 11)
+>>> "d" in cache
+False
+"""
+
+import collections
+
+
+class LRUCache(object):
+  ''' Mapping with least recently used eviction, capped by total cost. '''
+
+  def __init__(self, capacity):
+    self.capacity = capacity
+    self.entries = collections.OrderedDict()  # key -> (value, cost), most recent last
+    self.cost = 0
+    self.hits = 0
+    self.misses = 0
+
+  def __len__(self):
+    return len(self.entries)
+
+  def __contains__(self, key):
+    return key in self.entries
+
+  def keys(self):
+    return self.entries.keys()
+
+  def get(self, key, default=None):
+    ''' Return value for key, and make it most recently used; else default. '''
+    try:
+      entry = self.entries.pop(key)
+    except KeyError:
+      self.misses += 1
+      return default
+    self.entries[key] = entry
+    self.hits += 1
+    return entry[0]
+
+  def put(self, key, value, cost=1):
+    ''' Insert value, evicting least recently used values to stay within capacity. '''
+    self.discard(key)
+    if cost > self.capacity:
+      return
+    self.entries[key] = (value, cost)
+    self.cost += cost
+    while self.cost > self.capacity:
+      old_key, (old_value, old_cost) = self.entries.popitem(last=False)
+      self.cost -= old_cost
+
+  def discard(self, key):
+    entry = self.entries.pop(key, None)
+    if entry is not None:
+      self.cost -= entry[1]
+
+  def clear(self):
+    self.entries.clear()
+    self.cost = 0
+
+  def stats(self):
+    ''' Return dict of counters, for telemetry. '''
+    lookups = self.hits + self.misses
+    return {"entries" : len(self.entries),
+      "cost" : self.cost,
+      "hits" : self.hits,
+      "misses" : self.misses,
+      "hit_rate" : float(self.hits) / lookups if lookups else 0.0}
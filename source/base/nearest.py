@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+''' Geometry: nearest point on an edge.'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+"""
+Nearest point on an edge, with the tangent there.
+
+Projections of a point onto segments, polylines and circles.
+Result is a Nearest: the point on the edge, distance to it, unit tangent at it.
+Any point parameter must have .x and .y but need not be a vector.
+
+Examples:
+
+>>> origin = vector.Vector(0,0)
+>>> right = vector.Vector(2,0)
+
+# Segment: perpendicular foot, or nearer end
+>>> segment(vector.Vector(1,1), origin, right)
+Nearest(point=(1.0,0.0), distance=1.0, tangent=(1.0,0.0))
+>>> segment(vector.Vector(3,0), origin, right).point
+(2.0,0.0)
+
+# Polyline: nearest of its segments, closed joins last to first
+>>> square = [origin, right, vector.Vector(2,2), vector.Vector(0,2)]
+>>> polyline(vector.Vector(1,1.5), square, closed=True)
+Nearest(point=(1.0,2.0), distance=0.5, tangent=(-1.0,0.0))
+>>> polyline(vector.Vector(0.25,0.9), square, closed=True).point
+(0.0,0.9)
+>>> polyline(vector.Vector(0.25,0.9), square).point
+(0.25,0.0)
+
+# Circle: radial projection
+>>> circle(vector.Vector(3,0), origin, 1.0)
+Nearest(point=(1.0,0.0), distance=2.0, tangent=(-0.0,1.0))
+
+>>> nearest([None, segment(vector.Vector(3,0), origin, right)]).distance
+1.0
+>>> nearest([]) is None
+True
+"""
+
+import collections
+import base.vector as vector
+
+Nearest = collections.namedtuple('Nearest', 'point distance tangent')
+
+
+def segment(point, start, end):
+  ''' Return Nearest on segment from start to end. '''
+  start = vector.Vector(start.x, start.y)
+  direction = vector.Vector(end.x, end.y) - start
+  length_squared = direction.dot(direction)
+  offset = vector.Vector(point.x, point.y) - start
+  if length_squared == 0:
+    fraction = 0.0  # Degenerate segment is a point
+    tangent = vector.Vector(1.0, 0.0)
+  else:
+    fraction = min(1.0, max(0.0, offset.dot(direction) / float(length_squared)))
+    tangent = direction.normal()
+  on_edge = start + direction * fraction
+  return Nearest(on_edge, (vector.Vector(point.x, point.y) - on_edge).length(), tangent)
+
+
+def polyline(point, points, closed=False):
+  ''' Return Nearest on polyline through points, or None if no points. '''
+  if len(points) == 1:
+    return segment(point, points[0], points[0])
+  pairs = zip(points[:-1], points[1:])
+  if closed and len(points) > 2:
+    pairs.append((points[-1], points[0]))
+  return nearest([segment(point, start, end) for start, end in pairs])
+
+
+def circle(point, center, radius):
+  ''' Return Nearest on circle. '''
+  radial = vector.Vector(point.x - center.x, point.y - center.y)
+  if radial.length() == 0:
+    radial = vector.Vector(1.0, 0.0)  # Center is equidistant to all, choose one
+  radial = radial.normal()
+  on_edge = vector.Vector(center.x, center.y) + radial * radius
+  return Nearest(on_edge, (vector.Vector(point.x, point.y) - on_edge).length(),
+    radial.orthogonal(1))
+
+
+def nearest(candidates):
+  ''' Return the Nearest with least distance of candidates, ignoring None; or None. '''
+  result = None
+  for candidate in candidates:
+    if candidate is not None and (result is None or candidate.distance < result.distance):
+      result = candidate
+  return result
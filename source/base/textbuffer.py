@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+''' Text buffer: editable text stored by paragraph. '''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+"""
+Text buffer.
+
+Text is a list of paragraphs (strings without the newline separators.)
+Offsets of paragraphs are kept in a Fenwick (binary indexed) tree of paragraph lengths,
+so locating an offset is O(log paragraphs).
+An edit copies only the paragraph(s) it touches,
+not the whole text as with string concatenation.
+
+An edit returns a Change: which paragraphs were replaced by how many new paragraphs,
+so layout can be redone for only the changed paragraphs.
+Edits that add or remove paragraphs (i.e. newlines) rebuild the offset tree.
+
+Offsets are in characters of the string type stored (bytes for str.)
+Store unicode, so an offset is a whole character.
+
+To test: python -m doctest -v base/textbuffer.py
+
+Examples:
+
+>>> buffer = TextBuffer("Hello\\nworld")
+>>> len(buffer), buffer.paragraph_count()
+(11, 2)
+>>> buffer.locate(7)
+(1, 1)
+>>> buffer.locate(5)
+(0, 5)
+>>> buffer.insert(11, "!")
+Change(paragraph=1, removed=1, inserted=1)
+>>> str(buffer)
+'Hello\\nworld!'
+
+# Insert at the selection, not at end
+>>> buffer.insert(5, ",")
+Change(paragraph=0, removed=1, inserted=1)
+>>> buffer.paragraph(0)
+'Hello,'
+
+# Inserting a newline splits a paragraph
+>>> buffer.insert(1, "\\n")
+Change(paragraph=0, removed=1, inserted=2)
+>>> buffer.paragraphs
+['H', 'ello,', 'world!']
+>>> buffer.paragraph_start(2)
+8
+
+# Deleting a newline joins paragraphs
+>>> buffer.delete(0, 3)
+Change(paragraph=0, removed=2, inserted=1)
+>>> str(buffer)
+'llo,\\nworld!'
+>>> buffer.delete(4, 5)
+Change(paragraph=0, removed=2, inserted=1)
+>>> buffer.paragraphs
+['llo,world!']
+
+# Unicode: offsets are of characters, not bytes of an encoding
+>>> accented = TextBuffer(u"caf\xe9\nbar")
+>>> accented.delete(3, 4)
+Change(paragraph=0, removed=1, inserted=1)
+>>> unicode(accented)
+u'caf\nbar'
+
+# Empty
+>>> empty = TextBuffer()
+>>> len(empty), empty.paragraph_count(), empty.locate(0)
+(0, 1, (0, 0))
+"""
+
+import collections
+
+
+Change = collections.namedtuple('Change', 'paragraph removed inserted')
+'''
+Paragraphs [paragraph, paragraph+removed) were replaced by
+new paragraphs [paragraph, paragraph+inserted).
+'''
+
+
+class _FenwickTree(object):
+  '''
+  Binary indexed tree of integers.
+  Prefix sums and point updates in O(log n).
+  '''
+  def __init__(self, values):
+    self.size = len(values)
+    self.tree = [0] * (self.size + 1)
+    for index, value in enumerate(values):
+      self.add(index, value)
+
+  def add(self, index, delta):
+    ''' Add delta to value at index. '''
+    index += 1
+    while index <= self.size:
+      self.tree[index] += delta
+      index += index & -index
+
+  def prefix(self, count):
+    ''' Return sum of the first count values. '''
+    total = 0
+    while count > 0:
+      total += self.tree[count]
+      count -= count & -count
+    return total
+
+  def search(self, offset):
+    '''
+    Return the largest count such that prefix(count) <= offset.
+    Assumes values are not negative.
+    '''
+    count = 0
+    mask = 1
+    while mask * 2 <= self.size:
+      mask *= 2
+    while mask:
+      if count + mask <= self.size and self.tree[count + mask] <= offset:
+        count += mask
+        offset -= self.tree[count]
+      mask //= 2
+    return count
+
+
+class TextBuffer(object):
+  ''' Editable text, stored by paragraph. '''
+
+  def __init__(self, text=""):
+    self.paragraphs = text.split("\n")
+    self._rebuild()
+
+  def _rebuild(self):
+    # Length of each paragraph, counting its newline separator, except the last.
+    lengths = [len(paragraph) + 1 for paragraph in self.paragraphs]
+    lengths[-1] -= 1
+    self.offsets = _FenwickTree(lengths)
+
+  def __len__(self):
+    return self.offsets.prefix(len(self.paragraphs))
+
+  def __str__(self):
+    return "\n".join(self.paragraphs)
+
+  def __unicode__(self):
+    return u"\n".join(self.paragraphs)
+
+  def paragraph_count(self):
+    return len(self.paragraphs)
+
+  def paragraph(self, index):
+    return self.paragraphs[index]
+
+  def paragraph_start(self, index):
+    ''' Return offset of start of paragraph. '''
+    return self.offsets.prefix(index)
+
+  def locate(self, offset):
+    '''
+    Return (paragraph index, offset within paragraph) of offset in text.
+    The offset of a newline is the end of its paragraph.
+    '''
+    if offset < 0 or offset > len(self):
+      raise IndexError("Text offset out of range")
+    index = min(self.offsets.search(offset), len(self.paragraphs) - 1)
+    return index, offset - self.offsets.prefix(index)
+
+  def insert(self, offset, text):
+    ''' Insert text at offset.  Return Change. '''
+    return self.replace(offset, offset, text)
+
+  def delete(self, start, end):
+    ''' Delete text [start, end).  Return Change. '''
+    return self.replace(start, end, "")
+
+  def replace(self, start, end, text):
+    ''' Replace text [start, end) with text.  Return Change. '''
+    first, first_offset = self.locate(start)
+    last, last_offset = self.locate(max(start, end))
+    old = self.paragraphs[first]
+    new = self.paragraphs[first][:first_offset] + text + self.paragraphs[last][last_offset:]
+    removed = last - first + 1
+    if removed == 1 and "\n" not in text:
+      # Common case: typing within a paragraph.  Only one length changes.
+      self.paragraphs[first] = new
+      self.offsets.add(first, len(new) - len(old))
+      return Change(first, 1, 1)
+    new_paragraphs = new.split("\n")
+    self.paragraphs[first:last + 1] = new_paragraphs
+    self._rebuild()
+    return Change(first, removed, len(new_paragraphs))
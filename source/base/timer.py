@@ -20,9 +20,14 @@ class Timer(object):
   ''' Timer is repeating, periodic until canceled or until callback returns False. '''
   def __init__(self):
     self.timer_id = None
+    self.interval = None
+    self.callback = None
     
   def start(self, time, callback):
     # in milliseconds
+    # Remember interval and callback, so a replayer can fire timer in virtual time
+    self.interval = time
+    self.callback = callback
     self.timer_id = gobject.timeout_add(time, callback)
     
   def cancel(self):
@@ -38,3 +43,34 @@ class Timer(object):
     Could be a race between a cancel and timeout.
     '''
     return self.timer_id is None
+
+
+class Idler(object):
+  '''
+  Idle callback.  Wraps gobject idle source.
+  Callback is called repeatedly whenever the main loop is idle,
+  until canceled or until callback returns False.
+  Input events have higher priority, so they preempt an idler between calls.
+  '''
+  def __init__(self):
+    self.idle_id = None
+    self.callback = None
+    
+  def start(self, callback):
+    self.cancel()
+    self.callback = callback
+    self.idle_id = gobject.idle_add(self._idle_cb)
+    
+  def _idle_cb(self):
+    keep = self.callback()
+    if not keep:
+      self.idle_id = None
+    return keep
+    
+  def cancel(self):
+    if self.idle_id:
+      gobject.source_remove(self.idle_id)
+      self.idle_id = None
+      
+  def is_running(self):
+    return self.idle_id is not None
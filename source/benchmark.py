@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+
+'''
+Latency benchmark: replay recorded GUI sessions against a large synthetic document.
+
+Replays the usecases recorded by Pyusecase for Texttest (see test/functional/pensool)
+on a HeadlessViewPort, as fast as possible (not at recorded speed.)
+For each injected event, measures latency from injecting the event
+until the resulting expose has completed.
+Reports per-scenario p50/p95/p99 latency in mSec.
+
+Timers (e.g. the pointer timer that pops up handle menus) are fired in virtual time:
+when the recorded time between two events exceeds a running timer's interval,
+the timer fires before the next event is injected.
+Timer firings are measured like events, named after the timer's owner.
+
+Scenarios that need dialogs (e.g. file choosers) cannot run without a display
+and are reported as skipped.
+
+Each scenario runs in a fresh process, since the app has singletons.
+
+Usage:
+  python benchmark.py [options] [directory of usecases]
+
+Examples:
+  python benchmark.py ../test/functional/pensool
+  python benchmark.py --count 10000 --save baseline.json ../test/functional/pensool
+  python benchmark.py --compare baseline.json ../test/functional/pensool
+
+With --compare, exit status is nonzero if any scenario's p95 regressed beyond tolerance.
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import os
+import sys
+import time
+import json
+import optparse
+import subprocess
+import ConfigParser
+
+USECASE_FILENAME = "usecase.pensool"
+UI_MAP_PATH = os.path.join("pyusecase_files", "ui_map.conf")
+DEFAULT_USECASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+  "..", "test", "functional", "pensool")
+
+# Usecase names not mapped to a signal on the drawing area, but still replayable.
+CLOSE_EVENT = "CloseWin"
+
+
+class ReplayEvent(object):
+  '''
+  Stand-in for a gdk.Event, with the attributes that controls read.
+  Adapts a usecase command to a toolkit event, like customwidgetevents.py does for Pyusecase.
+  '''
+  def __init__(self, signal, args):
+    from gtk import gdk
+    self.x = self.y = 0.0
+    self.time = 0
+    self.button = 0
+    self.state = 0  # No modifier keys
+    self.direction = None
+    self.keyval = 0
+    self.string = ""
+    if signal == "configure-event":
+      self.x, self.y, self.width, self.height = args[:4]
+    elif args:
+      # !!! gtk wants float for pixel coords
+      self.x = float(args[0])
+      self.y = float(args[1])
+      self.time = args[2]
+      if signal == "scroll-event":
+        # Encoding from customwidgetevents.ScrollEvent
+        if args[3] == 2:
+          self.direction = gdk.SCROLL_UP
+        else:
+          self.direction = gdk.SCROLL_DOWN
+      elif len(args) > 3:
+        self.button = args[3]
+
+
+def read_ui_map(usecase_dir):
+  '''
+  Return dict usecase name -> signal name for the drawing area,
+  from the Pyusecase ui map of the test suite.
+  '''
+  parser = ConfigParser.RawConfigParser()
+  parser.read(os.path.join(usecase_dir, UI_MAP_PATH))
+  names = {}
+  if parser.has_section("Type=DrawingArea"):
+    for signal, name in parser.items("Type=DrawingArea"):
+      names[name] = signal
+  return names
+
+
+def read_usecase(path):
+  ''' Return list of (name, int args) from a usecase file. '''
+  commands = []
+  for line in open(path):
+    words = line.split()
+    if words:
+      commands.append((words[0], [int(word) for word in words[1:]]))
+  return commands
+
+
+def find_scenarios(usecase_dir):
+  ''' Return sorted list of (scenario name, usecase path) under usecase_dir. '''
+  scenarios = []
+  for dirpath, dirnames, filenames in os.walk(usecase_dir):
+    if USECASE_FILENAME in filenames:
+      name = os.path.relpath(dirpath, usecase_dir)
+      scenarios.append((name, os.path.join(dirpath, USECASE_FILENAME)))
+  return sorted(scenarios)
+
+
+def make_synthetic_doc(count, width=400, height=400):
+  '''
+  Append count morphs to the model, tiled over width and height.
+  Mixed kinds: rect, circle, line and every tenth a text.
+  '''
+  import collections
+  import math
+  import config
+  import morph.morph
+  import morph.textmorph
+  Rectangle = collections.namedtuple('Rectangle', 'x y width height')
+
+  per_row = max(1, int(math.sqrt(count)))
+  cell = float(max(width, height)) / per_row
+  kinds = (morph.morph.RectMorph, morph.morph.CircleMorph, morph.morph.LineMorph)
+  for index in range(count):
+    row, column = divmod(index, per_row)
+    if index % 10 == 9:
+      a_morph = morph.textmorph.TextMorph("Synthetic text " + str(index))
+    else:
+      a_morph = kinds[index % len(kinds)]()
+    config.scheme.model.append(a_morph)
+    a_morph.set_dimensions(Rectangle(column * cell / config.PENSOOL_UNIT,
+      row * cell / config.PENSOOL_UNIT,
+      cell * 0.8 / config.PENSOOL_UNIT,
+      cell * 0.8 / config.PENSOOL_UNIT))
+
+
+def _run_pending():
+  ''' Run any due main loop sources (idle callbacks, due timers), without blocking. '''
+  import gobject
+  context = gobject.main_context_default()
+  while context.pending():
+    context.iteration(False)
+
+
+def _timers():
+  ''' Return list of (name, timer) for timers the replayer fires in virtual time. '''
+  import gui.manager.pointer
+  import gui.manager.fade
+  import config
+  return [("PointerTimer", gui.manager.pointer.pointer_timer),
+    ("FadeTimer", gui.manager.fade.fade_timer),
+    ("ZoomTimer", config.viewport.zoom_timer)]
+
+
+def replay_scenario(usecase_path, usecase_dir, count, width, height):
+  '''
+  Replay one scenario in this process.
+  Return dict: scenario results, with latencies in mSec by event name.
+  '''
+  names = read_ui_map(usecase_dir)
+  commands = read_usecase(usecase_path)
+  unreplayable = sorted(set([name for name, args in commands
+    if name not in names and name != CLOSE_EVENT]))
+  if unreplayable:
+    return {"skipped" : "needs dialogs or unmapped events: " + ", ".join(unreplayable)}
+
+  import pensool
+  view = pensool.build_headless_app(width, height)
+  make_synthetic_doc(count, width, height)
+  view.invalidate()
+  view.expose()
+
+  latencies = {}
+  def measure(name, func):
+    start = time.time()
+    func()
+    _run_pending()
+    view.expose()
+    latencies.setdefault(name, []).append((time.time() - start) * 1000)
+
+  previous_time = None
+  for name, args in commands:
+    if name == CLOSE_EVENT:
+      break
+    signal = names[name]
+    event = ReplayEvent(signal, args)
+
+    # Fire timers that would have fired between recorded events
+    if previous_time is not None and event.time:
+      gap = event.time - previous_time
+      for timer_name, timer in _timers():
+        while not timer.was_canceled() and gap >= timer.interval:
+          def fire():
+            if not timer.callback():
+              timer.cancel()
+          measure(timer_name, fire)
+          gap -= timer.interval
+    if event.time:
+      previous_time = event.time
+
+    measure(name, lambda: view.da.emit(signal, event))
+  return {"latencies" : latencies}
+
+
+def summarize(latencies):
+  ''' Return dict of count and p50/p95/p99 over all latencies, and by event name. '''
+  import telemetry
+  def percentiles(values):
+    return {"count" : len(values),
+      "p50" : telemetry.percentile(values, 0.50),
+      "p95" : telemetry.percentile(values, 0.95),
+      "p99" : telemetry.percentile(values, 0.99)}
+  result = {"all" : percentiles(sum(latencies.values(), []))}
+  for name, values in latencies.items():
+    result[name] = percentiles(values)
+  return result
+
+
+def run_all(usecase_dir, options):
+  ''' Run each scenario in a subprocess.  Return dict scenario name -> summary or skip. '''
+  results = {}
+  for name, path in find_scenarios(usecase_dir):
+    if options.scenario and options.scenario not in name:
+      continue
+    command = [sys.executable, os.path.abspath(__file__), "--child", path,
+      "--count", str(options.count),
+      "--width", str(options.width), "--height", str(options.height), usecase_dir]
+    output = subprocess.Popen(command, stdout=subprocess.PIPE).communicate()[0]
+    # The child's result is its last line, after any logging
+    lines = output.strip().splitlines()
+    try:
+      result = json.loads(lines[-1])
+    except (IndexError, ValueError):
+      result = {"skipped" : "replay failed"}
+    if "latencies" in result:
+      result = summarize(result["latencies"])
+    results[name] = result
+  return results
+
+
+def report(results, baseline=None, tolerance=1.0):
+  ''' Print table of results.  Return list of regressed scenario names. '''
+  regressed = []
+  print "%-32s %7s %9s %9s %9s" % ("scenario", "events", "p50 mSec", "p95 mSec", "p99 mSec")
+  for name in sorted(results.keys()):
+    result = results[name]
+    if "skipped" in result:
+      print "%-32s skipped: %s" % (name, result["skipped"])
+      continue
+    summary = result["all"]
+    line = "%-32s %7d %9.2f %9.2f %9.2f" % (name, summary["count"],
+      summary["p50"], summary["p95"], summary["p99"])
+    if baseline and name in baseline and "all" in baseline[name]:
+      limit = baseline[name]["all"]["p95"] * tolerance
+      if summary["p95"] > limit:
+        line += "  REGRESSED (baseline p95 %.2f)" % baseline[name]["all"]["p95"]
+        regressed.append(name)
+    print line
+  return regressed
+
+
+def main():
+  parser = optparse.OptionParser(usage="%prog [options] [usecase directory]")
+  parser.add_option("--count", type="int", default=2000, help="morphs in synthetic document")
+  parser.add_option("--width", type="int", default=400)
+  parser.add_option("--height", type="int", default=400)
+  parser.add_option("--scenario", help="only scenarios whose name contains this")
+  parser.add_option("--save", help="save results as JSON to this file")
+  parser.add_option("--compare", help="compare to results saved in this file")
+  parser.add_option("--tolerance", type="float", default=1.25,
+    help="ratio of p95 to baseline p95 counted as a regression")
+  parser.add_option("--child", help=optparse.SUPPRESS_HELP)
+  options, args = parser.parse_args()
+  usecase_dir = args[0] if args else DEFAULT_USECASE_DIR
+
+  if options.child:
+    result = replay_scenario(options.child, usecase_dir, options.count,
+      options.width, options.height)
+    print json.dumps(result)
+    return 0
+
+  results = run_all(usecase_dir, options)
+  baseline = None
+  if options.compare:
+    baseline = json.load(open(options.compare))
+  regressed = report(results, baseline, options.tolerance)
+  if options.save:
+    json.dump(results, open(options.save, "w"), indent=1)
+  return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,166 @@
+'''
+Bulk operations: query the morphs in a region, and alter many morphs at once.
+
+Ordinarily the user alters one morph at a time, the focused operand (see gui.manager.focus).
+Here a region query (e.g. of a rubber band, a shift drag in the background, see gui.backgroundcontrol) yields many morphs,
+and a bulk operation alters them all as one batch.
+The specs of each morph are altered directly, not by its view_altering methods
+(which would each invalidate, computing bounds on their own context, and begin and end a change of history.)
+Then one union of the morphs' bounds as drawn and as will be drawn is invalidated once,
+and the changes are one step of undo history (see decorators.batched.)
+
+A region is a Bounds in DCS.
+A query compares it to the bounds of morphs as last drawn.
+Only the members of a group are queried, not their members:
+altering a group and also its members would alter the members twice.
+
+To test:
+python -m doctest -v bulk.py
+
+Examples:
+
+  >>> import pensool, history
+  >>> view = pensool.build_headless_app(400, 400)
+  >>> pensool.make_test_doc()
+  >>> view.invalidate()
+  >>> view.expose() is not None
+  True
+  >>> history.clear()
+  
+  # All the morphs of the test document
+  >>> morphs = region(bounds.Bounds(0, 0, 400, 400))
+  >>> len(morphs) == len(config.scheme.model)
+  True
+  >>> region(bounds.Bounds(390, 390, 10, 10))
+  []
+  
+  # Moving them all invalidates once, the union of where they were and will be
+  >>> drawn = reduce(lambda b1, b2: b1.union(b2), [member.bounds for member in morphs])
+  >>> view.surface.clear()
+  >>> move(morphs, vector.Vector(10, 0))
+  >>> len(view.surface.rects)
+  1
+  >>> damage = bounds.Bounds().from_rect(view.surface.rects[0])
+  >>> drawn.is_inside(damage), damage.x + damage.width > drawn.x + drawn.width
+  (True, True)
+  
+  # One step of undo history
+  >>> history.undo(), history.can_undo()
+  (True, False)
+  >>> history.redo()
+  True
+  
+  >>> restyle(morphs, no_such_attribute=1)
+  Traceback (most recent call last):
+  ...
+  AttributeError: Style has no attribute no_such_attribute
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import base.vector as vector
+import base.bounds as bounds
+import morph.morph
+import history
+import config
+from decorators import *
+
+
+def region(rect, group=None, inside=False):
+  '''
+  Return list of morphs of group (default the model) in region rect (Bounds in DCS.)
+  If inside, morphs whose bounds lie wholly inside rect, else whose bounds overlap rect.
+  '''
+  if group is None:
+    group = config.scheme.model
+  if inside:
+    test = lambda bounds: bounds.is_inside(rect)
+  else:
+    test = lambda bounds: bounds.is_overlap(rect)
+  return [member for member in group
+    if isinstance(member, morph.morph.Morph) and test(member.bounds)]
+
+
+@batched
+def move(morphs, offset):
+  ''' Translate morphs by offset (a vector in DCS.) '''
+  origin = vector.Vector(0, 0)
+  def alter(member):
+    # Offset in each morph's group coordinates
+    member.translation += member.device_to_local(offset) - member.device_to_local(origin)
+    member.derive_transform()
+  _alter(morphs, alter)
+
+
+@batched
+def scale(morphs, delta):
+  ''' Scale morphs uniformly by the scalar delta, each on its own origin. '''
+  def alter(member):
+    member.scale *= delta
+    member.derive_transform()
+  _alter(morphs, alter)
+
+
+@batched
+def restyle(morphs, **attributes):
+  '''
+  Set style attributes of morphs, e.g. restyle(morphs, color=(1,0,0), filled=True).
+  Raises AttributeError on an attribute a Style does not have.
+  '''
+  for name in attributes:
+    for member in morphs:
+      if not hasattr(member.style, name):
+        raise AttributeError("Style has no attribute " + name)
+  def alter(member):
+    for name, value in attributes.items():
+      setattr(member.style, name, value)
+  _alter(morphs, alter)
+
+
+def _alter(morphs, alter):
+  '''
+  Alter each of morphs by alter(morph), which changes its specs directly.
+  Record the changes in history, and invalidate the union of their bounds before and after, once.
+  '''
+  damage = bounds.Bounds()
+  for member in morphs:
+    before = history.specs(member)
+    damage = damage.union(member.bounds)  # As drawn
+    alter(member)
+    history.record_change(member, before)
+  damage = damage.union(_will_draw_bounds(morphs))
+  if not damage.is_null():
+    config.viewport.invalidate_rect(damage.to_rect())
+
+
+def _will_draw_bounds(morphs):
+  '''
+  Return union of the bounds (DCS) of morphs as they will be drawn.
+  Like Drawable.invalidate_will_draw(), but the paths of all morphs of a group
+  are put to one context, and stroke extents are computed once per group.
+  '''
+  groups = [] # (parent, members), compared by identity
+  for member in morphs:
+    for parent, members in groups:
+      if parent is member.parent:
+        members.append(member)
+        break
+    else:
+      groups.append((member.parent, [member]))
+  union = bounds.Bounds()
+  for parent, members in groups:
+    context = config.viewport.user_context()
+    parent.style.put_to(context)
+    context.transform(parent.retained_transform)
+    for member in members:
+      member.put_path_to(context)
+    union = union.union(members[0].get_stroke_bounds(context))
+  return union
@@ -36,6 +36,11 @@ import transformer
 import style
 from decorators import *
 import base.bounds as bounds
+import base.nearest as nearest
+import telemetry
+import config
+import history
+import lod
 
 
 
@@ -82,6 +87,12 @@ class Composite(list, transformer.Transformer):
       self.parent = None
     else:
       self.parent = parent
+    self.local_extents = None # extents in my coords when last drawn in full.  See lod.py
+    
+  
+  def __setstate__(self, state):
+    transformer.Transformer.__setstate__(self, state)
+    self.local_extents = None
     
   
   def append(self, item):
@@ -91,6 +102,30 @@ class Composite(list, transformer.Transformer):
     '''
     item.parent = self
     list.append(self, item)
+    self.members_changed()
+    
+  def remove(self, item):
+    list.remove(self, item)
+    self.members_changed()
+    
+  def __delitem__(self, index):
+    list.__delitem__(self, index)
+    self.members_changed()
+    
+  def __delslice__(self, start, end):
+    list.__delslice__(self, start, end)
+    self.members_changed()
+    
+  def members_changed(self):
+    '''
+    Members were inserted or removed.
+    Forget extents (see lod.py) of self and ancestors: members may lie outside them.
+    '''
+    composite = self
+    while composite is not None:
+      composite.local_extents = None
+      # Unpickling appends members before it sets the parent
+      composite = composite.parent if '_parent' in composite.__dict__ else None
   
   
   def get_parent(self):
@@ -108,7 +143,23 @@ class Composite(list, transformer.Transformer):
     Note this is standard hierarchal modeling:
     apply my transform to the current transform matrix of the context (CTM).
     '''
+    telemetry.frames.visited += 1
     self.style.put_to(context)
+    if lod.enabled and self.local_extents is not None:
+      # Level of detail: small on device, draw less
+      size = lod.device_size(context, self.local_extents)
+      if size < config.LOD_BOX_SIZE:
+        drawn_bounds = lod.device_bounds(context, self.local_extents)
+        # Members are not walked: retain their transforms and (conservative) bounds,
+        # for picking and invalidating
+        self.retain(self.retained_transform, drawn_bounds)
+        if size < config.LOD_CULL_SIZE:
+          return bounds.Bounds()  # null, not drawn
+        minx, miny, maxx, maxy = self.local_extents
+        context.rectangle(minx, miny, maxx - minx, maxy - miny)
+        context.fill()
+        telemetry.frames.note_inked(self.bounds)
+        return self.bounds.copy()
     union_bounds = bounds.Bounds()  # null 
     for item in self:
       # !!! Each item is not necessarily in its own saved context.
@@ -117,10 +168,71 @@ class Composite(list, transformer.Transformer):
       union_bounds = union_bounds.union(item_bounds)
       # print "Matrix for item:", context.get_matrix()
     self.bounds = union_bounds
+    if lod.enabled and not union_bounds.is_null():
+      self.local_extents = lod.local_extents(context, union_bounds)
     # !!! Note empty composites return null bounds
     return self.bounds.copy() # TODO return union_bounds to save a copy
- 
+
+
+  def draw_steps(self, context):
+    '''
+    Incremental draw: generator version of draw(), interruptible between members.
+    Yields None after each primitive member drawn, finally yields my bounds in DCS.
+    Caller may abandon (close) the generator at any yield: the context is restored.
+    A composite that is small on the device (see lod.py),
+    or whose class overrides draw() (e.g. a symbol instance), is drawn in one step.
+    '''
+    if type(self).draw.im_func is not Composite.draw.im_func or self._is_lod_small(context):
+      yield self.draw(context)
+      return
+    context.save()
+    try:
+      self.put_transform_to(context)
+      telemetry.frames.visited += 1
+      self.style.put_to(context)
+      union_bounds = bounds.Bounds()  # null
+      for item in self:
+        for item_bounds in item.draw_steps(context):
+          if item_bounds is None:
+            yield None
+        union_bounds = union_bounds.union(item_bounds)
+        yield None
+      self.bounds = union_bounds
+      if lod.enabled and not union_bounds.is_null():
+        self.local_extents = lod.local_extents(context, union_bounds)
+    finally:
+      context.restore()
+    yield self.bounds.copy()
+
+
+  def _is_lod_small(self, context):
+    ''' Whether draw() would cull me or draw me as a box.  See draw(). '''
+    if not lod.enabled or self.local_extents is None:
+      return False
+    context.save()
+    self.put_transform_to(context)
+    size = lod.device_size(context, self.local_extents)
+    context.restore()
+    return size < config.LOD_BOX_SIZE
+
   
+  def retain(self, matrix, drawn_bounds=None):
+    '''
+    Set retained transforms of self and composite members, as a draw would,
+    given my device transform matrix.  For callers that draw without walking me.
+    If drawn_bounds (in DCS), it is also the bounds of self and all members:
+    e.g. when drawn as a box (see draw()), members lie within the box.
+    '''
+    self.retained_transform = matrix
+    if drawn_bounds is not None:
+      self.bounds = drawn_bounds.copy()
+    for member in self:
+      if isinstance(member, list):
+        member.retain(member.transform * matrix, drawn_bounds)
+      elif drawn_bounds is not None:
+        member.bounds = drawn_bounds.copy()
+        
+        
   # @dump_return
   @transforming
   def pick(self, context, point):
@@ -140,6 +252,11 @@ class Composite(list, transformer.Transformer):
     return morph
 
 
+  def nearest_edge_point(self, point):
+    ''' Return Nearest on edges of members.  See Drawable.nearest_edge_point(). '''
+    return nearest.nearest([item.nearest_edge_point(point) for item in self])
+    
+    
   # @dump_event
   @transforming
   def put_path_to(self, context):
@@ -192,12 +309,20 @@ class Composite(list, transformer.Transformer):
   
   #@dump_event
   def highlight(self, direction):
+    '''
+    Highlight (or not) my primitive morphs.
+    Tell history: copies of the model (see tilerender.py) draw the colors.
+    '''
+    self._highlight(direction)
+    history.note_change(self)
+    
+  def _highlight(self, direction):
     # TODO transform??
     if self.is_primitive():
       self.style.highlight(direction)
     else:
       for item in self:
-        item.highlight(direction)
+        item._highlight(direction)
   
   
   def rouse_feedback(self, event):
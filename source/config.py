@@ -65,3 +65,107 @@ GUI_MOVING_SLOWING_THRESHOLD = 0.1
 ZOOM_RATE = 0.5
 '''Ratio for zoom steps in and out'''
 
+
+# See telemetry.py
+TELEMETRY_WINDOW = 300
+''' Count of most recent frames summarized by frame telemetry.'''
+TELEMETRY_LOG_INTERVAL = 0
+''' Log a frame telemetry summary every this many frames.  Zero means never.'''
+
+# See gui.manager.speculate
+SPECULATIVE_PICK_SLICE = 5
+''' mSec of picking per idle slice while pointer is slowing.'''
+SPECULATIVE_PICK_DRIFT = 2
+''' pixels pointer can drift from a speculative pick before it is restarted.'''
+
+# See morph.glyphcache
+GLYPH_OUTLINE_CACHE_BYTES = 4 * 1024 * 1024
+''' Memory cap of the shared cache of outlines of laid out text.  Zero disables the cache.'''
+
+# See lod.py.  Sizes in device pixels.
+LOD_CULL_SIZE = 1
+''' Morphs smaller than this on the device are not drawn.'''
+LOD_BOX_SIZE = 4
+''' Morphs smaller than this on the device are drawn as a filled box.'''
+LOD_GREEK_TEXT_SIZE = 5
+''' Text with line height smaller than this on the device is drawn as greeked bars.'''
+
+# See ViewPort.zoom_preview()
+PROGRESSIVE_ZOOM = True
+''' Zoom shows a scaled copy of the last frame until zooming settles.'''
+PROGRESSIVE_ZOOM_SETTLE_TIME = 150
+''' mSec after last zoom step before full render.'''
+
+# See LayoutSpec.slide_follow()
+SLIDE_PROBE_DISTANCE = 2
+''' Pixels from hotspot, in direction of slide, to probe for the edge. '''
+SLIDE_PROBE_TOLERANCE = 2.5
+''' Pixels from probe the edge can be and still be followed. '''
+
+# See sprite.py
+SPRITE_CACHE_BYTES = 4 * 1024 * 1024
+''' Memory cap of the cache of pre-rendered menu items.  Zero disables the cache.'''
+SPRITE_BUCKET = 0.25
+''' Device pixels: menu items transformed within this of each other share a sprite.'''
+
+# See edgeindex.py
+EDGE_INDEX_CELL_SIZE = 32
+''' Pixels: size of cells of the spatial index of edges.'''
+EDGE_INDEX_STEP = 200
+''' Count of glyphs indexed per step of building the index in idle time.'''
+
+# See history.py
+UNDO_LIMIT = 10000
+''' Count of steps of undo history kept.'''
+
+# See morph/symbol.py
+SYMBOL_SPRITE_MIN_INSTANCES = 8
+''' Instances of a definition with at least this many instances are drawn from sprites.'''
+
+# See startup.py
+STARTUP_BUDGET = 500
+''' Milliseconds: from start to first frame.  Exceeding it is logged as a warning.'''
+STARTUP_PROFILE_LINES = 30
+''' Count of functions printed by startup profile mode.'''
+
+# See svgimport.py
+SVG_IMPORT_STEP = 100
+''' Count of SVG elements imported per step.'''
+SVG_IMPORT_SLICE = 20
+''' Milliseconds: time slice of importing in idle time, between redraws.'''
+
+# See watchdog.py
+WATCHDOG_THRESHOLD = 500
+''' Milliseconds: main loop not progressing this long is a stall, logged with the main stack.  Zero disables.'''
+WATCHDOG_HEARTBEAT = 100
+''' Milliseconds: period of the main loop heartbeat, and of the watchdog's checks.'''
+
+# See gcpolicy.py
+GC_FREEZE = True
+''' After a document loads, exempt its objects from cyclic garbage collection.'''
+GC_FROZEN_THRESHOLD = 1000
+''' Threshold of the oldest generation of the collector during a drag, where gc.freeze() does not exist.'''
+GC_PAUSE_DURING_DRAG = True
+''' Disable cyclic garbage collection during a drag.'''
+GC_DRAG_PAUSE_LIMIT = 30000
+''' mSec after which collection resumes though the drag has not ended.'''
+
+# See slicedrender.py
+SLICED_RENDER = True
+''' Draw the model of a view in idle time slices when a full draw is slow.'''
+SLICED_RENDER_THRESHOLD = 100
+''' mSec: a full draw of the model slower than this is sliced.'''
+SLICED_RENDER_SLICE = 15
+''' mSec of drawing per idle slice.'''
+SLICED_RENDER_DEADLINE = 500
+''' mSec after a sliced render first starts, it is finished without slicing, even if input continues.'''
+
+# See tilerender.py
+TILE_RENDER_WORKERS = 0
+''' Count of processes drawing tiles.  Zero means one per core.  One disables tile rendering.'''
+TILE_RENDER_THRESHOLD = 50
+''' mSec: a full redraw of a view slower than this (in one process) is drawn in tiles.'''
+TILE_SIZE = 128
+''' Pixels: width and height of a tile.'''
+TILE_RENDER_TIMEOUT = 10
+''' Seconds to wait for a tile before giving up on tile rendering.'''
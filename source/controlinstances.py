@@ -1,5 +1,10 @@
 '''
 Build control instances for the app.
+
+At startup, only the background control is built, so the window appears
+and accepts input early.
+Menus are built on first open: get them by handle_menu(), document_handle_menu(), document_menu().
+The printer and file ports, and their machinery, are built on first use by a menu item.
 '''
 
 '''
@@ -13,142 +18,182 @@ the Free Software Foundation, either version 3 of the License, or
 (at your option) any later version.
 '''
 
-import gui.menutraditional
-import gui.menuhandle
-import gui.itemmenu
-import gui.itemhandleline
-import gui.itemhandlecoords
 import gui.backgroundcontrol
 import base.command as command
+import config
 import edit
+import history
+import scenestats
+import startup
 
-handle_menu = None
-document_handle_menu = None
 bkgd_control = None
-document_menu = None
-
-
-def build_all(a_printerport, a_fileport):
-  global document_menu
-  
-  # Menu items
-  build_traditional_items(a_printerport, a_fileport)
-  
-  # Context menus of traditional menu style
-  edit_menu = build_edit_menu(a_printerport, a_fileport)
-  document_menu = build_document_menu(a_printerport, a_fileport)
-  resize_menu = build_dummy_menu(resize_mi)
-  draw_menu = build_dummy_menu(draw_mi)
-
-  # Handle menu type
-  global handle_menu
-  handle_menu = build_handle_menu(edit_menu, resize_menu, draw_menu)
-  global document_handle_menu
-  document_handle_menu = build_document_handle_menu(edit_menu, resize_menu, draw_menu)
+_menus = {} # name -> menu, built on first open
+_ports = {} # name -> output port, built on first use
 
-  # Control for the document, the background
+
+def build_all():
+  ''' Build the controls needed at startup. '''
   global bkgd_control
-  bkgd_control = gui.backgroundcontrol.BackgroundControl(a_printerport, a_fileport)
+  # Control for the document, the background
+  bkgd_control = gui.backgroundcontrol.BackgroundControl()
   # Controls self?? bkgd_control.set_controlee(document)
-  
 
-def build_traditional_items(printerport, fileport):
-  '''
-  Menu items represent functionality.
-  Their functionality (commands) can be in many menus,
-  but items themselves must be in only one menu,
-  since items call on their unique parent.
-  TODO: arranged by preference or dynamically?
-  '''
-  # menu_item = gui.itemmenu.IconMenuItem( command.NULL_COMMAND )
-  global save_mi, print_mi
-  global cut_mi, copy_mi, paste_mi
-  global doc_cut_mi, doc_copy_mi, doc_paste_mi
-  global resize_mi, draw_mi
-  
-  save_mi = gui.itemmenu.TextMenuItem("Save", command.Command(fileport.do_save))
-  print_mi = gui.itemmenu.TextMenuItem("Print", command.Command(printerport.do_print))
-  
-  # TODO share commands
-  cut_mi = gui.itemmenu.TextMenuItem("Cut", command.Command(edit.do_cut))
-  copy_mi = gui.itemmenu.TextMenuItem("Copy", command.Command(edit.do_copy))
-  paste_mi = gui.itemmenu.TextMenuItem("Paste", command.Command(edit.do_paste))
-  
-  doc_cut_mi = gui.itemmenu.TextMenuItem("Cut", command.Command(edit.do_cut))
-  doc_copy_mi = gui.itemmenu.TextMenuItem("Copy", command.Command(edit.do_copy))
-  doc_paste_mi = gui.itemmenu.TextMenuItem("Paste", command.Command(edit.do_paste))
-  
-  resize_mi = gui.itemmenu.TextMenuItem("Resize TODO", command.NULL_COMMAND)
-  draw_mi = gui.itemmenu.TextMenuItem("Draw TODO", command.NULL_COMMAND)
-
-
-def build_handle_menu(edit_menu, resize_menu, draw_menu):
+
+def _menu(name, builder):
+  ''' Return menu of name, built by builder on first open. '''
+  menu = _menus.get(name)
+  if menu is None:
+    menu = builder()
+    _menus[name] = menu
+    startup.mark("menu " + name)
+  return menu
+
+
+def handle_menu():
+  return _menu("handle", build_handle_menu)
+
+def document_handle_menu():
+  return _menu("document handle", build_document_handle_menu)
+
+def document_menu():
+  return _menu("document", build_document_menu)
+
+def edit_menu():
+  return _menu("edit", build_edit_menu)
+
+
+def printer_port():
+  ''' Return the printer port, importing the print machinery on first use. '''
+  if "printer" not in _ports:
+    import outport
+    _ports["printer"] = outport.PrinterPort()
+    _ports["printer"].set_model(config.scheme.model)
+  return _ports["printer"]
+
+def file_port():
+  ''' Return the file port, importing the export machinery on first use. '''
+  if "file" not in _ports:
+    import outport
+    _ports["file"] = outport.FilePort()
+    _ports["file"].set_model(config.scheme.model)
+  return _ports["file"]
+
+
+def do_save(*args):
+  file_port().do_save(*args)
+
+def do_print(*args):
+  printer_port().do_print(*args)
+
+def do_import(*args):
+  file_port().do_import(*args)
+
+def do_cancel_import(*args):
+  # Without building the file port: no port, no import
+  if "file" in _ports:
+    _ports["file"].cancel_import(*args)
+
+
+'''
+Menu items represent functionality.
+Their functionality (commands) can be in many menus,
+but items themselves must be in only one menu,
+since items call on their unique parent.
+So each builder makes its own items.
+TODO: arranged by preference or dynamically?
+'''
+
+def build_handle_menu():
   '''
   Handle menu that pops up on edges of graphic symbols (morphs.)
   It tracks the pointer along an edge.
   Each has a RMB popup menu.
   '''
+  import gui.menuhandle
+  import gui.itemhandleline
+  import gui.itemhandlecoords
+
   handle_group = gui.menuhandle.TrackingHandleGroup("MorphHandle")
-  
-  handle_control = gui.itemhandlecoords.ResizeHandleItem(resize_menu)
+
+  handle_control = gui.itemhandlecoords.ResizeHandleItem(build_dummy_menu("Resize TODO"))
   handle_group.add(handle_control)
-  handle_control = gui.itemhandlecoords.MoveMorphHandleItem(edit_menu)
+  handle_control = gui.itemhandlecoords.MoveMorphHandleItem(edit_menu())
   handle_group.add(handle_control)
-  handle_control = gui.itemhandleline.DrawHandleItem(draw_menu)
+  handle_control = gui.itemhandleline.DrawHandleItem(build_dummy_menu("Draw TODO"))
   handle_group.add(handle_control)
-  
+
   return handle_group
-  
 
-def build_document_handle_menu(edit_menu, resize_menu, draw_menu):
+
+def build_document_handle_menu():
   '''
   Handle menu that pops up in background (on the document.)
   It does not track.
   Each item has a RMB popup menu.
   '''
+  import gui.menuhandle
+  import gui.itemhandleline
+  import gui.itemhandlecoords
+
   handle_group = gui.menuhandle.StationedHandleGroup("DocumentHandle")
-  
-  handle_control = gui.itemhandlecoords.ResizeHandleItem(resize_menu)
+
+  handle_control = gui.itemhandlecoords.ResizeHandleItem(build_dummy_menu("Resize TODO"))
   handle_group.add(handle_control)
-  # MoveItem on document has different RMB context menu 
+  # MoveItem on document has different RMB context menu
   # and different scrolling than MoveItem on morph
-  handle_control = gui.itemhandlecoords.MoveViewHandleItem(document_menu)
+  handle_control = gui.itemhandlecoords.MoveViewHandleItem(document_menu())
   handle_group.add(handle_control)
-  handle_control = gui.itemhandleline.DrawHandleItem(draw_menu)
+  handle_control = gui.itemhandleline.DrawHandleItem(build_dummy_menu("Draw TODO"))
   handle_group.add(handle_control)
-  
+
   return handle_group
 
 
-def build_document_menu(printerport, fileport):
+def build_document_menu():
   '''
   Classic style pop-up menu
   '''
+  import gui.menutraditional
+  import gui.itemmenu
+
   menu_group = gui.menutraditional.MenuGroup("Document")
-  menu_group.add(doc_cut_mi)
-  menu_group.add(doc_copy_mi)
-  menu_group.add(doc_paste_mi)
+  menu_group.add(gui.itemmenu.TextMenuItem("Cut", command.Command(edit.do_cut)))
+  menu_group.add(gui.itemmenu.TextMenuItem("Copy", command.Command(edit.do_copy)))
+  menu_group.add(gui.itemmenu.TextMenuItem("Paste", command.Command(edit.do_paste)))
+  menu_group.add(gui.itemmenu.TextMenuItem("Undo", command.Command(history.do_undo)))
+  menu_group.add(gui.itemmenu.TextMenuItem("Redo", command.Command(history.do_redo)))
   # TODO separator
-  menu_group.add(save_mi)
-  menu_group.add(print_mi)
+  menu_group.add(gui.itemmenu.TextMenuItem("Import", command.Command(do_import)))
+  menu_group.add(gui.itemmenu.TextMenuItem("Cancel import", command.Command(do_cancel_import)))
+  menu_group.add(gui.itemmenu.TextMenuItem("Save", command.Command(do_save)))
+  menu_group.add(gui.itemmenu.TextMenuItem("Print", command.Command(do_print)))
+  # Debug
+  menu_group.add(gui.itemmenu.TextMenuItem("Statistics", command.Command(scenestats.log_report)))
   return menu_group
-  
 
-def build_edit_menu(printerport, fileport):
+
+def build_edit_menu():
   '''
   Build context menu (RMB) for morphs.
   Style: Classic pop-up menu
   '''
+  import gui.menutraditional
+  import gui.itemmenu
+
   menu_group = gui.menutraditional.MenuGroup("Edit")
-  menu_group.add(cut_mi)
-  menu_group.add(copy_mi)
-  menu_group.add(paste_mi)
+  menu_group.add(gui.itemmenu.TextMenuItem("Cut", command.Command(edit.do_cut)))
+  menu_group.add(gui.itemmenu.TextMenuItem("Copy", command.Command(edit.do_copy)))
+  menu_group.add(gui.itemmenu.TextMenuItem("Paste", command.Command(edit.do_paste)))
+  menu_group.add(gui.itemmenu.TextMenuItem("Undo", command.Command(history.do_undo)))
+  menu_group.add(gui.itemmenu.TextMenuItem("Redo", command.Command(history.do_redo)))
   return menu_group
-  
-  
-def build_dummy_menu(item):
+
+
+def build_dummy_menu(label):
+  ''' Menu of one item with no effect. '''
+  import gui.menutraditional
+  import gui.itemmenu
+
   menu_group = gui.menutraditional.MenuGroup("Dummy")
-  menu_group.add(item)
+  menu_group.add(gui.itemmenu.TextMenuItem(label, command.NULL_COMMAND))
   return menu_group
-  
-
@@ -17,54 +17,139 @@ the Free Software Foundation, either version 3 of the License, or
 (at your option) any later version.
 '''
 
-import inspect  # for indent by stack depth
+import os
+import config
+import history
+import time
+import logging
 
 
 '''
 Development decorators
+
+Tracing is decided once, at import time, by the environment variable PENSOOL_TRACE.
+When tracing is off, the decorators return the decorated function itself,
+so a traced function costs nothing extra.
+When tracing is on, the decorators collect per-function call counts,
+cumulative time and self time (excluding time in traced callees.)
+See trace_report().
+
+To test:
+python -m doctest -v decorators.py
+
+Examples:
+
+  # Trace a function regardless of PENSOOL_TRACE
+  >>> def leaf(x): return x + 1
+  >>> traced_leaf = _traced(leaf)
+  >>> traced_leaf(1)
+  2
+  >>> traced_leaf(2)
+  3
+  >>> _trace_stats[_trace_name(leaf)][0]
+  2
+  
+  # Self time excludes traced callees
+  >>> def branch(): return traced_leaf(3)
+  >>> traced_branch = _traced(branch)
+  >>> traced_branch()
+  4
+  >>> calls, cumulative, self_time = _trace_stats[_trace_name(branch)]
+  >>> calls, self_time <= cumulative
+  (1, True)
+  
+  >>> "decorators.leaf" in trace_report()
+  True
 '''
 
-DEBUG = False
+TRACE = bool(os.environ.get('PENSOOL_TRACE'))
+
+_trace_stats = {}   # traced function name -> [calls, cumulative seconds, self seconds]
+_trace_stack = []   # for each traced call in progress, seconds spent in traced callees
+
+
+def _trace_name(func):
+  '''
+  Name of function in reports.
+  Line number distinguishes same named methods of classes in one module.
+  '''
+  return "%s.%s:%d" % (func.__module__, func.func_name, func.func_code.co_firstlineno)
+
+
+def _traced(func):
+  '''
+  Return func wrapped to accumulate its timing into _trace_stats.
+  !!! Recursive calls are counted in cumulative time once per level.
+  '''
+  stats = _trace_stats.setdefault(_trace_name(func), [0, 0.0, 0.0])
+  def traced_func(*args, **kwargs):
+    _trace_stack.append(0.0)
+    start = time.time()
+    try:
+      return func(*args, **kwargs)
+    finally:
+      elapsed = time.time() - start
+      callee_time = _trace_stack.pop()
+      stats[0] += 1
+      stats[1] += elapsed
+      stats[2] += elapsed - callee_time
+      if _trace_stack:
+        _trace_stack[-1] += elapsed   # charge to traced caller
+  traced_func.__name__ = func.__name__
+  traced_func.__doc__ = func.__doc__
+  return traced_func
+
+
+def _untraced(func):
+  ''' Compile tracing away: the decorated function is the function. '''
+  return func
+
+
+def trace_report(limit=None):
+  '''
+  Return text report of traced functions, ordered by self time.
+  Columns: calls, cumulative mSec, self mSec, name.
+  '''
+  rows = sorted(_trace_stats.items(), key=lambda item: item[1][2], reverse=True)
+  lines = ["%8s %12s %12s  %s" % ("calls", "cum mSec", "self mSec", "function")]
+  for name, (calls, cumulative, self_time) in rows[:limit]:
+    if calls:
+      lines.append("%8d %12.3f %12.3f  %s" % (calls, cumulative*1000, self_time*1000, name))
+  return "\n".join(lines)
+  
+  
+def log_trace_report():
+  ''' Log report of traced functions to the pensool logger. '''
+  logging.getLogger('pensool').info("Trace report\n" + trace_report())
+
+
+if TRACE:
+  import atexit
+  atexit.register(log_trace_report)
+  _trace_decorator = _traced
+else:
+  _trace_decorator = _untraced
+
 
 # FIXME rename to dump_call
 def dump_event(func):
   '''
-  Decorator: dumps a call:  name and args.
+  Decorator: traces a call.
   Use for tracing execution.
   
-  Since self is a parameter, when used on a class method,
-  dumps class, method name, and instance.
-  This is useful since many events are handled by different handlers 
-  with same method names in different classes and instances.
-  '''
-  fname = func.__module__ + "." + func.func_name
-  argnames = func.func_code.co_varnames[:func.func_code.co_argcount]
-  def dump_func(*args, **kwargs):
-    if DEBUG:
-      depth = len(inspect.stack())  # Indent message by call stack depth
-      print " "*depth, fname, ",".join(
-        '%s=%s' % entry for entry in zip(argnames,args) + kwargs.items())
-    return func(*args, **kwargs)
-  return dump_func
+  Many events are handled by different handlers 
+  with same method names in different classes,
+  the report distinguishes them by line number.
+  '''
+  return _trace_decorator(func)
 
 
 def dump_return(func):
   '''
-  Decorator: dumps bracket: name and args on entry, return values on exit
-  '''
-  fname = func.__module__ + "." + func.func_name
-  argnames = func.func_code.co_varnames[:func.func_code.co_argcount]
-  def dump_return(*args, **kwargs):
-    if DEBUG:
-      depth = len(inspect.stack())  # Indent message by call stack depth
-      print " "*depth, fname, ",".join(
-        '%s=%s' % entry for entry in zip(argnames,args) + kwargs.items())
-    value = func(*args, **kwargs)
-    if DEBUG:
-      # use %r for repr() %s for str()
-      print " "*depth, fname, "returns", value
-    return value
-  return dump_return
+  Decorator: traces a call.
+  Formerly dumped return values, now a synonym for dump_event.
+  '''
+  return _trace_decorator(func)
 
 
 
@@ -85,12 +170,33 @@ def view_altering(func):
   '''
   def view_altering_decor(self, *args, **kwargs):
     
-    self.invalidate_as_drawn()
-    value =func(self, *args, **kwargs)
-    self.invalidate_will_draw()
+    change = history.begin_change(self)  # Record for undo, if self is in the document
+    try:
+      self.invalidate_as_drawn()
+      value =func(self, *args, **kwargs)
+      self.invalidate_will_draw()
+    finally:
+      history.end_change(change)
     return value
   return view_altering_decor
 
+
+def batched(func):
+  '''
+  Decorator: the invalidates of decorated func are one invalidate of their union.
+  Decorated func alters the view of many drawables, e.g. calls many view_altering funcs.
+  Also, the alterations are one step of undo history.
+  '''
+  def batched_decor(*args, **kwargs):
+    config.viewport.begin_batch()
+    history.begin_group()
+    try:
+      return func(*args, **kwargs)
+    finally:
+      history.end_group()
+      config.viewport.end_batch()
+  return batched_decor
+
 # FIXME try except IndexError probably first arg not a context
 def transforming(func):
   '''
@@ -10,12 +10,16 @@ the Free Software Foundation, either version 3 of the License, or
 (at your option) any later version.
 '''
 
+import cairo
+import weakref
 import base.bounds as bounds
 import base.vector as vector
 import base.transform as transform
+import base.nearest as nearest
 import style  # set_line_width
 from decorators import *
 import config
+import telemetry
 
 # TODO move to decorators?
 def picking(func):
@@ -40,6 +44,11 @@ def picking(func):
 
 
 
+def _no_parent():
+  ''' Dereference of the parent of a drawable without a parent. '''
+  return None
+
+
 class Drawable(object):
   '''
   Things that can be drawn (morphs, glyphs, and controls).
@@ -72,6 +81,35 @@ class Drawable(object):
     self.parent = None
     # !!! Not all Drawables have transform or style.
     
+  
+  def _get_parent(self):
+    return self._parent()
+    
+  def _set_parent(self, parent):
+    if parent is None:
+      self._parent = _no_parent
+    else:
+      self._parent = weakref.ref(parent)
+    
+  parent = property(_get_parent, _set_parent, doc='''
+    Composite containing me, or None.
+    Weak: a composite is kept by its own parent (or the model), not by its members,
+    so the model tree has no reference cycles, and is freed by reference counting.
+    ''')
+  
+  
+  def __getstate__(self):
+    ''' Pickling.  A weak reference is not picklable: pickle the parent itself. '''
+    state = self.__dict__.copy()
+    del state["_parent"]
+    state["parent"] = self.parent
+    return state
+    
+  def __setstate__(self, state):
+    state = state.copy()
+    self.parent = state.pop("parent")
+    self.__dict__.update(state)
+    
   # Feb. 16 dump_return here breaks sliding of handle menu???
   # @dump_return  # Uncomment to debug primitive draw().
   def draw(self, context):
@@ -85,6 +123,7 @@ class Drawable(object):
     My parent transforms and styles me.
     '''
  
+    telemetry.frames.visited += 1
     self.put_path_to(context) # recursive, except this should be terminal!!!
     
     # Self is glyph.  Parent morph holds style.
@@ -93,6 +132,7 @@ class Drawable(object):
     style.set_line_width(context, self.parent.style.pen_width)
         
     self.bounds = self.get_stroke_bounds(context) # Cache drawn bounds
+    telemetry.frames.note_inked(self.bounds)
     
     # !!! Parent knows whether my style filled
     if self.parent.style.is_filled():
@@ -103,7 +143,11 @@ class Drawable(object):
     # Assert fill or stroke clears paths from context
     # NOT assert context.restore() follows soon: may be one of siblings.
     return self.bounds.copy()   # Return reference to copy, not self
-    
+
+  def draw_steps(self, context):
+    ''' Incremental draw of a primitive is one step.  See Composite.draw_steps(). '''
+    yield self.draw(context)
+
   '''
   Invalidate means queue a region to redraw at expose event.
   The region is rectangular, axis aligned, in DCS.
@@ -123,7 +167,7 @@ class Drawable(object):
     Caching drawn bounds is an optimization; alternative is to walk model branch.
     This is for composite and primitive drawables: every drawable has bounds.
     '''
-    config.viewport.surface.invalidate_rect(self.bounds.to_rect(), True)
+    config.viewport.invalidate_rect(self.bounds.to_rect())
     return self.bounds
    
 
@@ -144,7 +188,7 @@ class Drawable(object):
     self.put_path_to(context)   # recursive
     # FIXME this is not right, the paths will have different transforms????
     will_bounds_DCS = self.get_stroke_bounds(context) # inked
-    config.viewport.surface.invalidate_rect( will_bounds_DCS.to_rect(), True )
+    config.viewport.invalidate_rect(will_bounds_DCS.to_rect())
     return will_bounds_DCS  # for debugging
     
   """
@@ -325,6 +369,17 @@ class Drawable(object):
     '''
     return self.bounds.is_intersect(event)
     
+  def get_edge_bounds(self, context, matrix):
+    '''
+    Compute bounding rect in DCS of my edge as inked, given the device transform of my parent.
+    From the model, not as last drawn.  Context is any context, e.g. a scratch one.
+    '''
+    context.new_path()
+    context.set_matrix(matrix)
+    self.put_path_to(context)
+    style.set_line_width(context, self.parent.style.pen_width)
+    return self.get_stroke_bounds(context)
+    
   # @dump_return
   def get_stroke_bounds(self, context):
     '''
@@ -383,5 +438,43 @@ class Drawable(object):
     print self
     raise NotImplementedError("Virtual")
     
+    
+  def nearest_edge_point(self, point):
+    '''
+    Return base.nearest.Nearest: point on my edge nearest point (DCS), with tangent there.
+    Or None if no edge.
+    
+    Generic: projects onto my path, flattened.
+    Glyphs override with analytic versions.
+    Like picking, can be called outside a walk: uses parent retained transform.
+    '''
+    context = config.viewport.user_context()
+    if self.parent:
+      context.set_matrix(transform.copy(self.parent.retained_transform))
+    self.put_path_to(context)
+    context.identity_matrix() # copy path in DCS
+    return nearest.nearest([nearest.polyline(point, points, closed)
+      for points, closed in path_polylines(context.copy_path_flat())])
+    
+    
+def path_polylines(path):
+  ''' Return list of (points, is closed) for subpaths of a flattened cairo path. '''
+  polylines = []
+  points = []
+  for kind, coords in path:
+    if kind == cairo.PATH_MOVE_TO:
+      if points:
+        polylines.append((points, False))
+      points = [vector.Vector(*coords)]
+    elif kind == cairo.PATH_LINE_TO:
+      points.append(vector.Vector(*coords))
+    elif kind == cairo.PATH_CLOSE_PATH:
+      if points:
+        polylines.append((points, True))
+      points = points[:1] # Current point is start of closed subpath
+  if len(points) > 1:
+    polylines.append((points, False))
+  return polylines
+    
       
 
@@ -0,0 +1,248 @@
+'''
+Edge index: proximity queries on the edges of a model.
+
+Composite.pick() answers the first member whose stroke contains a point,
+in list order.  Instead, query the k nearest edges within a radius,
+with distances, so the handle menu opens on the truly nearest edge,
+and a UI can cycle through nearby edges.
+
+Glyphs (edges) are indexed in a spatial hash (base.grid) by their bounds (DCS),
+clipped to the view (plus a margin): picks are of points in the view,
+and a glyph magnified far beyond the view costs no more cells than the view.
+A symbol instance (see morph/symbol.py) is indexed as a whole, like a glyph.
+Candidates from the hash are refined by exact distance (Drawable.nearest_edge_point().)
+
+Bounds are derived from the model (transforms and paths), not from what was last drawn:
+a draw with less detail, in tiles or in slices does not walk every glyph
+(see lod.py, tilerender.py, slicedrender.py.)
+Building also sets the retained transforms of composites, as a draw would,
+since refining uses them.
+
+The index is built lazily, and is current until the view or the model changes.
+A change of the view (its transform or size) rebuilds the index;
+building can be stepped (see build_steps()), e.g. in idle time.
+Changes of the model are told by history (see history.add_listener()):
+only the changed composites are indexed anew, replacing what was indexed in them,
+and of their members only those whose device transform changed.
+Other damage (e.g. feedback of controls) does not touch the index.
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import collections
+import weakref
+import cairo
+import base.grid as grid
+import config
+import history
+
+
+class EdgeHit(collections.namedtuple('EdgeHit', 'distance point tangent glyph')):
+  ''' An edge near a point: distance to it, nearest point and tangent on it (DCS), the glyph. '''
+  __slots__ = ()
+
+  @property
+  def morph(self):
+    ''' The hit morph, as picked: a glyph's parent, or a symbol instance. '''
+    if isinstance(self.glyph, list):
+      return self.glyph
+    return self.glyph.parent
+
+
+class EdgeIndex(object):
+  ''' Spatial index of the glyphs of a composite. '''
+
+  def __init__(self, root):
+    self._root = weakref.ref(root)  # Weak: the root refers to its index
+    self.grid = None
+    self.view = None  # view when built.  See view_of()
+    self.composites = {}  # id(composite) -> (composite, items indexed, composite members, transform)
+    self.dirty = {}  # id(drawable) -> drawable changed since indexed
+    self_ref = weakref.ref(self)
+    def changed(drawable):
+      index = self_ref()
+      if index is not None:
+        index.dirty[id(drawable)] = drawable
+    history.add_listener(changed)
+
+  @property
+  def root(self):
+    ''' Composite indexed, or None if it was freed. '''
+    return self._root()
+
+  def is_current(self):
+    return self.grid is not None and not self.dirty and self.view == view_of(self.root)
+
+  def build_steps(self):
+    '''
+    Generator: make index current.
+    If the view changed, build anew, yielding None every EDGE_INDEX_STEP glyphs:
+    caller may abandon it, the index is only replaced when finished.
+    Else index anew the composites changed, in one step.
+    '''
+    root = self.root
+    if root is None:
+      return
+    view = view_of(root)
+    if self.grid is not None and view == self.view:
+      self._update_changed()
+      return
+    self.dirty = {}  # Changes from now on are indexed after this build
+    context = config.viewport.user_context()  # scratch, for extents of paths
+    margin = config.EDGE_INDEX_CELL_SIZE + pick_radius()
+    allocation = config.viewport.da.allocation
+    new_grid = grid.SpatialHash(config.EDGE_INDEX_CELL_SIZE,
+      (-margin, -margin, allocation.width + margin, allocation.height + margin))
+    composites = {}
+    for step in _index_steps(new_grid, composites, root, device_transform(root), context):
+      yield step
+    self.grid = new_grid
+    self.composites = composites
+    self.view = view
+
+  def _update_changed(self):
+    ''' Index anew the composites changed, replacing what was indexed in them. '''
+    root = self.root
+    changed = {}  # id -> indexed composite containing a changed drawable
+    for drawable in self.dirty.values():
+      composite = self._indexed_composite(drawable)
+      if composite is not None:
+        changed[id(composite)] = composite
+    self.dirty = {}
+    context = config.viewport.user_context()
+    for composite in changed.values():
+      if _is_under(composite, root):
+        for step in _index_steps(self.grid, self.composites, composite,
+            device_transform(composite), context):
+          pass
+      else:
+        _unindex(self.grid, self.composites, composite)
+
+  def _indexed_composite(self, drawable):
+    ''' Nearest composite, of drawable and its ancestors, that is indexed; or None. '''
+    while drawable is not None:
+      entry = self.composites.get(id(drawable))
+      if entry is not None and entry[0] is drawable:
+        return drawable
+      drawable = drawable.parent
+    return None
+
+  def update(self):
+    ''' Make index current now. '''
+    if not self.is_current():
+      for step in self.build_steps():
+        pass
+
+  def nearest(self, point, radius, k=1):
+    '''
+    Return list of at most k EdgeHits within radius of point (DCS), nearest first.
+    '''
+    self.update()
+    hits = []
+    for glyph in self.grid.query(point.x - radius, point.y - radius,
+        point.x + radius, point.y + radius):
+      found = glyph.nearest_edge_point(point)
+      if found is not None and found.distance <= radius:
+        hits.append(EdgeHit(found.distance, found.point, found.tangent, glyph))
+    hits.sort(key=lambda hit: hit.distance)
+    return hits[:k]
+
+
+def _index_steps(index_grid, composites, composite, matrix, context):
+  '''
+  Generator: index the glyphs of composite, of device transform matrix, into index_grid,
+  replacing what was indexed in it, and record what is indexed in each composite into composites.
+  Members already indexed at the same device transform are kept, not walked.
+  Yields None every EDGE_INDEX_STEP glyphs.
+  '''
+  count = 0
+  stack = [(composite, matrix)]
+  while stack:
+    composite, matrix = stack.pop()
+    composite.retained_transform = matrix
+    old_members = ()
+    entry = composites.pop(id(composite), None)
+    if entry is not None and entry[0] is composite:
+      for item in entry[1]:
+        index_grid.remove(item)
+      old_members = entry[2]
+    items = []
+    members = []
+    for item in composite:
+      if isinstance(item, list) and not hasattr(item, 'definition'):  # Composite, not instance
+        members.append(item)
+        item_matrix = item.transform * matrix
+        entry = composites.get(id(item))
+        if entry is None or entry[0] is not item or entry[3] != _matrix_key(item_matrix):
+          stack.append((item, item_matrix))
+      else:
+        item_bounds = item.get_edge_bounds(context, matrix)
+        if not item_bounds.is_null() and index_grid.insert(item, item_bounds):
+          items.append(item)
+        count += 1
+        if count % config.EDGE_INDEX_STEP == 0:
+          yield None
+    member_ids = set([id(member) for member in members])
+    for member in old_members:
+      if id(member) not in member_ids and (member.parent is composite or member.parent is None):
+        _unindex(index_grid, composites, member)  # Removed, not moved to another composite
+    composites[id(composite)] = (composite, items, members, _matrix_key(matrix))
+
+
+def _unindex(index_grid, composites, composite):
+  ''' Remove what was indexed in composite, and in composites indexed in it. '''
+  stack = [composite]
+  while stack:
+    composite = stack.pop()
+    entry = composites.get(id(composite))
+    if entry is None or entry[0] is not composite:
+      continue
+    del composites[id(composite)]
+    for item in entry[1]:
+      index_grid.remove(item)
+    stack.extend(entry[2])
+
+
+def _matrix_key(matrix):
+  ''' Comparable value of a cairo matrix. '''
+  return (matrix.transform_point(0, 0), matrix.transform_distance(1, 0),
+    matrix.transform_distance(0, 1))
+
+
+def _is_under(drawable, root):
+  ''' Whether drawable is root or in its tree.  A removed member still refers to its parent. '''
+  while drawable is not root:
+    parent = drawable.parent
+    if parent is None or not any(member is drawable for member in parent):
+      return False
+    drawable = parent
+  return True
+
+
+def view_of(root):
+  ''' The view of root that the index depends on: its device transform and the size of the view. '''
+  allocation = config.viewport.da.allocation
+  return _matrix_key(device_transform(root)) + (allocation.width, allocation.height)
+
+
+def device_transform(composite):
+  ''' Return transform from coords of composite to the device, from the transforms of the model. '''
+  matrix = cairo.Matrix() * composite.transform
+  parent = composite.parent
+  while parent is not None:
+    matrix = matrix * parent.transform
+    parent = parent.parent
+  return matrix
+
+
+def pick_radius():
+  ''' Return radius (DCS) of a pick, half the pick pen which scales with the view. '''
+  return config.PENSOOL_PICK_PEN_WIDTH / 2.0 * config.scheme.model.scale.x
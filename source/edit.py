@@ -2,6 +2,7 @@
 Edit operations: cut, copy, paste.  Glue between app and clipboard.
 
 Strategy is to pickle a morph, put the pickle on the clipboard.
+Repeated pastes of the same pickle are instances of one shared definition (see morph/symbol.py.)
 
 !!! Important to break a morph's reference to parent, else whole model is pickled.
 IOW, model tree is doubly linked, remove the rootward references.
@@ -24,6 +25,8 @@ the Free Software Foundation, either version 3 of the License, or
 import copy
 import pickle
 import clipboard
+import history
+import morph.symbol as symbol
 from decorators import *
 
 import logging
@@ -42,10 +45,13 @@ def do_cut(operand, event=None):
   
   foo = pickle.dumps(operand, pickle.HIGHEST_PROTOCOL)
   clipboard.clipboard.paste(foo)
+  symbol.clipboard_filled()
   
   if parent:  # If not top i.e. cutting document
+    history.record_splice(parent, history.index_of(parent, operand), [operand], False)
     parent.remove(operand)  # Disown
   else: # Is top, the document.  Empty the document morph.
+    history.record_splice(operand, 0, operand, False)
     del operand[:]
   # Referred-to cut objects will be garbage collected.
   my_logger.debug("Cutted")
@@ -58,7 +64,8 @@ def do_paste(operand, event=None):
   Operand is a morph the paste op was chosen upon.
   Event is DCS coords.
   '''
-  foo = pickle.loads(clipboard.clipboard.copy())  # Unpickle
+  # A copy, or on repeated pastes, an instance of a definition shared by them.
+  foo = symbol.paste_from(clipboard.clipboard.copy())
  
   # TODO refactor this to transformer.py
   # Transform the pasted morph.
@@ -83,6 +90,7 @@ def do_copy(morph, event=None):
   morph.parent = None
   
   clipboard.clipboard.paste(pickle.dumps(morph, pickle.HIGHEST_PROTOCOL))
+  symbol.clipboard_filled()
   
   morph.parent = saved_parent # Reverse the emancipate
   my_logger.debug("Copied")
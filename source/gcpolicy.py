@@ -0,0 +1,96 @@
+'''
+Garbage collection policy.
+
+Parent links and manager registries are weak (see Drawable.parent, gui.manager.textselect),
+so the model tree has no reference cycles and is freed by reference counting.
+But the cyclic collector still runs, triggered by counts of allocations,
+and a full collection traverses every object of the document:
+a pause that grows with the document, visible during a drag.
+
+document_loaded(): after a document loads, collect once, then keep the loaded objects
+out of later collections (GC_FREEZE), by gc.freeze() where it exists.
+
+begin_drag(), end_drag(): the collector is disabled during a drag (GC_PAUSE_DURING_DRAG),
+so a drag allocates without pauses.  Collection resumes at the drop.
+Where gc.freeze() does not exist and the collector is not disabled,
+the threshold of the oldest generation is raised to GC_FROZEN_THRESHOLD during a drag,
+so full collections (which traverse the loaded objects) are rare, and restored at the drop.
+A drag whose end is never seen (e.g. the button was released outside the window)
+does not pause collection longer than GC_DRAG_PAUSE_LIMIT.
+
+To test:
+python -m doctest -v gcpolicy.py
+
+Examples:
+
+  >>> enabled = gc.isenabled()
+  >>> threshold = gc.get_threshold()
+  >>> begin_drag()
+  >>> gc.isenabled() == (enabled and not config.GC_PAUSE_DURING_DRAG)
+  True
+  >>> end_drag()
+  >>> gc.isenabled() == enabled
+  True
+  >>> gc.get_threshold() == threshold
+  True
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import gc
+import config
+import base.timer as timer
+
+_paused = False # collector disabled by begin_drag()
+_threshold = None # threshold of the collector before begin_drag() raised it
+_limit_timer = timer.Timer()
+
+
+def document_loaded():
+  ''' A document was loaded: collect, then exempt the loaded objects from collection. '''
+  if not config.GC_FREEZE:
+    return
+  gc.collect()
+  if hasattr(gc, 'freeze'):
+    gc.freeze()
+
+
+def begin_drag():
+  ''' A drag began: pause collection, or make full collections rare. '''
+  global _paused, _threshold
+  if config.GC_PAUSE_DURING_DRAG and gc.isenabled():
+    gc.disable()
+    _paused = True
+  elif config.GC_FREEZE and not hasattr(gc, 'freeze') and _threshold is None:
+    _threshold = gc.get_threshold()
+    threshold0, threshold1, threshold2 = _threshold
+    gc.set_threshold(threshold0, threshold1, max(threshold2, config.GC_FROZEN_THRESHOLD))
+  if _paused or _threshold is not None:
+    _limit_timer.cancel()
+    _limit_timer.start(config.GC_DRAG_PAUSE_LIMIT, _limit_cb)
+
+
+def end_drag():
+  ''' A drag ended or was canceled: resume collection. '''
+  global _paused, _threshold
+  _limit_timer.cancel()
+  if _paused:
+    gc.enable()
+    _paused = False
+  if _threshold is not None:
+    gc.set_threshold(*_threshold)
+    _threshold = None
+
+
+def _limit_cb():
+  ''' The drag lasted too long: resume collection.  One shot. '''
+  end_drag()
+  return False
@@ -18,12 +18,15 @@ import gui.manager.focus
 import gui.manager.textselect
 import gui.manager.handle
 import gui.manager.pointer
+import gui.manager.speculate
 import gui.manager.control
 import controlinstances
 import config # viewport and scheme
 from decorators import *
 import base.alert as alert
 import base.vector as vector
+import base.bounds as bounds
+import bulk
 
 from gtk import gdk
 
@@ -41,20 +44,23 @@ class BackgroundControl(gui.control.GuiControl):
     bkgd handle menu
     interaction with morphs via handle menus
     inside morphs
+    rubber band (shift drag) selection of many morphs, which a later drag moves (see bulk)
+    Escape key: cancel an import
     via the bkgd context menus:
       controlling ports:
         view
         printerport
         fileport
   '''
-  def __init__(self, printer_port, file_port):
+  def __init__(self):
     # handle_group, menu, 
     gui.control.GuiControl.__init__(self) # super
-    self.printerport = printer_port
-    self.fileport = file_port
+    # Printer and file ports: see controlinstances.printer_port(), file_port()
     # !!! Controls self, ie the document
     # FIXME this is wierd.  None?  Document model?
     self.controlee = self
+    self.selection = [] # morphs in the last rubber band
+    self.banding = False  # Is the current drag a rubber band?
     self.set_background_bounds()
     gui.manager.pointer.register_callback(self.pick_cb)
   
@@ -105,17 +111,17 @@ class BackgroundControl(gui.control.GuiControl):
       return True
       
     # Pick: detect pointer intersect morph edges
-    context = config.viewport.user_context()
-    picked_morph = config.scheme.model.pick(context, point)
+    # Usually already picked speculatively while pointer slowed.
+    picked_morph = gui.manager.speculate.pick(point)
     if picked_morph:
-      self._open_menu(point, picked_morph, controlinstances.handle_menu)
+      self._open_menu(point, picked_morph, controlinstances.handle_menu())
       # !!! Closing handle menu cancels focus
       return True
     
     # If nothing else picked, open handle menu on document
     # But his handle menu does not slide, is fixed at a point.
     # It opens always vertical, does not slide
-    self._open_menu(point, config.scheme.model, controlinstances.document_handle_menu)
+    self._open_menu(point, config.scheme.model, controlinstances.document_handle_menu())
     return True
     
     # ALT design: wait for control key to open handle menu on doc
@@ -175,6 +181,8 @@ class BackgroundControl(gui.control.GuiControl):
     Since the background controls the document,
     meaning of drag is move (pan) document beneath the window.
     IE a hand icon drag.
+    Except: a shift drag is a rubber band that selects morphs,
+    and while morphs are selected, a drag moves them.
     '''
     # TODO consolidate in guicontrol? and delay start until movement
     self.start_drag(event)
@@ -198,7 +206,7 @@ class BackgroundControl(gui.control.GuiControl):
     This defines that background manager shows traditional context menu.
     Controlee is document.
     '''
-    self._open_menu(event, config.scheme.model, controlinstances.document_menu)
+    self._open_menu(event, config.scheme.model, controlinstances.document_menu())
   
   
   #@dump_event
@@ -215,14 +223,18 @@ class BackgroundControl(gui.control.GuiControl):
     '''
     Show handle menu so user can create independent morphs at top level of scheme.
     '''
-    self._open_menu(self.pointer_DCS, config.scheme.model, controlinstances.handle_menu)
+    self._open_menu(self.pointer_DCS, config.scheme.model, controlinstances.handle_menu())
 
     
   @dump_event
   def bland_key_release(self, event):
     '''
     Background control redirects ordinary keys to active text selection if any.
+    Except Escape, which cancels an import in progress.
     '''
+    if gdk.keyval_name(event.keyval) == "Escape":
+      controlinstances.do_cancel_import()
+      return
     selection = gui.manager.textselect.get_active_select()
     if selection:
       selection.key(event)
@@ -254,6 +266,7 @@ class BackgroundControl(gui.control.GuiControl):
     controlee is the view ie the entire doc?? TODO
     '''
     ### self.is_dragging = True
+    self.banding = bool(event.state & gdk.SHIFT_MASK)
     gui.manager.drop.dropmgr.begin(event, controlee=config.scheme.model, control=self)
     
   
@@ -279,8 +292,19 @@ class BackgroundControl(gui.control.GuiControl):
     
     ###if self.is_dragging:
     if source_control is self:  # Did drag start in background?
-      # backgroundctl controls view.  Assert source is the scheme.
-      source.move_relative(offset)
+      # Selected morphs that are still in the model (not cut since)
+      self.selection = [member for member in self.selection
+        if any(member is item for item in config.scheme.model)]
+      if self.banding:
+        # Select morphs wholly inside the band.  An empty band deselects.
+        band = bounds.Bounds(min(event.x, event.x - offset.x), min(event.y, event.y - offset.y),
+          abs(offset.x), abs(offset.y))
+        self.selection = bulk.region(band, inside=True)
+      elif self.selection:
+        bulk.move(self.selection, offset)
+      else:
+        # backgroundctl controls view.  Assert source is the scheme.
+        source.move_relative(offset)
     ###  self.is_dragging = False  # Local drag state
     else:    # Drag started in another control.
       source_control.drop(source, event, offset, source_control)
@@ -311,8 +335,8 @@ class BackgroundControl(gui.control.GuiControl):
     
     
 # Scraps
-# self.fileport.do_save()
-# self.printerport.do_print()
+# controlinstances.file_port().do_save()
+# controlinstances.printer_port().do_print()
 # Zoom uniformly in both axis
 
     
@@ -17,6 +17,8 @@ the Free Software Foundation, either version 3 of the License, or
 '''
 
 import base.vector as vector
+import gcpolicy
+import history
 from decorators import *
 
 
@@ -62,6 +64,8 @@ class DropManager(object):
     self.source = controlee
     self.draggee = controlee # Defaults to same as source
     self.source_control = control
+    history.begin_group() # A drag is one step of undo history
+    gcpolicy.begin_drag()
     
   
   #@dump_event
@@ -93,6 +97,8 @@ class DropManager(object):
     '''
     target.drop(self.source, event, self._get_offset(event), self.source_control)
     self.__init__()
+    history.end_group()
+    gcpolicy.end_drag()
   
     
   @dump_event
@@ -101,6 +107,9 @@ class DropManager(object):
     Cancel drag.
     ??? When would this happen
     '''
+    if self.source is not None:
+      history.end_group()
+      gcpolicy.end_drag()
     self.source = None
   
   def is_drag(self):
@@ -21,33 +21,42 @@ the Free Software Foundation, either version 3 of the License, or
 (at your option) any later version.
 '''
 
+import weakref
 import config
 from decorators import *
 
 current_handle_set = None
-current_morph = None
+_current_morph = None # weak reference: a roused morph can be deleted
+
+
+def current_morph():
+  ''' Morph the current handle set is on, or None. '''
+  if _current_morph is None:
+    return None
+  return _current_morph()
 
 
 @dump_event
 def rouse(handle_set, morph, direction):
   ''' Rouse handle set on (visually) morph. '''
-  global current_handle_set, current_morph
+  global current_handle_set, _current_morph
   
   if direction:
     current_handle_set = handle_set
-    current_morph = morph
+    _current_morph = weakref.ref(morph)
     # FIXME put in scheme or append to morph and later remove
   else:
     current_handle_set = None
-    current_morph = None
+    _current_morph = None
 
 #@dump_return
 def pick(point):
   ''' Pick any handle of the current handle set. '''
   picked = None
-  if current_handle_set:
+  morph = current_morph()
+  if current_handle_set and morph is not None:
     context = config.viewport.user_context()
-    context.set_matrix(current_morph.retained_transform)
+    context.set_matrix(morph.retained_transform)
     picked = current_handle_set.pick(context, point)
   if picked:
     picked.highlight(True)
@@ -57,9 +66,10 @@ def pick(point):
     
 def draw():
   ''' Draw current handle set. '''
-  if current_handle_set:
+  morph = current_morph()
+  if current_handle_set and morph is not None:
     context = config.viewport.user_context()
-    context.set_matrix(current_morph.retained_transform)
+    context.set_matrix(morph.retained_transform)
     return current_handle_set.draw(context)
   
 
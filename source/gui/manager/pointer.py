@@ -54,6 +54,7 @@ the Free Software Foundation, either version 3 of the License, or
 
 import base.vector as vector
 import base.timer as timer
+import gui.manager.speculate as speculate
 import config
 from decorators import *
 import collections
@@ -88,6 +89,7 @@ def reset():
   
   state = None
   previous_event = None
+  speculate.cancel()
   
   
 def cancel_timer():
@@ -96,6 +98,7 @@ def cancel_timer():
   See below: decide_stopped() may later be called and can restart timer.
   '''
   pointer_timer.cancel()
+  speculate.cancel()
 
 
 # @dump_return
@@ -137,12 +140,16 @@ def decide_stopped(event):
     if speed <= config.GUI_MOVING_SLOWING_THRESHOLD:
       state = "slowed"
       pointer_timer.start(config.GUI_MOVING_POPUP_TIME, timeout_cb) # after a delay, go to stopped state
+      # pick while waiting, so result is ready when timer goes off
+      speculate.start(move)
     # else moved fast
   elif state is "slowed":
     if speed > config.GUI_MOVING_SLOWING_THRESHOLD:
       state = "moving"
       pointer_timer.cancel()
-    # else same state  still slow motion
+      speculate.cancel()
+    else: # same state  still slow motion
+      speculate.follow(move)
   elif state is "stopped":
     if speed <= config.GUI_MOVING_SLOWING_THRESHOLD:
       # slow motion from stopped, try pick if user is making small adjustment
@@ -0,0 +1,144 @@
+'''
+Speculation manager: pick speculatively while the pointer is slowing.
+
+The pointer manager waits GUI_MOVING_POPUP_TIME after the pointer slows
+before it decides the pointer stopped and calls for a pick.
+For a large model a synchronous pick then delays the handle menu.
+Instead, when the pointer slows, start an incremental pick in idle time slices,
+so input events preempt it.
+When the pointer timer goes off, the result is usually ready.
+
+A pick is a query of the model's edge index for the nearest edge (see edgeindex.py.)
+The incremental part is building the index, if it is not current.
+
+A speculation is discarded if:
+- the pointer speeds up (cancel())
+- the pointer drifts more than SPECULATIVE_PICK_DRIFT (restarted by follow())
+- the view changed, i.e. the viewport's damage_serial changed.
+Then pick() falls back to a synchronous pick.
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import base.timer as timer
+import base.vector as vector
+import config
+import time
+
+# global state
+pick_task = None  # generator of picking in progress, None if finished or no speculation
+pick_point = None # point of speculation, None if no speculation
+pick_result = None
+pick_serial = None # viewport damage serial when speculation started
+
+pick_idler = timer.Idler()
+
+
+def start(point):
+  ''' Start speculative pick at point (device coords.) '''
+  global pick_task, pick_point, pick_result, pick_serial
+
+  cancel()
+  pick_point = vector.Vector(point.x, point.y)
+  pick_result = None
+  pick_serial = config.viewport.damage_serial
+  pick_task = pick_steps(pick_point)
+  pick_idler.start(step_cb)
+  
+  
+def pick_steps(point):
+  '''
+  Generator: pick nearest morph to point in model, in steps.
+  Yields None while working, or the picked morph.
+  '''
+  model = config.scheme.model
+  for step in model.edge_index_steps():
+    yield None
+  hits = model.nearest_edges(point)
+  if hits:
+    yield hits[0].morph
+
+
+def follow(point):
+  ''' Pointer still slow but moved.  Restart speculation if it drifted too far. '''
+  if pick_point is None or _drifted(point):
+    start(point)
+
+
+def cancel():
+  ''' Abandon any speculation. '''
+  global pick_task, pick_point
+
+  pick_idler.cancel()
+  if pick_task is not None:
+    pick_task.close()
+  pick_task = None
+  pick_point = None
+
+
+def step_cb():
+  '''
+  Idle callback: advance the speculative pick for a slice of time.
+  Return True to be called again.
+  '''
+  deadline = time.time() + config.SPECULATIVE_PICK_SLICE / 1000.0
+  while pick_task is not None:
+    if _step():
+      return False
+    if time.time() > deadline:
+      return True
+  return False
+
+
+def pick(point):
+  '''
+  Return morph picked at point in the model, or None.
+  Use the speculation if it is for the same point and view,
+  finishing it if necessary, else pick synchronously.
+  '''
+  if pick_point is not None and not _drifted(point) \
+      and pick_serial == config.viewport.damage_serial:
+    pick_idler.cancel()
+    while not _step():
+      pass
+    result = pick_result
+  else:
+    hits = config.scheme.model.nearest_edges(point)
+    result = hits[0].morph if hits else None
+  cancel()
+  return result
+
+
+def _step():
+  ''' Take one step of the pick.  Return True if finished. '''
+  global pick_task, pick_result
+
+  if pick_task is None:
+    return True
+  try:
+    morph = pick_task.next()
+  except StopIteration:
+    morph = None
+    pick_task = None
+  else:
+    if morph is None:
+      return False
+    # Picked.  Generator need not be exhausted.
+    pick_task.close()
+    pick_task = None
+  pick_result = morph
+  return True
+
+
+def _drifted(point):
+  return (vector.Vector(point.x, point.y) - pick_point).length() \
+    > config.SPECULATIVE_PICK_DRIFT
+
@@ -8,6 +8,9 @@ Only one active: receiving keyboard events.
 Generally, when the pointer is in a TextMorph.
 
 Note distinction between TextMorph and TextGlyph
+
+The registry is weak: a select is owned by its TextEditMorph, not by the registry,
+so deleting the morph frees its select and text glyph.
 '''
 '''
 Copyright 2010, 2011 Lloyd Konneker
@@ -20,9 +23,10 @@ the Free Software Foundation, either version 3 of the License, or
 (at your option) any later version.
 '''
 
+import weakref
 from decorators import *
 
-text_select = {}  # TextGlyph -> TextSelectControl
+text_select = weakref.WeakValueDictionary()  # TextGlyph -> TextSelectControl, while the control lives
 active_text_select = None
 
 
@@ -19,6 +19,8 @@ import gui.manager.handle
 import layout
 from decorators import *
 import config
+import telemetry
+import sprite
 
 
 
@@ -55,9 +57,10 @@ class _HandleGroup(menu.ItemGroup):
     Specializes Menu: only draw the current item.
     !!! Overrides composite.draw() (but follows the template.)
     '''
+    telemetry.frames.visited += 1
     self.style.put_to(context)
     # !!! Only draw the active one of my items.
-    self.bounds = self[self.active_index].draw(context)
+    self.bounds = sprite.draw(self[self.active_index], context)
     return self.bounds
     
   @dump_event
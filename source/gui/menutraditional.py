@@ -16,7 +16,10 @@ import menu
 from decorators import *
 import layout
 import base.vector as vector
+import base.bounds as bounds
 import config
+import telemetry
+import sprite
 
 class MenuGroup(menu.ItemGroup):
   '''
@@ -46,6 +49,21 @@ class MenuGroup(menu.ItemGroup):
     self.layout_spec = layout.LayoutSpec(event, benchmark, menu_vect, opening_item=0)
 
     
+  @transforming
+  def draw(self, context):
+    '''
+    Draw items from sprite cache.
+    !!! Overrides composite.draw() (but follows the template.)
+    '''
+    telemetry.frames.visited += 1
+    self.style.put_to(context)
+    union_bounds = bounds.Bounds()  # null
+    for item in self:
+      union_bounds = union_bounds.union(sprite.draw(item, context))
+    self.bounds = union_bounds
+    return self.bounds.copy()
+
+    
   @dump_event
   def layout(self, event=None):
     '''
@@ -22,6 +22,7 @@ the Free Software Foundation, either version 3 of the License, or
 (at your option) any later version.
 '''
 
+from gtk import gdk
 import gui.control
 import gui.manager.textselect
 from decorators import *
@@ -35,8 +36,9 @@ class TextSelectControl(gui.control.GuiControl):
     gui.control.GuiControl.__init__(self)
     
     # selection in units of glyph (character) index
-    self.start_index = 0
-    self.end_index = 0
+    # Initially an insertion bar at end of text
+    self.start_index = len(textglyph.buffer)
+    self.end_index = self.start_index
     # a selection has-a text morph, belongs to it
     self.text_glyph = textglyph
     # a manager maps text to its textselectcontrol etc.
@@ -61,9 +63,10 @@ class TextSelectControl(gui.control.GuiControl):
     Translate and scale the text selection.
     Self is morph transformer of IB.
     '''
-    # Get position of IB relative to TextMorph origin.
-    ## position = self.text_glyph.insertion_position()
-    position = vector.Vector(0.1,0.1)
+    # Get position of IB relative to TextMorph origin, from cached layout.
+    position = self.text_glyph.insertion_position(self.end_index)
+    if position is None:  # Text not laid out yet
+      position = vector.Vector(0.1,0.1)
     self.translation = position
     # !!!  scale and translation is some fraction of the TextMorph unit?
     self.scale = vector.Vector(0.1,0.1)
@@ -127,13 +130,26 @@ class TextSelectControl(gui.control.GuiControl):
     Replace select with key in the text.
     Move the select to following the key in the text.
     '''
-    # FIXME for now append to text glyph
-    self.text_glyph.text += event.string
-    
-    # This control probably move and possibly resize.
-    # FIXME
-    
-    # FIXME relayout changed text (with invalidation)
+    # Text might have been replaced (set_text) since selection was made
+    length = len(self.text_glyph.buffer)
+    self.start_index = min(self.start_index, length)
+    self.end_index = min(self.end_index, length)
+    name = gdk.keyval_name(event.keyval)
+    if name == "BackSpace":
+      if self.start_index == self.end_index: # insertion bar deletes previous character
+        self.start_index = max(0, self.start_index - 1)
+      text = u""
+    elif name in ("Return", "KP_Enter"):
+      text = u"\n"  # Paragraph break.  event.string is "\r"
+    else:
+      text = event.string.decode('utf-8') # Indexes are of characters
+    if text or self.start_index != self.end_index:
+      self.text_glyph.replace(self.start_index, self.end_index, text)
+    self.start_index += len(text)
+    self.end_index = self.start_index
+    # Text glyph re-laid out and invalidated the changed paragraphs.
+    # This control moves.
+    self.position_selection()
     
 
 
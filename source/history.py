@@ -0,0 +1,336 @@
+'''
+Undo/redo history of changes to the document (the model.)
+
+History is of deltas, not snapshots of the document:
+- TransformDelta: the transform specs (translation, scale, rotation) of a morph, before and after
+- StyleDelta: the style fields of a morph, before and after
+- Splice: members inserted into or removed from a group, at an index
+
+Deltas are recorded:
+- for every view_altering call on a drawable in the model (not on controls, nor the top:
+  the top's transform is the viewing transform, not the document.)
+  See begin_change(), end_change(), called by decorators.view_altering.
+- for specs altered directly, not by view_altering calls, by record_change() (e.g. bulk operations.)
+- for tree splices, by the code that splices (Morph.insert(), edit.do_cut().)
+
+A Splice refers to the removed members themselves (structural sharing):
+they are not copied, so memory is proportional to what changed, not to the document.
+
+A step is the list of deltas of one user action, undone together.
+A group (begin_group(), end_group()) makes one step, e.g. of a drag or a bulk operation.
+Within a group, successive transform or style deltas on the same morph coalesce into one,
+e.g. the hundreds of motion events of a drag.
+
+Undo and redo invalidate only the bounds of the affected morphs, as drawn and as will be drawn.
+
+The history holds at most UNDO_LIMIT steps; older steps are forgotten.
+
+Listeners (add_listener()) are told of every change of the document:
+recorded deltas, and their undo and redo,
+and view_altering calls that are not recorded (on a drawable that is not a morph, or nested.)
+Other changes that are not recorded (e.g. typing, import) are told by note_change().
+Replay listeners (add_replay_listener()) are called before every undo and redo.
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import collections
+import base.vector as vector
+import config
+
+import logging
+my_logger = logging.getLogger('pensool')
+
+
+class TransformDelta(object):
+  ''' Change of transform specs of a morph. '''
+  __slots__ = ('morph', 'before', 'after')
+
+  def __init__(self, morph, before, after):
+    self.morph = morph
+    self.before = before
+    self.after = after
+
+  @staticmethod
+  def spec(morph):
+    ''' Compact transform specs of morph. '''
+    return (morph.translation.x, morph.translation.y, morph.scale.x, morph.scale.y, morph.rotation)
+
+  def _apply(self, spec):
+    x, y, scale_x, scale_y, rotation = spec
+    self.morph.invalidate_as_drawn()
+    self.morph.set_transform(vector.Vector(x, y), vector.Vector(scale_x, scale_y), rotation)
+    self.morph.invalidate_will_draw()
+
+  def undo(self):
+    self._apply(self.before)
+
+  def redo(self):
+    self._apply(self.after)
+
+
+class StyleDelta(TransformDelta):
+  ''' Change of style fields of a morph. '''
+  __slots__ = ()
+
+  @staticmethod
+  def spec(morph):
+    style = morph.style
+    return (style.pen_width, style.color, style.filled)
+
+  def _apply(self, spec):
+    style = self.morph.style
+    self.morph.invalidate_as_drawn()
+    style.pen_width, style.color, style.filled = spec
+    self.morph.invalidate_will_draw()
+
+
+class Splice(object):
+  ''' Members inserted into (or removed from) a group at an index. '''
+  __slots__ = ('group', 'index', 'members', 'inserted')
+
+  def __init__(self, group, index, members, inserted):
+    self.group = group
+    self.index = index
+    self.members = list(members)
+    self.inserted = inserted
+
+  def _insert(self):
+    for offset, member in enumerate(self.members):
+      list.insert(self.group, self.index + offset, member)
+      # Relink parents, which later splices (e.g. of a branch) may have changed.
+      member.parent = self.group
+      for item in member:
+        item.parent = member
+      member.invalidate_will_draw()
+    self.group.members_changed()
+
+  def _remove(self):
+    for member in self.members:
+      member.invalidate_as_drawn()
+    del self.group[self.index:self.index + len(self.members)]
+
+  def undo(self):
+    if self.inserted:
+      self._remove()
+    else:
+      self._insert()
+
+  def redo(self):
+    if self.inserted:
+      self._insert()
+    else:
+      self._remove()
+
+
+# Global state
+_undo_steps = collections.deque(maxlen=config.UNDO_LIMIT)
+_redo_steps = []
+_group = None # step being grouped, or None
+_group_depth = 0
+_change_depth = 0 # depth of nested view_altering calls
+_replaying = False  # undoing or redoing: record nothing
+_listeners = [] # callables of a changed drawable, e.g. copies of the model to update
+_replay_listeners = [] # callables before an undo or redo, e.g. to end an unfinished change
+
+
+def _is_document(drawable):
+  ''' Is drawable in the model, but not the top? '''
+  model = getattr(config.scheme, 'model', None)  # None while app is built
+  if drawable is model:
+    return False
+  while drawable is not None:
+    if drawable is model:
+      return True
+    drawable = getattr(drawable, 'parent', None)
+  return False
+
+
+def index_of(group, member):
+  ''' Index of member in group, by identity (list.index() compares composites by value.) '''
+  for index, item in enumerate(group):
+    if item is member:
+      return index
+  raise ValueError("Not a member")
+
+
+def add_listener(func):
+  ''' Call func(drawable) on every change of a drawable of the document. '''
+  _listeners.append(func)
+
+
+def add_replay_listener(func):
+  '''
+  Call func() before every undo and redo,
+  e.g. to stop a change in progress (an import) that would alter the document under the replay.
+  '''
+  _replay_listeners.append(func)
+
+
+def note_change(drawable):
+  ''' Tell listeners that drawable changed.  For a splice, drawable is the group. '''
+  for listener in _listeners:
+    listener(drawable)
+
+
+def _changed(delta):
+  if isinstance(delta, Splice):
+    note_change(delta.group)
+  else:
+    note_change(delta.morph)
+
+
+def record(delta):
+  ''' Record a delta of the document, as its own step or in the open group. '''
+  if _replaying:
+    return
+  _changed(delta)
+  del _redo_steps[:]
+  if _group is None:
+    _undo_steps.append([delta])
+    return
+  if _group:
+    last = _group[-1]
+    if type(last) is type(delta) and not isinstance(delta, Splice) \
+        and last.morph is delta.morph:
+      last.after = delta.after  # Coalesce
+      return
+  _group.append(delta)
+
+
+def record_splice(group, index, members, inserted):
+  ''' Record members inserted into or removed from group at index. '''
+  if _is_document(group) or group is config.scheme.model:
+    record(Splice(group, index, members, inserted))
+
+
+def begin_group():
+  ''' Begin a step of many deltas.  Groups nest. '''
+  global _group, _group_depth
+  if not _group_depth:
+    _group = []
+  _group_depth += 1
+
+
+def end_group():
+  global _group, _group_depth
+  assert _group_depth > 0
+  _group_depth -= 1
+  if not _group_depth:
+    if _group:
+      _undo_steps.append(_group)
+    _group = None
+
+
+def begin_change(drawable):
+  '''
+  A view_altering call on drawable begins.
+  Return the specs of drawable before (None if not recorded), or None if not in the document.
+  Only the outermost of nested view_altering calls on morphs records.
+  '''
+  global _change_depth
+  _change_depth += 1
+  if _replaying or not _is_document(drawable):
+    return None
+  if _change_depth > 1 or not hasattr(drawable, 'translation'):
+    return (drawable, None, None)
+  return (drawable, TransformDelta.spec(drawable), StyleDelta.spec(drawable))
+
+
+def end_change(change):
+  ''' A view_altering call ends.  Record what it changed, else tell listeners. '''
+  global _change_depth
+  _change_depth -= 1
+  if change is None:
+    return
+  drawable, transform_before, style_before = change
+  if transform_before is None:
+    note_change(drawable)
+    return
+  record_change(drawable, (transform_before, style_before))
+
+
+def specs(morph):
+  ''' Transform and style specs of morph, to pass to record_change() after altering it. '''
+  return (TransformDelta.spec(morph), StyleDelta.spec(morph))
+
+
+def record_change(morph, before):
+  '''
+  Record what changed of morph since its specs() were before.
+  For code that alters specs directly, not by view_altering calls (e.g. bulk operations.)
+  '''
+  if _replaying or not _is_document(morph):
+    return
+  transform_before, style_before = before
+  transform_after = TransformDelta.spec(morph)
+  if transform_after != transform_before:
+    record(TransformDelta(morph, transform_before, transform_after))
+  style_after = StyleDelta.spec(morph)
+  if style_after != style_before:
+    record(StyleDelta(morph, style_before, style_after))
+
+
+def _replay(from_steps, to_steps, method):
+  global _replaying
+  for listener in _replay_listeners:
+    listener()
+  if not from_steps:
+    return False
+  step = from_steps.pop()
+  _replaying = True
+  try:
+    if method == 'undo':
+      for delta in reversed(step):
+        delta.undo()
+        _changed(delta)
+    else:
+      for delta in step:
+        delta.redo()
+        _changed(delta)
+  finally:
+    _replaying = False
+  to_steps.append(step)
+  return True
+
+
+def undo():
+  ''' Undo the last step.  Return False if none. '''
+  return _replay(_undo_steps, _redo_steps, 'undo')
+
+
+def redo():
+  ''' Redo the last undone step.  Return False if none. '''
+  return _replay(_redo_steps, _undo_steps, 'redo')
+
+
+def clear():
+  del _redo_steps[:]
+  _undo_steps.clear()
+
+
+def can_undo():
+  return len(_undo_steps) > 0
+
+
+def can_redo():
+  return len(_redo_steps) > 0
+
+
+# Commands, of the same signature as edit commands.
+def do_undo(operand=None, event=None):
+  if not undo():
+    my_logger.debug("Nothing to undo")
+
+
+def do_redo(operand=None, event=None):
+  if not redo():
+    my_logger.debug("Nothing to redo")
@@ -36,6 +36,7 @@ the Free Software Foundation, either version 3 of the License, or
 
 import base.vector as vector
 import cairo
+import config
 from decorators import *
 
 
@@ -75,16 +76,22 @@ class LayoutSpec(object):
     This limits sliding and follows controllee's curve.
     
     Algorithm: we know the cursor moved just a little.
-    Brute force search a pattern in the direction of movement,
-    looking for hits on the controllee.
+    Probe a point a little in the direction of movement,
+    and query the point on the controlee's edge nearest the probe, with its tangent.
+    One query (analytic for simple glyphs) instead of hit testing a pattern of points.
     '''
-    spot = find_new_hotspot(controlee, self, pixels_off_axis)
-    if spot:
-      # print "Hotspot old", self.hotspot, " new ", spot
-      self.hotspot = spot
-      # new hotspot engenders new axis, then benchmark
-      self.vector = controlee.get_orthogonal(spot)
-      self.benchmark = benchmark_from_hotspot(self.vector, spot)
+    matrix = make_slide_transform(self, pixels_off_axis)
+    probe = vector.Point(*matrix.transform_point(config.SLIDE_PROBE_DISTANCE, 0))
+    found = controlee.nearest_edge_point(probe)
+    if found and found.distance <= config.SLIDE_PROBE_TOLERANCE:
+      # print "Hotspot old", self.hotspot, " new ", found.point
+      self.hotspot = found.point
+      # new hotspot engenders new axis: normal to edge, on same side as before
+      axis = found.tangent.orthogonal(1)
+      if self.vector and axis.dot(self.vector) < 0:
+        axis = axis * -1
+      self.vector = axis
+      self.benchmark = benchmark_from_hotspot(self.vector, found.point)
     # else don't slide
 
 
@@ -108,29 +115,6 @@ def make_slide_transform(spec, pixels_off_axis):
   return m1 * m2
 
 
-#@dump_return
-def find_new_hotspot(controlee, spec, pixels_off_axis):
-  '''Returns new hotspot (intersection of menu axis and glyph) or None.'''
-
-  # Hit pattern is a line of pixels orthogonal to x-axis at distance 2
-  hit_pattern = (vector.Point(2,-2),
-    vector.Point(2,-1),
-    vector.Point(2,0),
-    vector.Point(2,1),
-    vector.Point(2,2))
-  
-  # Make transform of hit pattern to bring it into relation with menu
-  matrix = make_slide_transform(spec, pixels_off_axis)
-  
-  for point in hit_pattern:
-    transformed_point = vector.Point(*matrix.transform_point(point.x, point.y))
-    # transformed_point now in DCS
-    #print "Old hotspot", spec.hotspot, "Transformed", transformed_point
-    if controlee.in_path(transformed_point):
-      return transformed_point
-  return None
-
-
 #@dump_return
 def benchmark_from_hotspot(axis, hotspot):
   '''
@@ -0,0 +1,70 @@
+'''
+Level of detail: draw less of what is small on the device.
+
+When zoomed out, many morphs are smaller than a pixel.
+Policy, by device size of a subtree (see Composite.draw()):
+  smaller than LOD_CULL_SIZE: not drawn
+  smaller than LOD_BOX_SIZE: drawn as a filled box of its extents
+Text whose line height is smaller than LOD_GREEK_TEXT_SIZE
+is drawn as greeked bars, without pango layout (see TextGlyph.draw()).
+
+Device size is estimated from the subtree's extents in its local coords,
+cached when it was last drawn in full,
+and mapped to the device by the current transform.
+A subtree not yet drawn in full is drawn in full.
+
+Only when drawing to a view: ports that print or save draw everything.
+ViewPort sets enabled while drawing the model.
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import base.bounds as bounds
+
+enabled = False
+
+GREEK_CHARACTER_WIDTH = 0.5
+''' Average width of a character as a fraction of line height, for greeking text. '''
+
+
+def local_extents(context, device_bounds):
+  '''
+  Return extents (minx, miny, maxx, maxy) in user coords of context
+  of bounds in device coords.
+  '''
+  points = [context.device_to_user(corner.x, corner.y) for corner in device_bounds]
+  xs = [point[0] for point in points]
+  ys = [point[1] for point in points]
+  return (min(xs), min(ys), max(xs), max(ys))
+
+
+def device_bounds(context, extents):
+  ''' Return Bounds in device coords of extents in user coords of context. '''
+  minx, miny, maxx, maxy = extents
+  points = [context.user_to_device(x, y) for x in (minx, maxx) for y in (miny, maxy)]
+  xs = [point[0] for point in points]
+  ys = [point[1] for point in points]
+  return bounds.Bounds().from_extents(min(xs), min(ys), max(xs), max(ys))
+
+
+def device_size(context, extents):
+  ''' Return larger of device width and height of extents in user coords. '''
+  minx, miny, maxx, maxy = extents
+  points = [context.user_to_device(x, y) for x in (minx, maxx) for y in (miny, maxy)]
+  xs = [point[0] for point in points]
+  ys = [point[1] for point in points]
+  return max(max(xs) - min(xs), max(ys) - min(ys))
+
+
+def device_distance(context, distance):
+  ''' Return length in device coords of a vertical distance in user coords. '''
+  dx, dy = context.user_to_device_distance(0, distance)
+  return (dx * dx + dy * dy) ** 0.5
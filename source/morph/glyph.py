@@ -18,6 +18,8 @@ import drawable
 from math import pi as PI
 import base.orthogonal as orthogonal
 import base.vector as vector
+import base.nearest as nearest
+import base.transform as transform
 from decorators import *
 import style  # set_line_width
 from config import *
@@ -67,6 +69,10 @@ class Glyph(drawable.Drawable):
       return None
     # Assert a context.restore() soon follows.
     
+  def to_device(self, x, y):
+    ''' Return DCS point of my unit coords, by parent retained transform. '''
+    return vector.Vector(*self.parent.retained_transform.transform_point(x, y))
+    
   def cleanse(self):
     # No transforms to cleanse
     return
@@ -96,6 +102,10 @@ class PointGlyph(Glyph):
     '''
     return vector.UNIT_Y_AXIS
     
+  def nearest_edge_point(self, point):
+    ''' The point itself.  Tangent arbitrary, consistent with get_orthogonal(). '''
+    return nearest.segment(point, self.to_device(0, 0), self.to_device(0, 0))
+    
 
 
 class LineGlyph(Glyph):
@@ -127,6 +137,10 @@ class LineGlyph(Glyph):
     x, y = self.parent.retained_transform.transform_point(1.0,0)
     point2 = vector.Vector(x,y)
     return orthogonal.line_orthogonal(point1, point2)
+    
+  def nearest_edge_point(self, point):
+    ''' Analytic: affine transform maps line to line. '''
+    return nearest.segment(point, self.to_device(0, 0), self.to_device(1.0, 0))
 
 
 
@@ -142,6 +156,11 @@ class RectGlyph(Glyph):
   def get_orthogonal(self, point):
     # FIXME, should be the rotated glyph?
     return orthogonal.rect_orthogonal(self.bounds, point)
+    
+  def nearest_edge_point(self, point):
+    ''' Analytic: sides are lines. '''
+    corners = [self.to_device(x, y) for x, y in ((0, 0), (1.0, 0), (1.0, 1.0), (0, 1.0))]
+    return nearest.polyline(point, corners, closed=True)
       
     
 class CircleGlyph(Glyph):
@@ -153,6 +172,22 @@ class CircleGlyph(Glyph):
     context.arc(0.5, 0.5, 0.5, 0, 2.0*PI)
 
   
+  def nearest_edge_point(self, point):
+    '''
+    Analytic: radial projection in my unit coords, mapped to DCS.
+    When transform is not uniform (an ellipse in DCS) the radial projection
+    is near but not exactly the nearest point, which suffices for following the edge.
+    '''
+    to_local = transform.copy(self.parent.retained_transform)
+    to_local.invert()
+    local_point = vector.Vector(*to_local.transform_point(point.x, point.y))
+    local = nearest.circle(local_point, vector.Vector(0.5, 0.5), 0.5)
+    on_edge = self.to_device(local.point.x, local.point.y)
+    tangent = vector.Vector(*self.parent.retained_transform.transform_distance(
+      local.tangent.x, local.tangent.y)).normal()
+    return nearest.Nearest(on_edge, (vector.Vector(point.x, point.y) - on_edge).length(), tangent)
+
+  
   @dump_return
   def get_orthogonal(self, point):
     '''
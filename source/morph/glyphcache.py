@@ -0,0 +1,89 @@
+'''
+Glyph outline cache: outlines of laid out paragraphs, shared by all text glyphs.
+
+context.layout_path() makes a fresh outline of every glyph on every draw and pick.
+Instead, the outline of a laid out paragraph is made once by layout_path(),
+so with pango's kerning, ligatures and shaping, copied (copy_path()),
+and appended to the context on later draws and picks.
+
+Outlines are keyed by what pango lays out from: font description, width, and text of the paragraph.
+PyGTK does not expose pango glyph ids, and a paragraph is the smallest run
+that keeps the shaping between its glyphs.
+Text of the same font and width shares outlines (e.g. copies of a text morph);
+after an edit, only the edited paragraph misses.
+
+Outlines are made on a scratch context of unit transform, so are in the units of the layout.
+
+Evicts least recently used outlines, capped by GLYPH_OUTLINE_CACHE_BYTES (zero disables.)
+Hit rate and memory are reported in frame telemetry as "glyph_outlines".
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import cairo
+import pangocairo
+import base.lru as lru
+import config
+import telemetry
+
+PATH_ELEMENT_BYTES = 40
+''' Estimate of memory per element of a cairo path (a move, line, curve, or close.) '''
+
+
+class GlyphOutlineCache(object):
+  ''' Cache of outlines of laid out paragraphs. '''
+
+  def __init__(self, capacity):
+    self.cache = lru.LRUCache(capacity)
+    self._scratch = None  # context for making outlines, created lazily
+
+  def _scratch_context(self):
+    if self._scratch is None:
+      surface = cairo.ImageSurface(cairo.FORMAT_A8, 1, 1)
+      self._scratch = pangocairo.CairoContext(cairo.Context(surface))
+    return self._scratch
+
+
+  def outline(self, layout):
+    ''' Return path of layout, relative to its top left. '''
+    font = layout.get_font_description() or layout.get_context().get_font_description()
+    text = layout.get_text()
+    key = (font.to_string(), layout.get_width(), layout.get_wrap(), text)
+    path = self.cache.get(key)
+    if path is None:
+      context = self._scratch_context()
+      context.new_path()
+      context.move_to(0, 0)
+      context.layout_path(layout)
+      path = context.copy_path()
+      context.new_path()
+      self.cache.put(key, path, len(list(path)) * PATH_ELEMENT_BYTES + len(text))
+    return path
+
+
+  def put_layout_path_to(self, context, layout):
+    '''
+    Put path of layout to context, like context.layout_path(layout).
+    Top left of layout is the current point of context.
+    '''
+    if not self.cache.capacity:
+      context.layout_path(layout)
+      return
+    path = self.outline(layout)
+    x, y = context.get_current_point()
+    context.save()
+    context.translate(x, y)
+    context.append_path(path)
+    context.restore() # Path remains
+
+
+outlines = GlyphOutlineCache(config.GLYPH_OUTLINE_CACHE_BYTES)
+telemetry.frames.register_source("glyph_outlines", outlines.cache.stats)
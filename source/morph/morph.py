@@ -28,6 +28,8 @@ the Free Software Foundation, either version 3 of the License, or
 import composite
 import glyph
 import config # for scheme and bounding box
+import edgeindex
+import history
 import gui.manager.handle
 import base.vector as vector
 import base.orthogonal as orthogonal
@@ -43,6 +45,31 @@ class Morph(composite.Composite):
 
   def __init__(self, parent=None):
     composite.Composite.__init__(self, parent)
+    self.edge_index = None  # Built lazily.  See nearest_edges()
+    
+  def __setstate__(self, state):
+    composite.Composite.__setstate__(self, state)
+    self.edge_index = None
+    
+  def edge_index_steps(self):
+    ''' Generator: build my edge index if not current, in steps.  See edgeindex.py '''
+    if self.edge_index is None:
+      self.edge_index = edgeindex.EdgeIndex(self)
+    if not self.edge_index.is_current():
+      for step in self.edge_index.build_steps():
+        yield step
+        
+  def nearest_edges(self, point, radius=None, k=1):
+    '''
+    Return list of at most k edgeindex.EdgeHit within radius of point (DCS), nearest first.
+    Default radius is that of a pick.
+    Each hit has the glyph, its morph, distance, and nearest point and tangent.
+    '''
+    if radius is None:
+      radius = edgeindex.pick_radius()
+    for step in self.edge_index_steps():
+      pass
+    return self.edge_index.nearest(point, radius, k)
 
   """
   UNUSED
@@ -72,6 +99,7 @@ class Morph(composite.Composite):
       # Assert branch.transform is identity, branch.retained_transform is None
       
       # Rearrange parent of self
+      history.record_splice(parent, history.index_of(parent, self), [self], False)
       parent.remove(self) # break self, former child from parent
       # !!! But self.parent still points to parent
       branch.append(self) # self, former child of parent, now child of branch
@@ -83,10 +111,12 @@ class Morph(composite.Composite):
       # Assert branch.transform is identity, branch.retained_transform equals parents
       # Assert parent.transform and parent.retained_transform are untouched
       # print "branch retained", branch.retained_transform
+      history.record_splice(parent, len(parent) - 1, [branch], True)
       return branch
     else:
       print "...............Grouping with ", self
       self.append(morph)
+      history.record_splice(self, len(self) - 1, [morph], True)
       return self
 
   
@@ -168,6 +198,13 @@ class Morph(composite.Composite):
     return self.parent is None
   
   
+  @view_altering
+  def restyle(self, **attributes):
+    ''' Set attributes of my style, e.g. restyle(color=(1,0,0), filled=True). '''
+    for name, value in attributes.items():
+      setattr(self.style, name, value)
+  
+  
   @view_altering  
   @dump_event
   def set_by_drag(self, start_coords, event):
@@ -0,0 +1,174 @@
+'''
+Symbols: a definition subtree shared by many instances.
+
+Formerly each paste unpickled a full copy of the clipboard's subtree,
+so a document of many copies of one symbol held as many independent trees.
+Instead, pasting the same clipboard contents again makes another instance
+of one shared definition.
+The first paste after a cut or copy is still an ordinary copy,
+whose parts can be picked and edited.
+
+A Definition is a morph subtree, outside the model (its root has no parent.)
+An InstanceMorph is a morph in the model with its own transform (and style),
+which draws, picks, and puts the path of the definition within its transform.
+An instance can also have its own members, drawn after the definition.
+
+Since definitions are shared, so are their caches:
+level of detail extents (see lod.py), text outlines (see glyphcache.py),
+and, when a definition has at least SYMBOL_SPRITE_MIN_INSTANCES instances,
+sprites of its rendering at common scales (see sprite.py),
+so draw cost scales with unique definitions, not copies.
+
+The parts of a definition are not separately pickable or editable:
+picking any part picks the instance.
+
+Pickling an instance pickles its definition by key, with the subtree in case
+the definition is no longer registered (definitions are weakly registered.)
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import hashlib
+import pickle
+import weakref
+import morph
+import base.nearest as nearest
+import base.vector as vector
+import config
+import sprite
+from decorators import *
+
+
+class Definition(object):
+  ''' Shared subtree of instances, registered by key. '''
+  def __init__(self, key, root):
+    self.key = key
+    self.root = root
+    self.instances = weakref.WeakSet()
+
+  def __reduce__(self):
+    return (_definition, (self.key, self.root))
+
+
+definitions = weakref.WeakValueDictionary()  # key -> Definition, while instances refer to it
+last_pasted_key = None  # key of payload of the last paste, None after a cut or copy
+
+
+def _definition(key, root):
+  ''' Return registered definition of key, else register one of root. '''
+  definition = definitions.get(key)
+  if definition is None:
+    definition = Definition(key, root)
+    definitions[key] = definition
+  return definition
+
+
+def paste_from(payload):
+  '''
+  Return new morph of the pickled morph payload (e.g. clipboard contents.)
+  The first paste of a payload is an ordinary copy; repeated pastes are instances.
+  '''
+  global last_pasted_key
+  key = hashlib.sha1(payload).hexdigest()
+  if key != last_pasted_key:
+    last_pasted_key = key
+    return pickle.loads(payload)
+  return instance_from(payload, key)
+
+
+def clipboard_filled():
+  ''' A cut or copy filled the clipboard: the next paste is a copy. '''
+  global last_pasted_key
+  last_pasted_key = None
+
+
+def instance_from(payload, key):
+  '''
+  Return new InstanceMorph of the pickled morph payload, whose key is its hash.
+  The first time, unpickle a definition; thereafter share it.
+  A pickled instance unpickles as an instance of its own definition.
+  '''
+  definition = definitions.get(key)
+  if definition is None:
+    thing = pickle.loads(payload)
+    if isinstance(thing, InstanceMorph):
+      return thing
+    # Definition at origin of instance.  Keep its scale and rotation.
+    thing.translation = vector.Vector(0, 0)
+    thing.derive_transform()
+    definition = _definition(key, thing)
+  return InstanceMorph(definition)
+
+
+class InstanceMorph(morph.Morph):
+  ''' Morph that draws a shared definition within its own transform. '''
+
+  def __init__(self, definition, parent=None):
+    morph.Morph.__init__(self, parent)
+    self.definition = definition
+    definition.instances.add(self)
+
+  def __getstate__(self):
+    return (morph.Morph.__getstate__(self), self.definition)
+
+  def __setstate__(self, state):
+    morph_state, self.definition = state
+    morph.Morph.__setstate__(self, morph_state)
+    self.definition.instances.add(self)
+
+  def draw(self, context):
+    if len(self.definition.instances) >= config.SYMBOL_SPRITE_MIN_INSTANCES:
+      self.bounds = sprite.draw(self, context, self.draw_detailed)
+      return self.bounds.copy()
+    return self.draw_detailed(context)
+
+  @transforming
+  def draw_detailed(self, context):
+    ''' Draw definition, then my members.  Return bounds in DCS. '''
+    self.style.put_to(context)
+    union_bounds = self.definition.root.draw(context)
+    for item in self:
+      union_bounds = union_bounds.union(item.draw(context))
+    self.bounds = union_bounds
+    return self.bounds.copy()
+
+  @transforming
+  def put_path_to(self, context):
+    self.style.put_to(context)
+    self.definition.root.put_path_to(context)
+    for item in self:
+      item.put_path_to(context)
+
+  @transforming
+  def pick(self, context, point):
+    ''' Return self if definition hits point, else as Composite.pick(). '''
+    if self.definition.root.pick(context, point):
+      return self
+    for item in self:
+      picked = item.pick(context, point)
+      if picked:
+        return picked
+    return None
+
+  def retain(self, matrix, drawn_bounds=None):
+    morph.Morph.retain(self, matrix, drawn_bounds)
+    root = self.definition.root
+    root.retain(root.transform * matrix, drawn_bounds)
+
+  def nearest_edge_point(self, point):
+    '''
+    Return Nearest on edges of definition and members.
+    The definition's retained transforms are those of whichever instance was last drawn,
+    so retain them as drawn for me.
+    '''
+    self.retain(self.retained_transform)
+    return nearest.nearest([self.definition.root.nearest_edge_point(point)]
+      + [item.nearest_edge_point(point) for item in self])
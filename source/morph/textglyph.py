@@ -12,30 +12,145 @@ the Free Software Foundation, either version 3 of the License, or
 
 import drawable
 import glyph
+import history
+import cairo
 import pango
+import pangocairo
 from decorators import *
 import base.vector
+import base.bounds
+import base.transform
 import base.orthogonal as orthogonal
+import base.textbuffer as textbuffer
+import base.nearest as nearest
+import glyphcache
 import config
+import telemetry
+import lod
 
 import math
 
 
+_line_height = None
+
+def line_height():
+  ''' Height of a line of text in the default font, in user units. '''
+  global _line_height
+  if _line_height is None:
+    surface = cairo.ImageSurface(cairo.FORMAT_A8, 1, 1)
+    layout = pangocairo.CairoContext(cairo.Context(surface)).create_layout()
+    layout.set_text("X")
+    _line_height = layout.get_size()[1] / float(pango.SCALE)
+  return _line_height
+
+
+def _unicode(text):
+  ''' Text as unicode.  A str is UTF-8, as from gtk. '''
+  if isinstance(text, str):
+    return text.decode('utf-8')
+  return text
+
+
 class TextGlyph(glyph.Glyph):
   """
   A text glyph does layout to fit in its parent morph.
   
+  Layout is cached per paragraph, with the y offset of each paragraph.
+  An edit re-lays out only the changed paragraphs,
+  shifts the following paragraphs,
+  and invalidates only the changed paragraphs and the region that moved.
+  
   see GTK Reference Manual: pangocairo.CairoContext
   """
   
   def __init__(self, text):
     '''
-    !!! Override: extra attribute: text
+    !!! Override: extra attribute: text, in a buffer of unicode
     '''
-    self.text = text
+    self.buffer = textbuffer.TextBuffer(_unicode(text))
     # self.font = 
     drawable.Drawable.__init__(self) # super
-    self.layout = None  # cache the layout
+    self._clear_layouts()
+    
+  
+  def _clear_layouts(self):
+    ''' Forget cached layouts.  Next draw lays out all paragraphs. '''
+    count = self.buffer.paragraph_count()
+    self.layouts = [None] * count  # pango layout per paragraph, None if not laid out
+    self.heights = [0] * count  # height per paragraph in units of the drawing context
+    self.tops = [0] * (count + 1) # y offset per paragraph, last is bottom of text
+    self.layout_width = None  # width in pangounits the layouts are for
+    
+  
+  def __getstate__(self):
+    ''' Pickling.  Pango layouts are not picklable, they are cache. '''
+    state = glyph.Glyph.__getstate__(self)
+    for name in ("layouts", "heights", "tops", "layout_width"):
+      del state[name]
+    return state
+    
+  def __setstate__(self, state):
+    glyph.Glyph.__setstate__(self, state)
+    self._clear_layouts()
+    
+  
+  def get_text(self):
+    return unicode(self.buffer).encode('utf-8')
+    
+  def set_text(self, text):
+    self.buffer = textbuffer.TextBuffer(_unicode(text))
+    self._clear_layouts()
+    
+  text = property(get_text, set_text)
+  ''' Whole text as a UTF-8 string.  Copies: to edit, use replace(). '''
+  
+  
+  def replace(self, start, end, text):
+    '''
+    Replace text [start, end) (character indexes) with text (unicode, or a UTF-8 string.)
+    Return textbuffer.Change: which paragraphs changed.
+    
+    Re-layout changed paragraphs and invalidate what changed, if drawn.
+    '''
+    change = self.buffer.replace(start, end, _unicode(text))
+    history.note_change(self)
+    old_tops = self.tops
+    new_slice = slice(change.paragraph, change.paragraph + change.removed)
+    self.layouts[new_slice] = [None] * change.inserted
+    self.heights[new_slice] = [0] * change.inserted
+    if self.layout_width is not None: # Was laid out, i.e. drawn
+      context = self._context()
+      self._update_layouts(context)
+      self._invalidate_change(context, change, old_tops)
+    return change
+    
+    
+  def _context(self):
+    ''' Return new context transformed as for drawing.  See draw(). '''
+    context = config.viewport.user_context()
+    context.transform(self.parent.retained_transform)
+    context.scale(1.0/self.parent.scale.x, 1.0/self.parent.scale.y)  # inverse parent scale
+    return context
+    
+    
+  def _invalidate_change(self, context, change, old_tops):
+    '''
+    Invalidate changed paragraphs.
+    If their height changed, the following paragraphs moved: invalidate to bottom.
+    '''
+    top = self.tops[change.paragraph]
+    old_bottom = old_tops[change.paragraph + change.removed]
+    new_bottom = self.tops[change.paragraph + change.inserted]
+    if old_bottom == new_bottom:
+      bottom = new_bottom
+    else:
+      bottom = max(old_tops[-1], self.tops[-1])
+    width = float(self.layout_width) / pango.SCALE
+    corners = [context.user_to_device(x, y) for x in (0, width) for y in (top, bottom)]
+    xs = [corner[0] for corner in corners]
+    ys = [corner[1] for corner in corners]
+    changed_bounds = base.bounds.Bounds().from_extents(min(xs), min(ys), max(xs), max(ys))
+    config.viewport.invalidate_rect(changed_bounds.to_rect())
     
   
   # @dump_return
@@ -46,12 +161,18 @@ class TextGlyph(glyph.Glyph):
     This undoes scale transform of the immediate parent,
     but is still transformed by everything above in the hierarchy.
     '''
+    telemetry.frames.visited += 1
     context.save()
     context.scale(1.0/self.parent.scale.x, 1.0/self.parent.scale.y)  # inverse parent scale
     # assert the context is already translated to the proper origin
-    self.put_path_to(context)
+    if lod.enabled and lod.device_distance(context, line_height()) \
+        < config.LOD_GREEK_TEXT_SIZE:
+      self._put_greek_path_to(context)  # Too small to read
+    else:
+      self.put_path_to(context)
     
     self.bounds = self.get_stroke_bounds(context)
+    telemetry.frames.note_inked(self.bounds)
     # !!! Outline fonts invisible at some scales
     context.fill()
     """
@@ -80,12 +201,32 @@ class TextGlyph(glyph.Glyph):
     # self.font.put_to(context) # FIXME
     # With hierarchal modeling, glyph origin is (0,0).
     # Morph has transformed.  Note scale of text is (1,1)
-    context.move_to(0, 0) # TODO move this up
-    # FIXME Don't layout each time, only when text changes.
-    # Layout text to any new specifications
-    self.layout = self._layout(context)
-    # Put paths instead of text so path_extents will be right.
-    context.layout_path(self.layout)
+    self._update_layouts(context)
+    for layout, top in zip(self.layouts, self.tops):
+      context.move_to(0, top)
+      # Put paths instead of text so path_extents will be right.
+      glyphcache.outlines.put_layout_path_to(context, layout)
+  
+  
+  def _put_greek_path_to(self, context):
+    '''
+    Put bars approximating the lines of text, without layout.
+    Lines are estimated from length of paragraphs, at an average character width.
+    '''
+    height = line_height()
+    width = self._pango_width() / float(pango.SCALE)
+    per_line = max(1, int(width / (height * lod.GREEK_CHARACTER_WIDTH)))
+    top = 0
+    for paragraph in self.buffer.paragraphs:
+      remaining = len(paragraph)
+      while True:  # Even an empty paragraph is a line
+        length = min(remaining, per_line)
+        if length:
+          context.rectangle(0, top + height * 0.25, width * length / per_line, height * 0.5)
+        top += height
+        remaining -= length
+        if remaining <= 0:
+          break
   
   
   def put_path_to(self, context):
@@ -101,26 +242,61 @@ class TextGlyph(glyph.Glyph):
   def get_orthogonal(self, point):
     ''' Orthogonal to TextEdit is orthogonal to frame '''
     return orthogonal.rect_orthogonal(self.bounds, point)
+    
+  def nearest_edge_point(self, point):
+    '''
+    Nearest on my frame (the box of the laid out text), flattened to DCS, not on letters.
+    From the retained transform, not the drawn bounds: the frame may be rotated.
+    '''
+    context = config.viewport.user_context()
+    context.set_matrix(base.transform.copy(self.parent.retained_transform))
+    self._put_frame_path_to(context)
+    context.identity_matrix() # copy path in DCS
+    return nearest.nearest([nearest.polyline(point, points, closed)
+      for points, closed in drawable.path_polylines(context.copy_path_flat())])
+    
+  def get_edge_bounds(self, context, matrix):
+    ''' Bounds in DCS of my frame.  See nearest_edge_point(), Drawable.get_edge_bounds(). '''
+    context.new_path()
+    context.set_matrix(matrix)
+    self._put_frame_path_to(context)
+    return self.get_stroke_bounds(context)
+    
+  def _put_frame_path_to(self, context):
+    ''' Put the box of the laid out text, in my parent's transform. '''
+    context.scale(1.0/self.parent.scale.x, 1.0/self.parent.scale.y)  # As draw()
+    context.rectangle(0, 0, self._pango_width() / float(pango.SCALE), self.tops[-1])
 
    
-  # @dump_event
-  def _layout(self, context):
+  def _update_layouts(self, context):
     '''
-    Pango layout, for sophisticated text layout.
-    Note pycairo context already supports pango
+    Layout paragraphs not laid out, and shift following paragraphs.
+    If width changed, all paragraphs wrap anew.
     '''
-    ''' Layout seems to need a unit transform. '''
-    
-    # TODO persistent layout?
-    layout = context.create_layout()
+    pango_width = self._pango_width()
+    if pango_width != self.layout_width:
+      self.layouts = [None] * len(self.layouts)
+      self.layout_width = pango_width
+    first_changed = None
+    for index, layout in enumerate(self.layouts):
+      if layout is None:
+        layout = self._layout(context, self.buffer.paragraph(index))
+        self.layouts[index] = layout
+        self.heights[index] = layout.get_size()[1] / float(pango.SCALE)
+        if first_changed is None:
+          first_changed = index
+    if first_changed is None:
+      return
+    # Shift following paragraphs
+    tops = self.tops[:first_changed + 1]
+    for height in self.heights[first_changed:]:
+      tops.append(tops[-1] + height)
+    self.tops = tops
     
-    '''Layout parameters: wrap, width, text, font, etc.'''
-    layout.set_wrap(pango.WRAP_WORD)
-    # FIXME
-    # If user chose clipping to box
     
+  def _pango_width(self):
     ''' 
-    Set layout width in pangounits.
+    Return layout width in pangounits.
     1 device unit = pango.SCALE pangounits
     Width is DCS of the parent.
     '''
@@ -129,35 +305,48 @@ class TextGlyph(glyph.Glyph):
     parent_width_device, foo = self.parent.retained_transform.transform_distance(parent_width, parent_height)
     # print "Parent width device", parent_width_device, "parent", self.parent
     # Round up to int
-    pango_width = int(math.ceil(parent_width_device * pango.SCALE))  # Scale to pangounits.
-    layout.set_width( pango_width )
+    return int(math.ceil(parent_width_device * pango.SCALE))  # Scale to pangounits.
+    
     
-    layout.set_text(self.text)
+  # @dump_event
+  def _layout(self, context, text):
+    '''
+    Pango layout of one paragraph, for sophisticated text layout.
+    Note pycairo context already supports pango
+    '''
+    ''' Layout seems to need a unit transform. '''
+    
+    layout = context.create_layout()
+    
+    '''Layout parameters: wrap, width, text, font, etc.'''
+    layout.set_wrap(pango.WRAP_WORD)
+    # FIXME
+    # If user chose clipping to box
+    layout.set_width(self.layout_width)
+    layout.set_text(text.encode('utf-8')) # Pango indexes are of bytes of UTF-8
     return layout
     
     
   @dump_return
-  def insertion_position(self):
+  def insertion_position(self, index):
     '''
-    Return the offset of the selection.
-    Offset in local coordinate system GCS of the textmorph.
+    Return the position of the insertion bar before character index,
+    or None if not laid out yet.
+    Position in local coordinate system GCS of the textmorph.
     Used by the text_select_control to draw itself.
     
-    OLD Return user coords of insertion bar.
-    
-    FIXME for now, lower right corner.
-    More generally, the user can move it.
+    Reads the cached layout of the paragraph: does not layout.
     '''
-    ##layout = self._layout(context)
-    
-    # If laid out already, use cached layout
-    if self.layout:
-      size = base.vector.Point(* self.layout.get_pixel_size())  # size in user coords
-    else:
-      size = base.vector.Point(10,10)
-    return size  # OLD + self.get_drawn_origin()
-
-    ### print "IB cursor", layout.get_cursor_pos(15)
+    paragraph, offset = self.buffer.locate(index)
+    layout = self.layouts[paragraph]
+    if layout is None:
+      return None
+    byte_offset = len(self.buffer.paragraph(paragraph)[:offset].encode('utf-8'))
+    rect = layout.index_to_pos(byte_offset)  # x, y, width, height in pangounits
+    x = rect[0] / float(pango.SCALE)
+    y = self.tops[paragraph] + rect[1] / float(pango.SCALE)
+    # Glyph draws with inverse parent scale.  Scale to unit coords of the textmorph.
+    return base.vector.Vector(x / self.parent.scale.x, y / self.parent.scale.y)
     
     
     
@@ -51,6 +51,10 @@ class TextMorph(morph.PrimitiveMorph):
     TODO hit detection on TextSelect control
     '''
     self.frame.put_edge_to(context)
+    
+  def nearest_edge_point(self, point):
+    ''' Like put_edge_to(): just the frame. '''
+    return self.frame.nearest_edge_point(point)
   
   
 class TextEditMorph(TextMorph):
@@ -0,0 +1,203 @@
+'''
+Output ports: printer and file.
+
+Separate from port.py so that the print, export and import machinery
+is imported only when first used, not at startup.  See controlinstances.py.
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import gtk
+import cairo
+import os
+import port
+import tilerender
+import history
+import base.alert as alert
+
+import logging
+my_logger = logging.getLogger('pensool')
+
+
+class PrinterPort(port.Port):
+  '''
+  A Port on a printer-like device
+  
+  Understands pagination.
+  '''
+  def __init__(self):
+    self.settings = None
+    self.importer = None  # svgimport.Importer of the last import
+    port.Port.__init__(self)
+    # An import in progress would fill a group that an undo removes
+    history.add_replay_listener(self.cancel_import)
+    
+  def begin_print(self, operation, print_context):
+    # TODO divide the model into pages
+    operation.set_n_pages(1)
+  
+  def draw_page(self, operation, print_context, page_number):
+    ''' On a printer '''
+    context = print_context.get_cairo_context()
+    self.draw_model(context)
+    
+  def do_print(self, *args):
+    # print_op is ephemeral 
+    print_op = gtk.PrintOperation()
+
+    if self.settings != None: 
+      print_op.set_print_settings(self.settings)
+
+    print_op.connect("begin_print", self.begin_print)
+    print_op.connect("draw_page", self.draw_page)
+
+   
+    # Second parameter is the parent widget of the print dialog.
+    # Here None means top level, ie not a child of the app window or view.
+    # port.surface did not work.
+    res = print_op.run(gtk.PRINT_OPERATION_ACTION_PRINT_DIALOG, None)
+    
+    # Signals are emitted here at the conclusion of the print dialog
+
+    if res == gtk.PRINT_OPERATION_RESULT_APPLY:
+        self.settings = print_op.get_print_settings()
+    
+    
+    
+    
+class FilePort(port.Port):
+  '''
+  A Port on a file-like device
+  
+  Understands what file formats we support,
+  there is a different surface for each format.
+  '''
+  def __init__(self):
+    self.settings = None
+    port.Port.__init__(self)
+  
+  
+  def _context_for_surface(self, surface):
+    ''' See context_for_surface(). '''
+    return port.context_for_surface(surface)
+
+
+  def do_save(self, * args):
+    filename = self.ask_save_filename()
+    # TODO other surfaces png, svg, pdf
+    if filename is not None:
+      save_file, extension = os.path.splitext(filename)
+      
+      try:
+        if extension == ".svg":
+          surface = cairo.SVGSurface(filename, 200, 200)
+          self.draw_model(self._context_for_surface(surface))
+          # Note differs from png: no write_to_svg()
+        elif extension == ".png":
+          surface = cairo.ImageSurface(cairo.FORMAT_RGB24, 200, 200)
+          context = self._context_for_surface(surface)
+          if not tilerender.enabled() or not tilerender.renderer().render(context,
+              (0, 0, surface.get_width(), surface.get_height()), False):
+            self.draw_model(context)
+          try:
+            surface.write_to_png(filename)
+          except IOError:
+            alert.critical_dialog("IO error.")
+            return
+        # width_in_points, height_in_points)
+        else:
+          alert.warning_dialog("Unsupported file extension: " + extension)
+          my_logger.debug("Unsupported extension.")
+          return
+      except MemoryError:
+        alert.critical_dialog("Out of memory.  You should save and restart now.")
+        return
+      surface.finish()
+      my_logger.debug("File saved.")
+    
+    
+  def do_import(self, *args):
+    ''' Import an SVG file into the model, progressively.  See svgimport.py. '''
+    filename = self.ask_filename("Import..", gtk.FILE_CHOOSER_ACTION_OPEN, gtk.STOCK_OPEN,
+      "image/svg+xml", "*.svg")
+    if filename is not None:
+      import svgimport
+      self.cancel_import() # One import at a time
+      try:
+        self.importer = svgimport.Importer(filename, self.model)
+      except IOError:
+        alert.critical_dialog("IO error.")
+        return
+      self.importer.start()
+      
+      
+  def cancel_import(self, *args):
+    ''' Stop the import in progress, if any.  What was imported remains, and can be undone. '''
+    if self.importer is not None:
+      if self.importer.is_running():
+        self.importer.cancel()
+        my_logger.debug("SVG import canceled")
+      self.importer = None
+      
+      
+  def ask_filename(self, title, action, stock_button, mime_type, pattern):
+    ''' Ask user for a filename by a dialog with one filter.  Return None if canceled. '''
+    dialog = gtk.FileChooserDialog(title, None, action,
+      (gtk.STOCK_CANCEL, gtk.RESPONSE_CANCEL, stock_button, gtk.RESPONSE_OK))
+    dialog.set_default_response(gtk.RESPONSE_OK)
+    filter = gtk.FileFilter()
+    filter.add_mime_type(mime_type)
+    filter.add_pattern(pattern)
+    dialog.add_filter(filter)
+    response = dialog.run()
+    if response == gtk.RESPONSE_OK:
+      filename = dialog.get_filename()
+    else:
+      filename = None
+    dialog.destroy()
+    return filename
+    
+    
+  def ask_save_filename(self):
+    
+    if gtk.pygtk_version < (2,3,90):
+      alert.critical_dialog( "PyGtk 2.3.90 or later required" )
+      return None
+   
+    dialog = gtk.FileChooserDialog("Save..",
+                                     None,
+                                     gtk.FILE_CHOOSER_ACTION_SAVE,
+                                     (gtk.STOCK_CANCEL, gtk.RESPONSE_CANCEL,
+                                      gtk.STOCK_SAVE, gtk.RESPONSE_OK))
+    dialog.set_default_response(gtk.RESPONSE_OK)
+   
+    filter = gtk.FileFilter()
+    filter.set_name("All files")
+    filter.add_pattern("*")
+    dialog.add_filter(filter)
+    
+    filter = gtk.FileFilter()
+    filter.set_name("Images")
+    filter.add_mime_type("image/png")
+    filter.add_mime_type("image/svg")
+    filter.add_mime_type("image/pdff")
+    filter.add_pattern("*.png")
+    filter.add_pattern("*.svg")
+    filter.add_pattern("*.pdf")
+    dialog.add_filter(filter)
+    
+    response = dialog.run()
+    if response == gtk.RESPONSE_OK:
+      filename = dialog.get_filename()
+    elif response == gtk.RESPONSE_CANCEL:
+      filename = None
+    dialog.destroy()
+    return filename
@@ -23,6 +23,8 @@ You should have received a copy of the GNU General Public License
 along with Pensool.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
+import startup # first, to time startup
+import gobject
 import gtk
 from gtk import gdk
 
@@ -39,10 +41,9 @@ import gui.manager.control
 import gui.backgroundcontrol
 import port
 import config
+import gcpolicy
 import scheme
-
-# comment this out if you prefer stderr for exceptions
-import share.gui_gtkexcepthook  # show dialog on exception
+import watchdog
 
 import collections
 Rectangle = collections.namedtuple('Rectangle', 'x y width height')
@@ -63,6 +64,12 @@ except Exception as detail:
   
 # create logger as configured by file
 mylogger = logging.getLogger("pensool")
+startup.mark("imports")
+
+
+def install_excepthook():
+  # comment this out if you prefer stderr for exceptions
+  import share.gui_gtkexcepthook  # show dialog on exception
 
 
   
@@ -103,29 +110,51 @@ def main():
 
   # Can draw to several ports.
   a_view = port.ViewPort(da)
-  a_printerport = port.PrinterPort()
-  a_fileport = port.FilePort()
 
+  window.show_all() # Show now so allocation becomes valid
+  startup.mark("window")
+  
+  build_app(a_view)
+  make_test_doc()
+  gcpolicy.document_loaded()
+  startup.mark("document")
+  da.connect_after("expose_event", lambda *args: startup.first_frame())
+  startup.defer(install_excepthook)
+  startup.defer(watchdog.start)
+  
+  if config.WATCHDOG_THRESHOLD:
+    gobject.threads_init()  # Before the main loop: so it releases the interpreter lock for the watchdog
+  gtk.main()
+
+
+def build_app(a_view):
+  '''
+  Build the scheme, ports and controls on a view port.
+  The view's allocation must be valid.
+  Returns the view.
+  '''
   # global singletons
   config.viewport = a_view  
   config.scheme = scheme.Scheme() 
-
-  window.show_all() # Show now so allocation becomes valid
   
   gui.manager.control.control_manager = gui.manager.control.ControlsManager() # Enforces one control active
-  controlinstances.build_all(a_printerport, a_fileport) # build singleton controls
+  controlinstances.build_all() # build singleton controls needed at startup.  Menus are built later.
   gui.manager.control.control_manager.set_root_control(controlinstances.bkgd_control)
 
   # Initial active control is the background manager. Controlee is the bkgd_control itself.
   gui.manager.control.control_manager.activate_control(controlinstances.bkgd_control, controlinstances.bkgd_control)
 
   a_view.set_model(config.scheme.model)
-  a_printerport.set_model(config.scheme.model)
-  a_fileport.set_model(config.scheme.model)
+  return a_view
   
-  make_test_doc()
   
-  gtk.main()
+def build_headless_app(width=400, height=400):
+  '''
+  Build the app on a HeadlessViewPort, without a display or main loop.
+  Caller drives it by emitting events on the view's drawing area
+  and calling the view's expose().
+  '''
+  return build_app(port.HeadlessViewPort(width, height))
 
 
 def make_test_doc():
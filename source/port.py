@@ -10,17 +10,25 @@ the Free Software Foundation, either version 3 of the License, or
 (at your option) any later version.
 '''
 
+import math
+import time
 import pygtk
 import gtk
 import cairo  # for gtk drawing surface (pango is built in)
-import pangocairo # for print and save surfaces
-import os
+import pangocairo # for text on image surfaces
 import gui.manager.handle
 import style
 import base.vector as vector
+import base.bounds as bounds
+import base.timer as timer
+import base.transform as transform
 from decorators import *
-import base.alert as alert
 import config
+import telemetry
+import lod
+import renderstate
+import slicedrender
+import tilerender
 
 import logging
 my_logger = logging.getLogger('pensool')
@@ -43,7 +51,10 @@ class Port(object):
   '''
   def __init__(self):
     self.model = None
-    pass
+    self.damage_serial = 0
+    ''' Count of invalidations.  If unchanged, nothing has changed the view. '''
+    self.frame_serial = 0
+    ''' Count of frames drawn.  If unchanged, drawn bounds are unchanged. '''
     
   def set_model(self, model):
     self.model = model
@@ -89,13 +100,64 @@ class ViewPort(Port):
     # self.da.set_double_buffered(False)  # for animation TODO
     Port.__init__(self)
     self.style = style.Style()
+    self._init_buffers()
+    
+    
+  def _init_buffers(self):
+    # See draw_model_buffered()
+    self.model_buffer = None  # surface of last rendered model layer
+    self.zoom_frame = None  # while zooming, model buffer before zoom
+    self.zoom_frame_transform = None # viewing transform of zoom frame
+    self.zoom_timer = timer.Timer()
+    # See begin_batch()
+    self.batch_depth = 0
+    self.batch_damage = None  # union of rects invalidated in batch
+    # See slicedrender.py
+    self.sliced_render = slicedrender.SlicedRender(self)
+    self.model_draw_time = 0  # mSec of last draw of the model known to be full or slow
+    self.tiled = True  # Full redraws may be drawn in tiles by other processes.  See tilerender.py
   
   
   # TODO this might not be used
   # The alternative is to invalidate the scheme, which might be a smaller rect
   def invalidate(self):
     """ Queue expose event on entire port window"""
-    self.surface.invalidate_rect(self.da.allocation, False)
+    self.invalidate_rect(self.da.allocation)
+  
+  
+  def invalidate_rect(self, rect):
+    '''
+    Queue expose event on rect (a gdk.Rectangle in DCS) of port window.
+    Drawables invalidate through here, not directly on the surface.
+    '''
+    if self.batch_depth:
+      if self.batch_damage is None:
+        self.batch_damage = gtk.gdk.Rectangle(rect.x, rect.y, rect.width, rect.height)
+      else:
+        self.batch_damage = self.batch_damage.union(rect)
+      return
+    self.damage_serial += 1
+    telemetry.frames.note_invalidate(rect)
+    self.surface.invalidate_rect(rect, True)
+    
+    
+  def begin_batch(self):
+    '''
+    Begin a batch of invalidations, e.g. of a bulk operation on many morphs.
+    Until the matching end_batch(), invalidated rects are only unioned.
+    Batches nest.
+    '''
+    self.batch_depth += 1
+    
+    
+  def end_batch(self):
+    ''' End a batch.  Ending the outermost batch invalidates the union, once. '''
+    assert self.batch_depth > 0
+    self.batch_depth -= 1
+    if not self.batch_depth and self.batch_damage is not None:
+      damage = self.batch_damage
+      self.batch_damage = None
+      self.invalidate_rect(damage)
   
     
   def expose(self, widget, event):
@@ -110,25 +172,183 @@ class ViewPort(Port):
     '''
     # TODO event.area to clipping in context
     context = self.da.window.cairo_create()
+    self.draw_scheme(context)
+    
+    
+  def draw_scheme(self, context):
+    '''
+    Draw the scheme (controls and model) to context.
+    Common to all view ports, whatever their surface.
+    '''
+    context = renderstate.RenderState(context)  # Skip redundant state changes
     x1, y1, x2, y2 = context.clip_extents()
     # print "Clipping: UCS", x1, y1, x2, y2, "DCS", context.user_to_device(x1,y1), context.user_to_device(x2,x2)
     # print "Matrix: ", context.get_matrix()
+    telemetry.frames.begin_frame(int((x2 - x1) * (y2 - y1)),
+      bounds.Bounds().from_extents(x1, y1, x2, y2))
+    self.frame_serial += 1
     self.style.put_to(context)
     
     # Draw ephemeral controls untransformed
     for widget in config.scheme.widgets:
       widget.draw(context)
+    telemetry.frames.end_phase("widgets")
       
     # Draw model and persistent controls in transformed coords
     # view has no transformation.
     # The top level of the scheme has the viewing transformation.
     ## OLD context.set_matrix(self.matrix)
     config.scheme.transformed_controls.draw(context)
-    self.draw_model(context)
+    telemetry.frames.end_phase("transformed_controls")
+    lod.enabled = True  # Only views draw with less detail.
+    try:
+      if config.PROGRESSIVE_ZOOM:
+        self.draw_model_buffered(context)
+      else:
+        self.draw_model(context)
+    finally:
+      lod.enabled = False
+    telemetry.frames.end_phase("model")
     
     gui.manager.handle.draw()  # Draw handle set for any current morph
+    telemetry.frames.end_phase("handles")
+    telemetry.frames.end_frame()
 
   
+  def draw_model_buffered(self, context):
+    '''
+    Draw model layer into a buffer, then the buffer to context.
+    The buffer is the last rendered frame, for previews while zooming.
+    While zooming, draw the zoom frame transformed instead of the model.
+    '''
+    if self.zoom_frame is not None:
+      self._draw_zoom_preview(context)
+      return
+    allocation = self.da.allocation
+    fresh = False
+    if self.model_buffer is None or self.model_buffer.get_width() != allocation.width \
+        or self.model_buffer.get_height() != allocation.height:
+      self.model_buffer = cairo.ImageSurface(cairo.FORMAT_ARGB32, 
+        allocation.width, allocation.height)
+      fresh = True
+    x1, y1, x2, y2 = context.clip_extents()
+    # A full redraw is faster in tiles than sliced
+    tiled = self._is_tiled(x1, y1, x2, y2)
+    if not tiled and self._is_sliced(fresh):
+      # Show last frame, with any completed render
+      rect = (int(math.floor(x1)), int(math.floor(y1)),
+        int(math.ceil(x2) - math.floor(x1)), int(math.ceil(y2) - math.floor(y1)))
+      self.sliced_render.request(rect)
+    else:
+      # Redraw buffer within clip only, on a transparent background
+      start = time.time()
+      buffer_context = renderstate.RenderState(context_for_surface(self.model_buffer))
+      buffer_context.rectangle(x1, y1, x2 - x1, y2 - y1)
+      buffer_context.clip()
+      buffer_context.set_operator(cairo.OPERATOR_CLEAR)
+      buffer_context.paint()
+      buffer_context.set_operator(cairo.OPERATOR_OVER)
+      if tiled and tilerender.renderer().render(buffer_context,
+          (0, 0, allocation.width, allocation.height), True, self.style):
+        if self.sliced_render is not None:
+          self.sliced_render.cancel() # Superseded
+        # Work of the workers, not the elapsed time: estimates a draw in this process
+        self.note_model_draw_time(tilerender.renderer().draw_time,
+          (0, 0, allocation.width, allocation.height))
+      else:
+        self.draw_model(buffer_context)
+        self.note_model_draw_time((time.time() - start) * 1000, (x1, y1, x2 - x1, y2 - y1))
+    context.save()
+    context.set_source_surface(self.model_buffer, 0, 0)
+    context.paint()
+    context.restore()
+    
+    
+  def _is_sliced(self, fresh):
+    '''
+    Whether to draw the model by a sliced render (see slicedrender.py.)
+    Yes while one is pending, else if drawing the model is slow.
+    Not into a fresh model buffer: it has no last frame to show meanwhile.
+    '''
+    if self.sliced_render is None or not config.SLICED_RENDER:
+      return False
+    if fresh:
+      self.sliced_render.cancel()
+      return False
+    if self.sliced_render.rect is not None:
+      return True
+    return self.model_draw_time > config.SLICED_RENDER_THRESHOLD
+    
+    
+  def _is_tiled(self, x1, y1, x2, y2):
+    '''
+    Whether to draw the model in tiles by other processes (see tilerender.py.)
+    Yes for a full redraw (clip extents cover the view) if drawing the model in this process is slow.
+    '''
+    allocation = self.da.allocation
+    return self.tiled and self.model_draw_time > config.TILE_RENDER_THRESHOLD \
+      and x1 <= 0 and y1 <= 0 and x2 >= allocation.width and y2 >= allocation.height \
+      and tilerender.enabled()
+    
+    
+  def note_model_draw_time(self, milliseconds, rect):
+    '''
+    Note time to draw the model in rect (x, y, width, height.)
+    Only a draw of the whole view, or a slow one, tells how slow a full draw is.
+    '''
+    allocation = self.da.allocation
+    if milliseconds > config.SLICED_RENDER_THRESHOLD \
+        or (rect[2] >= allocation.width and rect[3] >= allocation.height):
+      self.model_draw_time = milliseconds
+    
+    
+  def _draw_zoom_preview(self, context):
+    '''
+    Draw zoom frame, transformed from its viewing transform to the current one.
+    A point in the frame maps: inverse of frame transform, then current transform.
+    '''
+    preview_matrix = transform.copy(self.zoom_frame_transform)
+    preview_matrix.invert()
+    preview_matrix = preview_matrix.multiply(config.scheme.model.transform)
+    context.save()
+    context.transform(preview_matrix)
+    context.set_source_surface(self.zoom_frame, 0, 0)
+    context.get_source().set_filter(cairo.FILTER_FAST)
+    context.paint()
+    context.restore()
+    
+    
+  def zoom_preview(self):
+    '''
+    Progressive zoom: call before a zoom step changes the viewing transform.
+    Until zooming settles, expose draws a scaled copy of the last rendered frame.
+    Each step restarts the settle timer, canceling any pending (stale) full render.
+    Return False if no preview is possible: caller must invalidate as usual.
+    '''
+    if not config.PROGRESSIVE_ZOOM:
+      return False
+    if self.zoom_frame is None:
+      if self.model_buffer is None:
+        return False
+      self.zoom_frame = self.model_buffer
+      self.model_buffer = None  # Full render will be to a new buffer
+      if self.sliced_render is not None:
+        self.sliced_render.cancel()
+      self.zoom_frame_transform = transform.copy(config.scheme.model.transform)
+    self.zoom_timer.cancel()
+    self.zoom_timer.start(config.PROGRESSIVE_ZOOM_SETTLE_TIME, self._zoom_settled_cb)
+    return True
+    
+    
+  def _zoom_settled_cb(self):
+    ''' Zooming settled.  Full render at next expose. '''
+    self.zoom_timer.cancel()  # One shot
+    self.zoom_frame = None
+    self.zoom_frame_transform = None
+    self.invalidate()
+    return False
+    
+  
   def user_context(self):
     # Return a context in user coords ie doc
     return self.da.window.cairo_create()
@@ -179,138 +399,169 @@ class ViewPort(Port):
 """
 
 
-class PrinterPort(Port):
+class DamageList(object):
   '''
-  A Port on a printer-like device
-  
-  Understands pagination.
+  Records invalidated rects, in lieu of a window that queues expose events.
+  Has the invalidate_rect() API of a gdk.Window.
   '''
   def __init__(self):
-    self.settings = None
-    Port.__init__(self)
+    self.rects = []
     
-  def begin_print(self, operation, print_context):
-    # TODO divide the model into pages
-    operation.set_n_pages(1)
+  def invalidate_rect(self, rect, invalidate_children=True):
+    # Copy: caller's rect might be reused
+    self.rects.append(gtk.gdk.Rectangle(rect.x, rect.y, rect.width, rect.height))
+    
+  def extents(self):
+    ''' Return union of damaged rects as a gdk.Rectangle, or None if no damage. '''
+    if not self.rects:
+      return None
+    return reduce(lambda r1, r2: r1.union(r2), self.rects)
+    
+  def clear(self):
+    self.rects = []
+    
+    
+class HeadlessDrawingArea(object):
+  '''
+  Stand-in for gtk.DrawingArea when there is no display.
   
-  def draw_page(self, operation, print_context, page_number):
-    ''' On a printer '''
-    context = print_context.get_cairo_context()
-    self.draw_model(context)
-    
-  def do_print(self, *args):
-    # print_op is ephemeral 
-    print_op = gtk.PrintOperation()
-
-    if self.settings != None: 
-      print_op.set_print_settings(self.settings)
-
-    print_op.connect("begin_print", self.begin_print)
-    print_op.connect("draw_page", self.draw_page)
-
-   
-    # Second parameter is the parent widget of the print dialog.
-    # Here None means top level, ie not a child of the app window or view.
-    # port.surface did not work.
-    res = print_op.run(gtk.PRINT_OPERATION_ACTION_PRINT_DIALOG, None)
+  Has the allocation and signal connection API that controls use.
+  Signals are not emitted by a window system, but by calling emit(),
+  e.g. from a replayer of recorded sessions.
+  '''
+  def __init__(self, width, height):
+    self.allocation = gtk.gdk.Rectangle(0, 0, width, height)
+    self._handlers = []   # list of (handler_id, signal, callback, is_after)
+    self._next_id = 1
     
-    # Signals are emitted here at the conclusion of the print dialog
-
-    if res == gtk.PRINT_OPERATION_RESULT_APPLY:
-        self.settings = print_op.get_print_settings()
+  def _connect(self, signal, callback, is_after):
+    handler_id = self._next_id
+    self._next_id += 1
+    # GTK accepts both "expose_event" and "expose-event"
+    self._handlers.append((handler_id, signal.replace("_", "-"), callback, is_after))
+    return handler_id
     
+  def connect(self, signal, callback):
+    return self._connect(signal, callback, False)
     
+  def connect_after(self, signal, callback):
+    return self._connect(signal, callback, True)
     
+  def disconnect(self, handler_id):
+    self._handlers = [handler for handler in self._handlers if handler[0] != handler_id]
     
-class FilePort(Port):
+  def emit(self, signal, event):
+    '''
+    Call handlers connected to signal, handlers connected after last.
+    Like GTK, stop when a handler returns True.
+    Return whether the event was handled.
+    '''
+    signal = signal.replace("_", "-")
+    # Copy: handlers may connect and disconnect during emission
+    handlers = [handler for handler in self._handlers if handler[1] == signal]
+    handlers.sort(key=lambda handler: handler[3])   # stable: befores, then afters
+    for handler_id, signal, callback, is_after in handlers:
+      if callback(self, event):
+        return True
+    return False
+    
+  def stop_emission(self, signal):
+    ''' Emission is synchronous here, nothing to stop. '''
+    pass
+    
+    
+class HeadlessViewPort(ViewPort):
   '''
-  A Port on a file-like device
+  A ViewPort without a display: draws on an in-memory image surface.
   
-  Understands what file formats we support,
-  there is a different surface for each format.
-  '''
-  def __init__(self):
-    self.settings = None
-    Port.__init__(self)
+  Same API as ViewPort, so the scheme, controls, picking and drawing
+  can be driven (e.g. by a replayer or benchmark) on a server with no display.
+  
+  Instead of a window queuing expose events, invalidated rects are recorded
+  in a damage list.  Caller calls expose() to draw the damage.
+  
+  To test:
+  python -m doctest -v port.py
+  
+  Examples:
   
+    >>> import pensool, benchmark
+    >>> view = pensool.build_headless_app(200, 200)
+    >>> view.invalidate()
+    >>> view.expose() is not None
+    True
+    
+    # Scroll-zoom after the first frame: expose previews the last frame
+    >>> scroll = benchmark.ReplayEvent("scroll-event", [100, 100, 0, 2])
+    >>> view.da.emit("scroll-event", scroll) is not None
+    True
+    >>> view.zoom_frame is not None, view.expose() is not None
+    (True, True)
+    >>> view.da.emit("scroll-event", scroll) is not None
+    True
+    
+    # Zooming settled: full render
+    >>> view._zoom_settled_cb()
+    False
+    >>> view.expose() is not None, view.zoom_frame is None, view.model_buffer is not None
+    (True, True, True)
+  '''
   
-  def _context_for_surface(self, surface):
+  def __init__(self, width=400, height=400):
+    # !!! Not ViewPort.__init__(), which needs a realized gtk.DrawingArea
+    Port.__init__(self)
+    self.da = HeadlessDrawingArea(width, height)
+    self.da.connect("expose_event", self.expose)
+    self.image = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+    self.surface = DamageList()
+    self.style = style.Style()
+    self._init_buffers()
+    self.sliced_render = None  # No idle callbacks without a main loop
+    self.tiled = False  # Deterministic, in one process
+    
+    
+  def expose(self, widget=None, event=None):
     '''
-    Note: GTK functions return a context that is Pango.
-    For other surfaces, you must get a cairo.Context(),
-    then turn it into a pangocairo.CairoContext().
-    IOW GTK surfaces yield contexts that support drawing text using pango,
-    but ordinary cairo.Contexts do NOT.
+    Draw the damaged area of the image, and clear the damage list.
+    Return the drawn area (a gdk.Rectangle) or None if nothing was damaged.
     '''
-    return pangocairo.CairoContext(cairo.Context(surface))
-
-
-  def do_save(self, * args):
-    filename = self.ask_save_filename()
-    # TODO other surfaces png, svg, pdf
-    if filename is not None:
-      save_file, extension = os.path.splitext(filename)
-      
-      try:
-        if extension == ".svg":
-          surface = cairo.SVGSurface(filename, 200, 200)
-          self.draw_model(self._context_for_surface(surface))
-          # Note differs from png: no write_to_svg()
-        elif extension == ".png":
-          surface = cairo.ImageSurface(cairo.FORMAT_RGB24, 200, 200)
-          self.draw_model(self._context_for_surface(surface))
-          try:
-            surface.write_to_png(filename)
-          except IOError:
-            alert.critical_dialog("IO error.")
-            return
-        # width_in_points, height_in_points)
-        else:
-          alert.warning_dialog("Unsupported file extension: " + extension)
-          my_logger.debug("Unsupported extension.")
-          return
-      except MemoryError:
-        alert.critical_dialog("Out of memory.  You should save and restart now.")
-        return
-      surface.finish()
-      my_logger.debug("File saved.")
-    
-    
-  def ask_save_filename(self):
-    
-    if gtk.pygtk_version < (2,3,90):
-      alert.critical_dialog( "PyGtk 2.3.90 or later required" )
+    area = self.surface.extents()
+    if area is None:
       return None
-   
-    dialog = gtk.FileChooserDialog("Save..",
-                                     None,
-                                     gtk.FILE_CHOOSER_ACTION_SAVE,
-                                     (gtk.STOCK_CANCEL, gtk.RESPONSE_CANCEL,
-                                      gtk.STOCK_SAVE, gtk.RESPONSE_OK))
-    dialog.set_default_response(gtk.RESPONSE_OK)
-   
-    filter = gtk.FileFilter()
-    filter.set_name("All files")
-    filter.add_pattern("*")
-    dialog.add_filter(filter)
-    
-    filter = gtk.FileFilter()
-    filter.set_name("Images")
-    filter.add_mime_type("image/png")
-    filter.add_mime_type("image/svg")
-    filter.add_mime_type("image/pdff")
-    filter.add_pattern("*.png")
-    filter.add_pattern("*.svg")
-    filter.add_pattern("*.pdf")
-    dialog.add_filter(filter)
-    
-    response = dialog.run()
-    if response == gtk.RESPONSE_OK:
-      filename = dialog.get_filename()
-    elif response == gtk.RESPONSE_CANCEL:
-      filename = None
-    dialog.destroy()
-    return filename
+    context = self.user_context()
+    context.rectangle(area.x, area.y, area.width, area.height)
+    context.clip()
+    # Erase to white, as a window background would be
+    context.set_source_rgb(1, 1, 1)
+    context.paint()
+    self.draw_scheme(context)
+    self.surface.clear()
+    return area
+    
+    
+  def user_context(self):
+    return context_for_surface(self.image)
+    
+  def controls_context(self):
+    return context_for_surface(self.image)
+    
+    
+  def write_to_png(self, filename):
+    ''' Save what has been drawn, e.g. for inspection or comparison. '''
+    self.image.write_to_png(filename)
+    
+    
+def context_for_surface(surface):
+  '''
+  Return a context on a cairo surface that supports drawing text.
+  
+  Note: GTK functions return a context that is Pango.
+  For other surfaces, you must get a cairo.Context(),
+  then turn it into a pangocairo.CairoContext().
+  IOW GTK surfaces yield contexts that support drawing text using pango,
+  but ordinary cairo.Contexts do NOT.
+  '''
+  return pangocairo.CairoContext(cairo.Context(surface))
 
 
 # Singleton, set when app starts
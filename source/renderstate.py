@@ -0,0 +1,162 @@
+'''
+Render state tracker: drop redundant cairo state changes during a draw walk.
+
+Drawing the model sets the same state over and over:
+every composite and transformer puts its style (set_source_rgba),
+every glyph sets a line width under the viewing matrix.
+RenderState wraps a context, shadows the state it tracks
+(source color, line width, line cap, matrix),
+and applies a change only if it differs from the shadowed state.
+save() and restore() save and restore the shadowed state, as cairo does.
+Operations that change state in ways not shadowed (transform, set_source_surface, ...)
+make the shadowed state unknown, so the next change is applied.
+
+All other attributes are the wrapped context's (bound methods cached on first use.)
+
+Counts of applied and avoided changes are totaled in module counters,
+reported in frame telemetry as "render_state".
+
+To test: python -m doctest -v renderstate.py
+
+Examples:
+
+  >>> class Context(object):
+  ...   def __getattr__(self, name):
+  ...     return lambda *args: log.append(name)
+  >>> log = []
+  >>> state = RenderState(Context())
+  >>> state.set_source_rgba(0, 0, 0, 0.5)
+  >>> state.set_source_rgba(0, 0, 0, 0.5)
+  >>> state.set_line_width(2)
+  >>> state.save()
+  >>> state.set_line_width(2)
+  >>> state.set_line_width(1)
+  >>> state.restore()
+  >>> state.set_line_width(2)
+  >>> state.move_to(0, 0)
+  >>> log
+  ['set_source_rgba', 'set_line_width', 'save', 'set_line_width', 'restore', 'move_to']
+  >>> avoided["source"], avoided["line_width"]
+  (1, 2)
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import telemetry
+
+UNKNOWN = object()
+''' Shadowed state not known, e.g. changed by an untracked operation. '''
+
+STATES = ("source", "line_width", "line_cap", "matrix")
+
+applied = dict.fromkeys(STATES, 0)
+avoided = dict.fromkeys(STATES, 0)
+
+
+class RenderState(object):
+  ''' Proxy of a cairo context, that skips redundant state changes. '''
+
+  def __init__(self, context):
+    self._context = context
+    self._state = dict.fromkeys(STATES, UNKNOWN)
+    self._stack = []
+
+  def __getattr__(self, name):
+    # Not tracked: delegate, and cache the bound method so later lookups are direct.
+    value = getattr(self._context, name)
+    setattr(self, name, value)
+    return value
+
+
+  def _is_changed(self, name, value):
+    ''' Return whether value changes the shadowed state, and count. '''
+    if self._state[name] is not UNKNOWN and self._state[name] == value:
+      avoided[name] += 1
+      return False
+    applied[name] += 1
+    self._state[name] = value
+    return True
+
+
+  def save(self):
+    self._stack.append(self._state.copy())
+    self._context.save()
+
+  def restore(self):
+    self._state = self._stack.pop()
+    self._context.restore()
+
+
+  def set_source_rgba(self, red, green, blue, alpha=1.0):
+    if self._is_changed("source", (red, green, blue, alpha)):
+      self._context.set_source_rgba(red, green, blue, alpha)
+
+  def set_source_rgb(self, red, green, blue):
+    if self._is_changed("source", (red, green, blue, 1.0)):
+      self._context.set_source_rgb(red, green, blue)
+
+  def set_source(self, *args):
+    self._state["source"] = UNKNOWN
+    self._context.set_source(*args)
+
+  def set_source_surface(self, *args):
+    self._state["source"] = UNKNOWN
+    self._context.set_source_surface(*args)
+
+  def set_source_pixbuf(self, *args):
+    self._state["source"] = UNKNOWN
+    self._context.set_source_pixbuf(*args)
+
+
+  def set_line_width(self, width):
+    if self._is_changed("line_width", width):
+      self._context.set_line_width(width)
+
+  def set_line_cap(self, cap):
+    if self._is_changed("line_cap", cap):
+      self._context.set_line_cap(cap)
+
+
+  def set_matrix(self, matrix):
+    if self._is_changed("matrix", matrix):
+      self._context.set_matrix(matrix)
+
+  def transform(self, matrix):
+    self._state["matrix"] = UNKNOWN
+    self._context.transform(matrix)
+
+  def translate(self, x, y):
+    self._state["matrix"] = UNKNOWN
+    self._context.translate(x, y)
+
+  def scale(self, x, y):
+    self._state["matrix"] = UNKNOWN
+    self._context.scale(x, y)
+
+  def rotate(self, angle):
+    self._state["matrix"] = UNKNOWN
+    self._context.rotate(angle)
+
+  def identity_matrix(self):
+    self._state["matrix"] = UNKNOWN
+    self._context.identity_matrix()
+
+
+def stats():
+  ''' Return dict of counters, for telemetry. '''
+  result = {}
+  for name in STATES:
+    result["applied_" + name] = applied[name]
+    result["avoided_" + name] = avoided[name]
+  return result
+
+
+telemetry.frames.register_source("render_state", stats)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+
+'''
+Render regression test: render a corpus of documents headlessly, compare to golden images.
+
+For confidence that optimizations of drawing (Drawable.draw(), Composite.draw(), TextGlyph, ...)
+do not change what is drawn.
+
+The corpus is:
+  built-in documents: the test document of pensool.py, and synthetic documents (see benchmark.py)
+  SVG files in a corpus directory (imported by svgimport.py)
+Each document is rendered on a HeadlessViewPort to a PNG and compared per pixel to its golden PNG:
+a pixel differs if any channel differs by more than --tolerance.
+A document fails if more than --max-pixels pixels differ, or if it has no golden.
+For each failure, an image of the render with differing pixels in red is written.
+
+Each document is rendered --repeat times; its render time is the least.
+Render times are saved with the goldens, and reported as deltas from them.
+
+Documents render in parallel in a pool of processes,
+each document in a fresh process, since the app has singletons.
+
+Goldens depend on fonts and library versions, so are not kept in the repository:
+make them with --update on a known good version, then test changes against them.
+
+Usage:
+  python rendertest.py [options]
+
+Examples:
+  python rendertest.py --update
+  python rendertest.py --processes 4 --output /tmp/renders
+
+Exit status is nonzero if any document fails.
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import os
+import sys
+import glob
+import time
+import json
+import optparse
+import tempfile
+import multiprocessing
+
+TEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test", "render")
+DEFAULT_CORPUS_DIR = os.path.join(TEST_DIR, "corpus")
+DEFAULT_GOLDEN_DIR = os.path.join(TEST_DIR, "golden")
+TIMES_FILENAME = "times.json"
+
+# Built-in documents: name -> count of synthetic morphs, or None for pensool's test document
+BUILTIN_DOCUMENTS = {"test_doc" : None, "synthetic_100" : 100, "synthetic_2000" : 2000}
+
+DIFF_PIXEL = "\x00\x00\xff\xff"  # Opaque red in ARGB32, little endian byte order
+
+
+def find_documents(corpus_dir):
+  ''' Return list of (name, source): built-ins and SVG files of corpus_dir. '''
+  documents = sorted(BUILTIN_DOCUMENTS.items())
+  for path in sorted(glob.glob(os.path.join(corpus_dir, "*.svg"))):
+    documents.append((os.path.splitext(os.path.basename(path))[0], path))
+  return documents
+
+
+def load_document(source, width, height):
+  ''' Build the model from source: a path of an SVG file, a count of synthetic morphs, or None. '''
+  import config
+  import pensool
+  if source is None:
+    pensool.make_test_doc()
+  elif isinstance(source, int):
+    import benchmark
+    benchmark.make_synthetic_doc(source, width, height)
+  else:
+    import svgimport
+    svgimport.Importer(source, config.scheme.model).run()
+
+
+def compare(rendered, golden, tolerance):
+  '''
+  Compare two ARGB32 image surfaces of equal size.
+  Return (count of differing pixels, diff image data: rendered with differing pixels red.)
+  '''
+  rendered_data = str(rendered.get_data())
+  golden_data = str(golden.get_data())
+  if rendered_data == golden_data:
+    return 0, None
+  diff = bytearray(rendered_data)
+  count = 0
+  for offset in xrange(0, len(rendered_data), 4):
+    for channel in xrange(offset, offset + 4):
+      if abs(ord(rendered_data[channel]) - ord(golden_data[channel])) > tolerance:
+        count += 1
+        diff[offset:offset + 4] = DIFF_PIXEL
+        break
+  return count, diff
+
+
+def render_document(task):
+  '''
+  Pool worker: render one document, compare to golden.  Return dict of results.
+  Task is (name, source, options as dict.)
+  '''
+  name, source, options = task
+  import cairo
+  import config
+  import pensool
+  config.PROGRESSIVE_ZOOM = False  # Deterministic: no timers
+
+  view = pensool.build_headless_app(options["width"], options["height"])
+  load_document(source, options["width"], options["height"])
+  times = []
+  for repeat in range(options["repeat"]):
+    view.invalidate()
+    start = time.time()
+    view.expose()
+    times.append((time.time() - start) * 1000)
+  result = {"name" : name, "time" : min(times)}
+
+  rendered_path = os.path.join(options["output"], name + ".png")
+  view.write_to_png(rendered_path)
+  golden_path = os.path.join(options["golden"], name + ".png")
+  if options["update"]:
+    view.write_to_png(golden_path)
+    result["status"] = "updated"
+    return result
+  if not os.path.exists(golden_path):
+    result["status"] = "no golden"
+    return result
+
+  rendered = cairo.ImageSurface.create_from_png(rendered_path)
+  golden = cairo.ImageSurface.create_from_png(golden_path)
+  if (rendered.get_width(), rendered.get_height()) != (golden.get_width(), golden.get_height()):
+    result["status"] = "size differs"
+    return result
+  # Surfaces from PNG may be RGB24 or ARGB32: compare both as ARGB32
+  rendered, golden = [_as_argb32(surface) for surface in (rendered, golden)]
+  count, diff = compare(rendered, golden, options["tolerance"])
+  result["differing"] = count
+  if count > options["max_pixels"]:
+    result["status"] = "differs"
+    diff_surface = cairo.ImageSurface.create_for_data(diff, cairo.FORMAT_ARGB32,
+      rendered.get_width(), rendered.get_height(), rendered.get_stride())
+    result["diff"] = os.path.join(options["output"], name + ".diff.png")
+    diff_surface.write_to_png(result["diff"])
+  else:
+    result["status"] = "ok"
+  return result
+
+
+def _as_argb32(surface):
+  import cairo
+  if surface.get_format() == cairo.FORMAT_ARGB32:
+    return surface
+  copy = cairo.ImageSurface(cairo.FORMAT_ARGB32, surface.get_width(), surface.get_height())
+  context = cairo.Context(copy)
+  context.set_source_surface(surface, 0, 0)
+  context.paint()
+  return copy
+
+
+def run_all(documents, options):
+  ''' Render documents in a pool of processes.  Return list of results. '''
+  option_dict = dict(vars(options))
+  tasks = [(name, source, option_dict) for name, source in documents]
+  pool = multiprocessing.Pool(options.processes or None, maxtasksperchild=1)
+  try:
+    return pool.map(render_document, tasks, chunksize=1)
+  finally:
+    pool.close()
+    pool.join()
+
+
+def report(results, golden_times):
+  ''' Print table of results.  Return list of failed document names. '''
+  failed = []
+  print "%-24s %-10s %10s %9s %9s" % ("document", "status", "differing", "mSec", "delta")
+  for result in sorted(results, key=lambda result: result["name"]):
+    name = result["name"]
+    delta = ""
+    if name in golden_times:
+      delta = "%+8.1f%%" % ((result["time"] - golden_times[name]) / max(golden_times[name], 0.001) * 100)
+    print "%-24s %-10s %10s %9.2f %9s" % (name, result["status"],
+      result.get("differing", ""), result["time"], delta)
+    if "diff" in result:
+      print "  diff image:", result["diff"]
+    if result["status"] not in ("ok", "updated"):
+      failed.append(name)
+  return failed
+
+
+def main():
+  parser = optparse.OptionParser(usage="%prog [options]")
+  parser.add_option("--corpus", default=DEFAULT_CORPUS_DIR, help="directory of SVG documents")
+  parser.add_option("--golden", default=DEFAULT_GOLDEN_DIR, help="directory of golden images")
+  parser.add_option("--output", help="directory for renders and diffs, default a new temporary directory")
+  parser.add_option("--update", action="store_true", help="save renders as the goldens")
+  parser.add_option("--document", help="only documents whose name contains this")
+  parser.add_option("--tolerance", type="int", default=2,
+    help="difference of a channel (0-255) at which a pixel differs")
+  parser.add_option("--max-pixels", type="int", default=0, dest="max_pixels",
+    help="count of differing pixels allowed")
+  parser.add_option("--repeat", type="int", default=3, help="renders per document, least time counts")
+  parser.add_option("--processes", type="int", default=0, help="processes in pool, default count of CPUs")
+  parser.add_option("--width", type="int", default=400)
+  parser.add_option("--height", type="int", default=400)
+  options, args = parser.parse_args()
+
+  if options.output is None:
+    options.output = tempfile.mkdtemp(prefix="pensool-render-")
+  for directory in (options.output, options.golden):
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+  documents = [(name, source) for name, source in find_documents(options.corpus)
+    if not options.document or options.document in name]
+
+  times_path = os.path.join(options.golden, TIMES_FILENAME)
+  golden_times = {}
+  if os.path.exists(times_path):
+    with open(times_path) as times_file:
+      golden_times = json.load(times_file)
+
+  results = run_all(documents, options)
+  failed = report(results, {} if options.update else golden_times)
+  print "Renders in", options.output
+  if options.update:
+    golden_times.update([(result["name"], result["time"]) for result in results])
+    with open(times_path, "w") as times_file:
+      json.dump(golden_times, times_file, indent=1, sort_keys=True)
+  return 1 if failed else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,169 @@
+'''
+Scene statistics: what the document (the tree of morphs) holds, and its memory.
+
+For sizing machines for large documents, and for finding leaks.
+
+summary() walks a tree (by default the model, config.scheme.model) and returns a dict:
+  nodes        count of nodes (drawables) by class
+  bytes        bytes of nodes by class: each node, its attributes and what they hold
+  depths       count of nodes by depth (the root is depth 0)
+  cached       (count, bytes) by kind of cached state, see CACHED
+  definitions  count of symbol definitions, each walked once however many instances share it
+  text_selects count of entries in gui.manager.textselect.text_select
+  orphan_text_selects  count of those entries whose text glyph is not in the tree (leaked)
+
+Bytes are by sys.getsizeof(), so are estimates of Python objects.
+Memory behind a wrapper of a C object (e.g. the lines of a pango layout) is not counted.
+An object shared by nodes (e.g. a style) is counted once, for the first node walked.
+Caches shared by all nodes (sprites, glyph outlines) are reported by frame telemetry (see telemetry.py.)
+
+report() formats a summary.  log_report() is the debug command: it logs a report of the model.
+
+To test:
+python -m doctest -v scenestats.py
+
+Examples:
+
+  # Objects held are counted once
+  >>> shared = [1.5, 2.5]
+  >>> seen = set()
+  >>> deep_size(shared, seen) == sys.getsizeof(shared) + 2 * sys.getsizeof(1.5)
+  True
+  >>> deep_size((shared, shared), seen) == sys.getsizeof((shared, shared))
+  True
+
+  # Nodes are not counted as held
+  >>> deep_size([shared], set(), lambda thing: thing is shared) == sys.getsizeof([shared])
+  True
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import collections
+import sys
+import types
+import config
+
+import logging
+
+CACHED = {
+  "transform" : "matrices",
+  "retained_transform" : "matrices",
+  "bounds" : "bounds",
+  "local_extents" : "bounds",
+  "layouts" : "layouts",
+  }
+''' Attribute name of cached state of a node -> kind of cached state. '''
+
+# Held by nodes, but not owned by them
+_UNOWNED = (type, types.ModuleType, types.FunctionType, types.MethodType,
+  types.BuiltinFunctionType, types.ClassType)
+
+
+def deep_size(thing, seen, is_node=lambda thing: False):
+  '''
+  Return bytes of thing and what it holds (items and attributes.)
+  Objects in seen (ids) are not counted, and counted objects are added to seen.
+  Nodes (is_node(object) is True) are not counted, nor what they hold.
+  '''
+  size = 0
+  stack = [thing]
+  while stack:
+    thing = stack.pop()
+    if id(thing) in seen or isinstance(thing, _UNOWNED) or is_node(thing):
+      continue
+    seen.add(id(thing))
+    size += sys.getsizeof(thing)
+    if isinstance(thing, dict):
+      stack.extend(thing.keys())
+      stack.extend(thing.values())
+    elif isinstance(thing, (list, tuple, set, frozenset)):
+      stack.extend(thing)
+    if hasattr(thing, '__dict__'):
+      stack.append(thing.__dict__)
+  return size
+
+
+def summary(root=None):
+  ''' Return dict of statistics of tree of root, by default the model. '''
+  import drawable
+  import morph.symbol
+  import gui.manager.textselect
+
+  if root is None:
+    root = config.scheme.model
+  is_node = lambda thing: isinstance(thing, (drawable.Drawable, morph.symbol.Definition))
+  nodes = collections.Counter()
+  node_bytes = collections.Counter()
+  depths = collections.Counter()
+  cached = collections.defaultdict(lambda: [0, 0])
+  definitions = 0
+  seen = set()  # ids of objects counted
+  cached_seen = set()
+
+  stack = [(root, 0)]
+  while stack:
+    node, depth = stack.pop()
+    if id(node) in seen:
+      continue
+    seen.add(id(node))
+    name = node.__class__.__name__
+    nodes[name] += 1
+    depths[depth] += 1
+    node_bytes[name] += sys.getsizeof(node) + deep_size(node.__dict__, seen, is_node)
+    for attribute, kind in CACHED.items():
+      value = getattr(node, attribute, None)
+      if value is None:
+        continue
+      if isinstance(value, list):
+        cached[kind][0] += len([item for item in value if item is not None])
+      else:
+        cached[kind][0] += 1
+      cached[kind][1] += deep_size(value, cached_seen, is_node)
+    if isinstance(node, list):
+      stack.extend([(child, depth + 1) for child in node])
+    definition = getattr(node, 'definition', None)
+    if isinstance(definition, morph.symbol.Definition) and id(definition) not in seen:
+      seen.add(id(definition))
+      definitions += 1
+      stack.append((definition.root, depth + 1))
+
+  text_select = gui.manager.textselect.text_select
+  return {
+    "nodes" : nodes,
+    "bytes" : node_bytes,
+    "depths" : depths,
+    "cached" : dict([(kind, tuple(value)) for kind, value in cached.items()]),
+    "definitions" : definitions,
+    "text_selects" : len(text_select),
+    "orphan_text_selects" : len([glyph for glyph in text_select if id(glyph) not in seen]),
+    }
+
+
+def report(stats):
+  ''' Return text of a summary. '''
+  lines = ["Scene: %d nodes, %d definitions, %.1f KB" % (sum(stats["nodes"].values()),
+    stats["definitions"], sum(stats["bytes"].values()) / 1024.0)]
+  lines.append("%-24s %8s %10s" % ("class", "nodes", "KB"))
+  for name, count in stats["nodes"].most_common():
+    lines.append("%-24s %8d %10.1f" % (name, count, stats["bytes"][name] / 1024.0))
+  lines.append("Depths: " + ", ".join(["%d: %d" % (depth, count)
+    for depth, count in sorted(stats["depths"].items())]))
+  lines.append("Cached: " + ", ".join(["%s %d (%.1f KB)" % (kind, count, size / 1024.0)
+    for kind, (count, size) in sorted(stats["cached"].items())]))
+  lines.append("Text selects: %d, of text glyphs not in the scene: %d" % (
+    stats["text_selects"], stats["orphan_text_selects"]))
+  return "\n".join(lines)
+
+
+def log_report(*args):
+  ''' Debug command: log a report of the model to the pensool logger. '''
+  logging.getLogger('pensool').info("Scene statistics\n" + report(summary()))
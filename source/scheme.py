@@ -60,9 +60,15 @@ class Scheme(object):
     This encapsulates knowledge of what scheme objects need to be transformed, and also the knowledge of the step size.
     '''
     if direction:
-      self.model.zoom(config.ZOOM_RATE, event, config.viewport.user_context())
+      delta = config.ZOOM_RATE
     else:
-      self.model.zoom(1.0/config.ZOOM_RATE, event, config.viewport.user_context())
+      delta = 1.0/config.ZOOM_RATE
+    if config.viewport.zoom_preview():
+      # Progressive: view shows preview until zooming settles, no need to walk model.
+      self.model.rescale(delta)
+      config.viewport.invalidate()
+    else:
+      self.model.zoom(delta, event, config.viewport.user_context())
     # FIXME zoom handles?
   
 
@@ -0,0 +1,185 @@
+'''
+Sliced rendering: draw the model of a view in idle time slices, so input is not blocked.
+
+A full draw of a very large document blocks the main loop until the whole tree is drawn.
+When the last full draw of the model took longer than SLICED_RENDER_THRESHOLD mSec,
+a ViewPort instead draws the damaged rect of the model into a back buffer,
+in slices of SLICED_RENDER_SLICE mSec during idle callbacks
+(see Composite.draw_steps().)
+Meanwhile exposes show the previous frame of the model (the view's model buffer),
+and controls (pointer feedback, handle menus) are drawn over it as usual:
+input events have priority over idle callbacks, so they are handled between slices.
+When the render completes, it is copied into the model buffer and shown.
+
+Preemption: damage (any invalidate) stops the render.
+The expose that follows restarts it, on the union of the old and new damaged rects.
+To bound staleness under continuous input, a render pending longer than
+SLICED_RENDER_DEADLINE mSec (since its first start) runs to completion in its next slice.
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import time
+import gtk
+import cairo
+import base.timer as timer
+import config
+import lod
+import renderstate
+
+import logging
+my_logger = logging.getLogger('pensool')
+
+
+def union(rect1, rect2):
+  ''' Union of rects (x, y, width, height), either may be None. '''
+  if rect1 is None:
+    return rect2
+  if rect2 is None:
+    return rect1
+  x = min(rect1[0], rect2[0])
+  y = min(rect1[1], rect2[1])
+  return (x, y, max(rect1[0] + rect1[2], rect2[0] + rect2[2]) - x,
+    max(rect1[1] + rect1[3], rect2[1] + rect2[3]) - y)
+
+
+def contains(outer, inner):
+  ''' Whether rect outer contains rect inner. '''
+  return outer[0] <= inner[0] and outer[1] <= inner[1] \
+    and outer[0] + outer[2] >= inner[0] + inner[2] \
+    and outer[1] + outer[3] >= inner[1] + inner[3]
+
+
+class SlicedRender(object):
+  '''
+  Render of the model of a view into a back buffer, in idle time slices.
+  '''
+  def __init__(self, view):
+    self.view = view
+    self.buffer = None  # back buffer, same size as the view's model buffer
+    self.task = None    # generator drawing the model into the back buffer
+    self.context = None # context on back buffer, owned by the task
+    self.rect = None    # DCS rect being rendered, or rendered and not yet shown
+    self.serial = None  # view's damage serial when the render started
+    self.first_start = None # time the rect began to be rendered, over restarts
+    self.elapsed = 0    # seconds of slices of the current render
+    self.done = False   # rect rendered, not yet shown
+    self.idler = timer.Idler()
+
+
+  def request(self, rect):
+    '''
+    An expose needs the model in rect, a DCS (x, y, width, height).
+    Show a completed render covering it, else let one covering it continue, else (re)start one.
+    '''
+    if self.rect is not None and self.serial == self.view.damage_serial and contains(self.rect, rect):
+      if self.done:
+        self.show()
+      return
+    self.start(rect)
+
+
+  def start(self, rect):
+    '''
+    (Re)start render of rect, a DCS (x, y, width, height).
+    Any render not yet shown is restarted, including its rect.
+    '''
+    self._stop()
+    self.rect = union(self.rect, rect)
+    if self.first_start is None:
+      self.first_start = time.time()
+    self.serial = self.view.damage_serial
+    self.done = False
+    self.elapsed = 0
+
+    model_buffer = self.view.model_buffer
+    if self.buffer is None or self.buffer.get_width() != model_buffer.get_width() \
+        or self.buffer.get_height() != model_buffer.get_height():
+      self.buffer = cairo.ImageSurface(cairo.FORMAT_ARGB32,
+        model_buffer.get_width(), model_buffer.get_height())
+    # Lazy import: port imports this module
+    import port
+    self.context = renderstate.RenderState(port.context_for_surface(self.buffer))
+    x, y, width, height = self.rect
+    self.context.rectangle(x, y, width, height)
+    self.context.clip()
+    self.context.set_operator(cairo.OPERATOR_CLEAR)
+    self.context.paint()
+    self.context.set_operator(cairo.OPERATOR_OVER)
+    self.view.style.put_to(self.context)
+    self.task = self.view.model.draw_steps(self.context)
+    self.idler.start(self._step_cb)
+
+
+  def show(self):
+    ''' Copy the completed render into the view's model buffer. '''
+    context = cairo.Context(self.view.model_buffer)
+    x, y, width, height = self.rect
+    context.rectangle(x, y, width, height)
+    context.clip()
+    context.set_operator(cairo.OPERATOR_SOURCE)
+    context.set_source_surface(self.buffer, 0, 0)
+    context.paint()
+    self.rect = None
+    self.first_start = None
+    self.done = False
+
+
+  def cancel(self):
+    ''' Stop and forget any render. '''
+    self._stop()
+    self.rect = None
+    self.first_start = None
+    self.done = False
+
+
+  def _stop(self):
+    self.idler.cancel()
+    if self.task is not None:
+      self.task.close() # Restores the context
+      self.task = None
+    self.context = None
+
+
+  def _step_cb(self):
+    ''' Idle callback: draw a slice.  Return True while more remains. '''
+    if self.view.damage_serial != self.serial:
+      # Preempted.  Keep rect: the expose of the damage restarts with it.
+      self._stop()
+      return False
+    start = time.time()
+    if (start - self.first_start) * 1000 > config.SLICED_RENDER_DEADLINE:
+      deadline = None # Overdue: finish now
+    else:
+      deadline = start + config.SLICED_RENDER_SLICE / 1000.0
+    lod.enabled = True  # As when the view draws the model
+    try:
+      for step in self.task:
+        if step is not None:  # Bounds of the model: complete
+          self._complete(time.time() - start)
+          return False
+        if deadline is not None and time.time() > deadline:
+          break
+    finally:
+      lod.enabled = False
+    self.elapsed += time.time() - start
+    return True
+
+
+  def _complete(self, slice_time):
+    self.task = None
+    self.context = None
+    self.done = True
+    self.elapsed += slice_time
+    self.view.note_model_draw_time(self.elapsed * 1000, self.rect)
+    my_logger.debug("Sliced render of %s done in %.0f mSec", self.rect, self.elapsed * 1000)
+    # Not a change to the view: expose without incrementing the damage serial
+    self.view.surface.invalidate_rect(gtk.gdk.Rectangle(*self.rect), True)
@@ -0,0 +1,136 @@
+'''
+Sprite cache: menu items pre-rendered to images, blitted instead of stroked.
+
+Menu items (handle items, traditional text and icon items) look the same
+every time they are drawn at the same scale and rotation,
+but are re-stroked as paths on every expose, even while a menu tracks the pointer.
+Instead, an item is rasterized once per appearance
+(classes, styles including highlight, text) and per bucket of its device transform
+(scale and rotation, without translation), then blitted at its device position.
+
+Buckets quantize the linear part of the item's device transform
+to SPRITE_BUCKET device pixels, so a sprite differs from an exact render
+by less than that, and position is rounded to a pixel.
+
+Symbol instances (morph/symbol.py) of widely shared definitions are also drawn from sprites.
+
+Blitting does not walk the item, so the transforms retained for picking
+are updated here as a draw would.
+
+Evicts least recently used sprites, capped by SPRITE_CACHE_BYTES (zero disables.)
+Hit rate and memory are reported in frame telemetry as "sprites".
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import cairo
+import pangocairo
+import base.bounds as bounds
+import base.lru as lru
+import base.transform as transform
+import config
+import telemetry
+
+MARGIN = 2
+''' Pixels around inked bounds of a sprite, for antialiasing. '''
+
+
+class Sprite(object):
+  ''' Image of an item, with offset of its top left from the item's device origin. '''
+  def __init__(self, surface, left, top):
+    self.surface = surface
+    self.left = left
+    self.top = top
+
+
+def appearance(drawable):
+  ''' Return hashable of what determines how a drawable looks: classes, styles, text. '''
+  parts = [drawable.__class__]
+  style = getattr(drawable, 'style', None)
+  if style is not None:
+    parts.append((tuple(style.color), style.filled, style.pen_width))
+  text = getattr(drawable, 'text', None)
+  if text is not None:
+    parts.append(text)
+  definition = getattr(drawable, 'definition', None)
+  if definition is not None:  # Symbol instance.  See morph/symbol.py
+    parts.append(definition.key)
+  if isinstance(drawable, list):  # Composite
+    parts.extend([appearance(member) for member in drawable])
+  return tuple(parts)
+
+
+def _bucket(matrix):
+  ''' Return hashable quantized linear part of matrix. '''
+  xx, yx = matrix.transform_distance(1, 0)
+  xy, yy = matrix.transform_distance(0, 1)
+  return tuple([int(round(value / config.SPRITE_BUCKET)) for value in (xx, yx, xy, yy)])
+
+
+def _rasterize(item, linear, draw_item):
+  '''
+  Return Sprite of item drawn by draw_item with its device transform being linear (no translation.)
+  Draws once to measure inked bounds, once to the sprite image.
+  '''
+  # Context transform such that item's transform applied after it yields linear.
+  to_item = transform.copy(item.transform)
+  to_item.invert()
+  context_matrix = to_item * linear
+  scratch = pangocairo.CairoContext(cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1)))
+  scratch.set_matrix(context_matrix)
+  inked = draw_item(scratch)
+  left = inked.x - MARGIN
+  top = inked.y - MARGIN
+  surface = cairo.ImageSurface(cairo.FORMAT_ARGB32,
+    inked.width + 2 * MARGIN, inked.height + 2 * MARGIN)
+  context = pangocairo.CairoContext(cairo.Context(surface))
+  context.set_matrix(context_matrix * cairo.Matrix(x0=-left, y0=-top))
+  draw_item(context)
+  return Sprite(surface, left, top)
+
+
+def draw(item, context, draw_item=None):
+  '''
+  Draw item (a composite) from sprite cache.
+  On a miss, item is rendered by draw_item (default item.draw), which must not call here.
+  Return bounds in DCS, like item.draw().
+  '''
+  if draw_item is None:
+    draw_item = item.draw
+  if not sprites.capacity:
+    return draw_item(context)
+  telemetry.frames.visited += 1
+  matrix = item.transform * context.get_matrix()  # item's device transform
+  x0, y0 = matrix.transform_point(0, 0)
+  key = (appearance(item), _bucket(matrix),
+    config.scheme.model.scale.x, config.scheme.model.scale.y) # Pen width scales with view
+  sprite = sprites.get(key)
+  if sprite is None:
+    drawn = telemetry.frames.drawn
+    linear = matrix * cairo.Matrix(x0=-x0, y0=-y0)
+    sprite = _rasterize(item, linear, draw_item)
+    sprites.put(key, sprite, sprite.surface.get_stride() * sprite.surface.get_height())
+    telemetry.frames.drawn = drawn  # Rasterizing inks off the frame: the blit is what is drawn
+  x = int(round(x0)) + sprite.left
+  y = int(round(y0)) + sprite.top
+  context.save()
+  context.identity_matrix()
+  context.set_source_surface(sprite.surface, x, y)
+  context.paint()
+  context.restore()
+  item.retain(matrix)  # As a draw would
+  item.bounds = bounds.Bounds(x, y, sprite.surface.get_width(), sprite.surface.get_height())
+  telemetry.frames.note_inked(item.bounds)
+  return item.bounds.copy()
+
+
+sprites = lru.LRUCache(config.SPRITE_CACHE_BYTES)
+telemetry.frames.register_source("sprites", sprites.stats)
@@ -0,0 +1,100 @@
+'''
+Startup: time to first frame, against a budget.
+
+Startup is measured from import of this module (first thing pensool.py does)
+to the first frame drawn, in phases marked by mark().
+If it exceeds STARTUP_BUDGET milliseconds, a warning is logged with the phases.
+
+What is not needed to show the window and accept input is deferred:
+- modules imported on first use (e.g. outport.py)
+- controls built on first open (see controlinstances.py)
+- functions passed to defer(), called in idle time after the first frame
+
+Profile mode: set environment variable PENSOOL_STARTUP_PROFILE to profile startup
+with cProfile, printing the top STARTUP_PROFILE_LINES functions by cumulative time at the first frame.
+Like tracing (see decorators.py), decided once at import time.
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import os
+import sys
+import time
+
+start_time = time.time()
+
+_profiler = None
+if os.environ.get('PENSOOL_STARTUP_PROFILE'):
+  import cProfile
+  _profiler = cProfile.Profile()
+  _profiler.enable()
+
+import logging
+my_logger = logging.getLogger('pensool')
+
+marks = []  # (phase, milliseconds since start)
+first_frame_time = None # milliseconds from start to first frame, None until then
+_deferred = []
+
+
+def mark(phase):
+  ''' Note the end of a phase of startup. '''
+  marks.append((phase, (time.time() - start_time) * 1000))
+
+
+def defer(func):
+  ''' Call func in idle time after the first frame.  Before then, nothing is deferred. '''
+  if first_frame_time is None:
+    _deferred.append(func)
+  else:
+    func()
+
+
+def first_frame():
+  '''
+  A frame was drawn.  On the first, report and start deferred work.
+  Cheap to call on every frame.
+  '''
+  global first_frame_time
+  if first_frame_time is not None:
+    return
+  mark("first frame")
+  first_frame_time = marks[-1][1]
+  if _profiler is not None:
+    _report_profile()
+  _report()
+  if _deferred:
+    import base.timer as timer
+    timer.Idler().start(_run_deferred)
+
+
+def _report():
+  import config
+  phases = ", ".join(["%s %.0f" % (phase, elapsed) for phase, elapsed in marks])
+  if first_frame_time > config.STARTUP_BUDGET:
+    my_logger.warning("Startup %.0f ms exceeds budget %d ms: %s",
+      first_frame_time, config.STARTUP_BUDGET, phases)
+  else:
+    my_logger.debug("Startup %.0f ms: %s", first_frame_time, phases)
+
+
+def _report_profile():
+  import config
+  import pstats
+  _profiler.disable()
+  stats = pstats.Stats(_profiler, stream=sys.stderr)
+  stats.sort_stats('cumulative').print_stats(config.STARTUP_PROFILE_LINES)
+
+
+def _run_deferred():
+  ''' Idle callback: call one deferred function.  Return True while more remain. '''
+  _deferred.pop(0)()
+  return len(_deferred) > 0
@@ -24,9 +24,25 @@ def set_line_width(context, pen_width):
   paths are NOT subject to subsequent transforms.
   setting the pen width is AFTER the path
   '''
-  context.set_matrix(transform.get_unit_matrix())
-  context.scale(config.scheme.model.scale.x, config.scheme.model.scale.y) # viewing transform
+  context.set_matrix(viewing_matrix())
   context.set_line_width(pen_width)
+
+
+_viewing_matrix = None
+_viewing_scale = None
+
+def viewing_matrix():
+  '''
+  Return unit matrix scaled by the viewing transform.
+  Cached until the viewing scale changes: do not mutate.
+  '''
+  global _viewing_matrix, _viewing_scale
+  scale = (config.scheme.model.scale.x, config.scheme.model.scale.y)
+  if scale != _viewing_scale:
+    _viewing_matrix = transform.get_unit_matrix()
+    _viewing_matrix.scale(*scale)
+    _viewing_scale = scale
+  return _viewing_matrix
   
 """
 OLD not used
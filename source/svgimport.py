@@ -0,0 +1,358 @@
+'''
+SVG import: stream an SVG file into a morph tree, progressively.
+
+The file is read by an incremental XML parser (iterparse),
+and each element is discarded once mapped, so memory for the XML is bounded
+by the depth of the document, not its size.
+
+Mapping:
+  svg, g, a       Morph (group), with its transform
+  rect            RectMorph
+  circle, ellipse CircleMorph
+  line            LineMorph
+  text            TextMorph
+Other elements (paths, defs, ...) are skipped, with their content.
+An element's transform attribute is decomposed into Pensool's transform specs
+(scale, rotation, translation); a skew is approximated (see base/affine.py.)
+A shape with a transform is wrapped in a group with that transform.
+Stroke and fill (attributes or style properties) set a morph's style,
+which has one color: the fill's if filled, else the stroke's.
+As in SVG, fill defaults to black, and groups' fill, stroke and font size are inherited.
+Colors are #rgb, #rrggbb, rgb(...) or names.
+
+The whole import is one group appended to the target group, one step of undo history.
+
+Import is progressive: import_steps() yields every SVG_IMPORT_STEP elements,
+and an Importer steps it in idle time slices of SVG_IMPORT_SLICE milliseconds,
+invalidating the new morphs after each slice, so the document is shown while it imports.
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import time
+from gtk import gdk
+try:
+  import xml.etree.cElementTree as ElementTree
+except ImportError:
+  import xml.etree.ElementTree as ElementTree
+import morph.morph
+import morph.textmorph
+import base.affine as affine
+import base.timer as timer
+import base.vector as vector
+import config
+import gcpolicy
+import history
+
+import logging
+my_logger = logging.getLogger('pensool')
+
+GROUPS = ('svg', 'g', 'a')
+SHAPES = ('rect', 'circle', 'ellipse', 'line', 'text')
+INHERITED = ('fill', 'stroke', 'font-size')
+DEFAULT_FONT_SIZE = 16.0
+BASIC_COLORS = {'black': '#000000', 'silver': '#c0c0c0', 'gray': '#808080', 'grey': '#808080',
+  'white': '#ffffff', 'maroon': '#800000', 'red': '#ff0000', 'purple': '#800080',
+  'fuchsia': '#ff00ff', 'green': '#008000', 'lime': '#00ff00', 'olive': '#808000',
+  'yellow': '#ffff00', 'navy': '#000080', 'blue': '#0000ff', 'teal': '#008080', 'aqua': '#00ffff'}
+''' SVG colors that X11 lacks or names differently.  Other names are parsed as X11 names. '''
+
+
+def _local_name(tag):
+  ''' Tag without namespace. '''
+  return tag.rsplit('}', 1)[-1]
+
+
+def _length(element, name, default=0.0):
+  ''' Float value of a length attribute, ignoring units. '''
+  return _number(element.get(name, ''), default)
+
+
+def _number(text, default):
+  ''' First number in text, ignoring units, else default. '''
+  values = affine.numbers(text)
+  if values:
+    return values[0]
+  return default
+
+
+def _properties(element, inherited):
+  '''
+  Dictionary of inherited properties, overridden by presentation attributes,
+  overridden by style properties.  A value 'inherit' is the inherited value.
+  '''
+  properties = dict(inherited)
+  declarations = element.items()
+  for declaration in element.get('style', '').split(';'):
+    if ':' in declaration:
+      name, value = declaration.split(':', 1)
+      declarations.append((name.strip(), value.strip()))
+  for name, value in declarations:
+    if value != 'inherit':
+      properties[name] = value
+    elif name in inherited:
+      properties[name] = inherited[name]
+    else:
+      properties.pop(name, None)
+  return properties
+
+
+def _inheritable(properties):
+  ''' Properties a group passes to its content. '''
+  return dict([(name, value) for name, value in properties.items() if name in INHERITED])
+
+
+def _color(value):
+  ''' Return (r, g, b) floats of an SVG color, else None (e.g. for 'none'.) '''
+  value = value.strip()
+  if value.startswith('rgb('):
+    values = affine.numbers(value)
+    if len(values) != 3:
+      return None
+    full = 100.0 if '%' in value else 255.0
+    return tuple([min(max(component / full, 0.0), 1.0) for component in values])
+  if not value.startswith('#'):
+    value = value.lower()
+    if value in BASIC_COLORS:
+      return _color(BASIC_COLORS[value])
+    try:
+      color = gdk.color_parse(value)
+    except ValueError:
+      return None
+    return (color.red / 65535.0, color.green / 65535.0, color.blue / 65535.0)
+  digits = value[1:]
+  if len(digits) == 3:
+    digits = ''.join([digit * 2 for digit in digits])
+  if len(digits) != 6:
+    return None
+  try:
+    return tuple([int(digits[i:i+2], 16) / 255.0 for i in (0, 2, 4)])
+  except ValueError:
+    return None
+
+
+def _set_style(a_morph, properties, name):
+  fill = properties.get('fill', 'black')
+  filled = fill != 'none' and name != 'line'  # A line has no area to fill
+  a_morph.style.filled = filled
+  if filled:
+    color = _color(fill)
+  else:
+    color = _color(properties.get('stroke', 'none'))
+  if color is not None:
+    a_morph.style.color = color
+
+
+def _set_specs(a_morph, translation_x, translation_y, scale_x, scale_y, rotation=0.0):
+  a_morph.set_transform(vector.Vector(translation_x, translation_y),
+    vector.Vector(scale_x, scale_y), rotation)
+
+
+def _shape(element, name, inherited):
+  '''
+  Return morph of a shape element, or None if degenerate.
+  Inherited is the properties inherited from its groups.
+  '''
+  properties = _properties(element, inherited)
+  if name == 'rect':
+    width, height = _length(element, 'width'), _length(element, 'height')
+    if width <= 0 or height <= 0:
+      return None
+    result = morph.morph.RectMorph()
+    _set_specs(result, _length(element, 'x'), _length(element, 'y'), width, height)
+  elif name in ('circle', 'ellipse'):
+    if name == 'circle':
+      radius_x = radius_y = _length(element, 'r')
+    else:
+      radius_x, radius_y = _length(element, 'rx'), _length(element, 'ry')
+    if radius_x <= 0 or radius_y <= 0:
+      return None
+    result = morph.morph.CircleMorph()  # Unit circle in unit square
+    _set_specs(result, _length(element, 'cx') - radius_x, _length(element, 'cy') - radius_y,
+      2 * radius_x, 2 * radius_y)
+  elif name == 'line':
+    start = vector.Vector(_length(element, 'x1'), _length(element, 'y1'))
+    span = vector.Vector(_length(element, 'x2'), _length(element, 'y2')) - start
+    if span.length() == 0:
+      return None
+    result = morph.morph.LineMorph()  # Unit line along x axis
+    _set_specs(result, start.x, start.y, span.length(), span.length(), span.angle())
+  else: # text
+    text = ''.join(element.itertext()).strip()
+    if not text:
+      return None
+    size = _number(properties.get('font-size', ''), DEFAULT_FONT_SIZE)
+    result = morph.textmorph.TextMorph(text)
+    # SVG y is the baseline.  Frame is estimated from the font size.
+    _set_specs(result, _length(element, 'x'), _length(element, 'y') - size,
+      len(text) * size * 0.6, size * 1.2)
+  _set_style(result, properties, name)
+  return result
+
+
+def _group(transform_text):
+  ''' Return new group morph with transform of an SVG transform attribute. '''
+  group = morph.morph.Morph()
+  try:
+    translation_x, translation_y, scale_x, scale_y, rotation, skewed = \
+      affine.decompose(affine.parse(transform_text))
+  except ValueError as detail:
+    my_logger.warning("SVG import: ignoring transform: %s", detail)
+    return group
+  if skewed:
+    my_logger.warning("SVG import: approximating skewed transform %s", transform_text)
+  if scale_x == 0 or scale_y == 0:
+    scale_x = scale_y = 1.0 # Non-invertible
+  _set_specs(group, translation_x, translation_y, scale_x, scale_y, rotation)
+  return group
+
+
+def _adopt(parent, child):
+  ''' Append child to parent and retain its transform, as a draw would, so it can invalidate. '''
+  parent.append(child)
+  child.retained_transform = child.transform * parent.retained_transform
+  history.note_change(parent)
+
+
+def import_steps(source, target, added=None):
+  '''
+  Generator: import SVG from source (filename or file) into a new group appended to target.
+  Yields None every SVG_IMPORT_STEP elements; finally yields the new group.
+  If added is a list, appends each new shape morph to it (for invalidating.)
+  '''
+  root = morph.morph.Morph()
+  _set_specs(root, 0, 0, 1.0 / config.PENSOOL_UNIT, 1.0 / config.PENSOOL_UNIT)
+  _adopt(target, root)
+  history.record_splice(target, len(target) - 1, [root], True)
+
+  groups = [root]   # open groups, innermost last
+  inherited = [{}]  # properties inherited by content of open groups
+  elements = []     # open elements, innermost last
+  skip_depth = 0    # depth within skipped element, or within text
+  count = 0
+  for event, element in ElementTree.iterparse(source, events=('start', 'end')):
+    name = _local_name(element.tag)
+    if event == 'start':
+      elements.append(element)
+      if skip_depth:
+        skip_depth += 1
+      elif name in GROUPS:
+        properties = _inheritable(_properties(element, inherited[-1]))
+        if len(elements) > 1:
+          group = _group(element.get('transform', ''))
+          _adopt(groups[-1], group)
+          groups.append(group)
+          inherited.append(properties)
+        else:
+          inherited[0] = properties # Of the root element, whose group is root
+      else:
+        skip_depth = 1  # Shapes' content (e.g. tspan of text) is read at their end
+      continue
+
+    # End of element
+    elements.pop()
+    if skip_depth:
+      skip_depth -= 1
+      if not skip_depth and name in SHAPES:
+        shape = _shape(element, name, inherited[-1])
+        if shape is not None:
+          parent = groups[-1]
+          if element.get('transform'):
+            parent = _group(element.get('transform'))
+            _adopt(groups[-1], parent)
+          _adopt(parent, shape)
+          if added is not None:
+            added.append(shape)
+    elif name in GROUPS and len(groups) > 1:
+      groups.pop()
+      inherited.pop()
+    if not skip_depth:
+      # Discard mapped element, and its reference from its parent element
+      element.clear()
+      if elements:
+        elements[-1].remove(element)
+    count += 1
+    if count % config.SVG_IMPORT_STEP == 0:
+      yield None
+  yield root
+
+
+class Importer(object):
+  '''
+  Import a file in idle time slices, invalidating new morphs after each slice.
+  The file is open until the import ends or is canceled.
+  Raises IOError if the file cannot be opened.
+  '''
+  def __init__(self, filename, target):
+    self.file = open(filename, 'rb')
+    self.added = []
+    self.task = import_steps(self.file, target, self.added)
+    self.result = None
+    self.idler = timer.Idler()
+
+  def start(self):
+    self.idler.start(self._step_cb)
+
+  def is_running(self):
+    ''' Is the import started, but not yet ended or canceled? '''
+    return self.idler.is_running()
+
+  def cancel(self):
+    ''' Stop importing.  What was imported remains. '''
+    self.idler.cancel()
+    self.task.close()
+    self.file.close()
+
+  def run(self):
+    ''' Import synchronously.  Return the new group. '''
+    try:
+      for step in self.task:
+        self.result = step
+    finally:
+      self.file.close()
+    self._invalidate()
+    gcpolicy.document_loaded()
+    return self.result
+
+  def _step_cb(self):
+    deadline = time.time() + config.SVG_IMPORT_SLICE / 1000.0
+    try:
+      while time.time() < deadline:
+        self.result = self.task.next()
+        if self.result is not None:
+          break
+    except StopIteration:
+      pass
+    except SyntaxError as detail:  # ElementTree.ParseError
+      self.file.close()
+      self._invalidate()
+      my_logger.warning("SVG import stopped, malformed: %s", detail)
+      return False
+    except:
+      self.file.close()
+      raise
+    self._invalidate()
+    if self.result is not None:
+      self.file.close()
+      my_logger.debug("SVG import done")
+      gcpolicy.document_loaded()
+      return False
+    return True
+
+  def _invalidate(self):
+    ''' Invalidate morphs added since last time, as one invalidate. '''
+    config.viewport.begin_batch()
+    try:
+      for shape in self.added:
+        shape.invalidate_will_draw()
+    finally:
+      config.viewport.end_batch()
+    del self.added[:]
@@ -0,0 +1,240 @@
+'''
+Frame telemetry: what each ViewPort expose costs.
+
+For each frame (expose) records:
+  wall time
+  count of drawables visited (draw() called) and drawn (inked within the clip of the frame,
+    after level of detail culled: see lod.py)
+  area invalidated (sum over invalidated rects, counting overlaps)
+  area damaged (union of invalidated rects, what actually changed)
+  area exposed (clip of the expose, what was actually redrawn)
+  time split across phases of drawing the scheme:
+    widgets, transformed controls, model, handles
+
+A rolling window of recent frames is summarized by percentiles.
+Summaries are read with frames.summary() or logged to the pensool logger.
+
+Other modules (caches etc.) can register a source of counters
+that is included in summaries.  See register_source().
+
+To test:
+python -m doctest -v telemetry.py
+
+Examples:
+
+  >>> percentile([1, 2, 3, 4], 0.5)
+  2
+  >>> percentile([4, 3, 2, 1], 0.99)
+  4
+  >>> percentile([], 0.5)
+  0
+  
+  # Union area does not count overlaps twice
+  >>> Rect = collections.namedtuple('Rect', 'x y width height')
+  >>> union_area([Rect(0, 0, 10, 10), Rect(5, 5, 10, 10)])
+  175
+  >>> union_area([Rect(0, 0, 10, 10), Rect(0, 0, 10, 10)])
+  100
+  >>> union_area([])
+  0
+  
+  # Drawn counts only ink within the clip of the frame
+  >>> import base.bounds as bounds
+  >>> frames.begin_frame(100, bounds.Bounds(0, 0, 10, 10))
+  >>> frames.note_inked(bounds.Bounds(5, 5, 10, 10))
+  >>> frames.note_inked(bounds.Bounds(20, 20, 5, 5))
+  >>> frames.drawn
+  1
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import collections
+import logging
+import math
+import time
+import config
+
+PHASES = ("widgets", "transformed_controls", "model", "handles")
+
+
+def percentile(values, fraction):
+  '''
+  Return the value at fraction (0.0 to 1.0) of the sorted values, nearest rank.
+  Zero if no values.
+  '''
+  if not values:
+    return 0
+  ordered = sorted(values)
+  rank = int(math.ceil(fraction * len(ordered))) - 1
+  return ordered[max(0, min(rank, len(ordered) - 1))]
+
+
+def union_area(rects):
+  '''
+  Return area covered by a list of rects (having x, y, width, height.)
+  Sweeps vertical slabs between distinct x coords.
+  '''
+  xs = sorted(set([rect.x for rect in rects] + [rect.x + rect.width for rect in rects]))
+  area = 0
+  for left, right in zip(xs, xs[1:]):
+    # Vertical extents of rects spanning this slab, merged
+    spans = sorted([(rect.y, rect.y + rect.height) for rect in rects 
+      if rect.x <= left and rect.x + rect.width >= right])
+    covered = 0
+    top = bottom = None
+    for span_top, span_bottom in spans:
+      if bottom is None or span_top > bottom:
+        if bottom is not None:
+          covered += bottom - top
+        top, bottom = span_top, span_bottom
+      else:
+        bottom = max(bottom, span_bottom)
+    if bottom is not None:
+      covered += bottom - top
+    area += covered * (right - left)
+  return area
+
+
+class FrameRecord(object):
+  ''' Telemetry for one frame. '''
+  def __init__(self):
+    self.wall = 0.0   # seconds
+    self.visited = 0
+    self.drawn = 0
+    self.invalidated_area = 0
+    self.damaged_area = 0
+    self.exposed_area = 0
+    self.phases = dict.fromkeys(PHASES, 0.0)  # seconds
+    
+  def __str__(self):
+    return "%.1f mSec visited %d drawn %d invalidated %d damaged %d exposed %d " % (
+      self.wall*1000, self.visited, self.drawn, 
+      self.invalidated_area, self.damaged_area, self.exposed_area) \
+      + " ".join(["%s %.1f" % (phase, self.phases[phase]*1000) for phase in PHASES])
+
+
+class FrameTelemetry(object):
+  '''
+  Collects a FrameRecord per frame, and keeps a rolling window of them.
+  
+  Drawables count themselves by incrementing visited, and by note_inked() when they ink.
+  The counts are attributes here (not of the current record) so counting is cheap.
+  '''
+  def __init__(self):
+    self.window = collections.deque(maxlen=config.TELEMETRY_WINDOW)
+    self.frame_count = 0
+    self.visited = 0
+    self.drawn = 0
+    self.clip = None  # Bounds in DCS of the clip of the current frame, None if not in a frame
+    self._invalidated = []  # rects invalidated since previous frame
+    self._record = None
+    self._frame_start = None
+    self._phase_start = None
+    self._sources = {}  # name -> callable returning dict of counters
+    
+    
+  def note_invalidate(self, rect):
+    ''' A rect was invalidated, to be drawn in a coming frame. '''
+    self._invalidated.append(rect)
+    
+    
+  def note_inked(self, drawn_bounds):
+    '''
+    A drawable inked (after level of detail decided to), at drawn_bounds in DCS.
+    Count it as drawn if the ink is within the clip: cairo discards ink outside it.
+    '''
+    if self.clip is None or drawn_bounds.is_overlap(self.clip):
+      self.drawn += 1
+    
+    
+  def begin_frame(self, exposed_area=0, clip=None):
+    ''' A frame begins, exposing clip (Bounds in DCS, None if unknown.) '''
+    self._record = FrameRecord()
+    self._record.exposed_area = exposed_area
+    self.visited = 0
+    self.drawn = 0
+    self.clip = clip
+    self._frame_start = self._phase_start = time.time()
+    
+  def end_phase(self, phase):
+    ''' Charge time since previous phase ended (or frame began) to phase. '''
+    now = time.time()
+    self._record.phases[phase] += now - self._phase_start
+    self._phase_start = now
+    
+  def end_frame(self):
+    ''' Finish record of current frame, return it. '''
+    record = self._record
+    record.wall = time.time() - self._frame_start
+    record.visited = self.visited
+    record.drawn = self.drawn
+    record.invalidated_area = sum([rect.width * rect.height for rect in self._invalidated])
+    record.damaged_area = union_area(self._invalidated)
+    self._invalidated = []
+    self._record = None
+    self.clip = None
+    
+    self.window.append(record)
+    self.frame_count += 1
+    if config.TELEMETRY_LOG_INTERVAL and self.frame_count % config.TELEMETRY_LOG_INTERVAL == 0:
+      self.log_summary()
+    return record
+    
+    
+  def last(self):
+    ''' Return record of most recent frame, or None. '''
+    if self.window:
+      return self.window[-1]
+    return None
+    
+    
+  def register_source(self, name, func):
+    '''
+    Register a source of counters (e.g. cache hit rates) for summaries.
+    func() returns a dict of counter names to values.
+    '''
+    self._sources[name] = func
+    
+    
+  def summary(self):
+    '''
+    Return dict summarizing the rolling window of frames.
+    Times in mSec, as (p50, p95, p99) tuples.
+    '''
+    records = list(self.window)
+    def percentiles(values):
+      return tuple([percentile(values, fraction) for fraction in (0.5, 0.95, 0.99)])
+    result = {
+      "frames" : len(records),
+      "wall" : percentiles([record.wall * 1000 for record in records]),
+      "visited" : percentiles([record.visited for record in records]),
+      "drawn" : percentiles([record.drawn for record in records]),
+      "invalidated_area" : sum([record.invalidated_area for record in records]),
+      "damaged_area" : sum([record.damaged_area for record in records]),
+      "exposed_area" : sum([record.exposed_area for record in records]),
+      }
+    for phase in PHASES:
+      result[phase] = percentiles([record.phases[phase] * 1000 for record in records])
+    for name, func in self._sources.items():
+      result[name] = func()
+    return result
+    
+    
+  def log_summary(self):
+    ''' Log summary to the pensool logger. '''
+    summary = self.summary()
+    logging.getLogger('pensool').info("Frame telemetry " +
+      ", ".join(["%s %s" % (key, summary[key]) for key in sorted(summary.keys())]))
+    
+    
+# Singleton
+frames = FrameTelemetry()
@@ -0,0 +1,426 @@
+'''
+Tile rendering: draw the model in tiles, in parallel, by worker processes.
+
+A full draw of a dense document is bound by one core.
+A TileRenderer splits a rect of the device into tiles of TILE_SIZE pixels,
+drawn by TILE_RENDER_WORKERS processes (zero means one per core.)
+Python threads would not draw in parallel: drawing is mostly Python, under the interpreter lock.
+
+Each worker holds a copy of the model.
+The copy is updated incrementally: the renderer listens to history (see history.add_listener())
+for changes of the document, and before a render sends each worker
+only the subtrees that changed (pickled), each with its path of indexes from the model,
+and the order of top level members if it changed.
+A subtree is the drawable told as changed, e.g. one morph of a large imported group,
+unless an ancestor changed too, or its top level member is new: then that is sent.
+The viewing transform and styles are sent with each render: they are small.
+
+Workers draw into a frame buffer in shared memory (a RawArray),
+each tile at its place, so tiles are not copied between processes.
+The main process only composites the frame onto its context.
+
+A draw also leaves state on the model that the main process uses to pick and invalidate:
+retained transforms, drawn bounds, and local extents (see lod.py.)
+After a render the main process retains transforms itself (see Composite.retain()),
+and takes bounds and local extents from the worker that drew the first tile,
+as flat arrays, in pre-order of the tree (the same in both processes: see _walk().)
+Bounds of drawables are of the whole draw, not clipped to the tile, so any tile would do.
+
+Used by a ViewPort for full redraws that are slow (see ViewPort.draw_model_buffered()),
+and by FilePort for PNG exports.  Vector exports (SVG) are drawn in the main process.
+
+Workers are forked, so they start with the modules of the main process,
+but not a display: they draw only on image surfaces.
+The frame buffer is created before forking; if a larger one is needed, workers are restarted.
+If a worker fails or times out, workers are stopped and render() returns False,
+then and thereafter: the caller draws in the main process.
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import array
+import atexit
+import ctypes
+import cPickle as pickle
+import multiprocessing
+import multiprocessing.sharedctypes
+import Queue
+import time
+import traceback
+import cairo
+import config
+import history
+import lod
+import base.bounds as bounds
+
+import logging
+my_logger = logging.getLogger('pensool')
+
+BYTES_PER_PIXEL = 4 # ARGB32
+NO_EXTENTS = (float('nan'),) * 4  # local extents of a composite not drawn in full
+
+
+def tiles(rect, size):
+  '''
+  Return list of tiles (x, y, width, height) covering rect, relative to its origin.
+
+  >>> tiles((10, 10, 300, 100), 128)
+  [(0, 0, 128, 100), (128, 0, 128, 100), (256, 0, 44, 100)]
+  '''
+  x, y, width, height = rect
+  return [(tile_x, tile_y, min(size, width - tile_x), min(size, height - tile_y))
+    for tile_y in range(0, height, size) for tile_x in range(0, width, size)]
+
+
+def worker_count():
+  ''' Count of worker processes configured. '''
+  if config.TILE_RENDER_WORKERS:
+    return config.TILE_RENDER_WORKERS
+  try:
+    return multiprocessing.cpu_count()
+  except NotImplementedError:
+    return 1
+
+
+def enabled():
+  ''' Whether tile rendering is configured to use more than one process. '''
+  return worker_count() > 1
+
+
+def _surface_on(frame, offset, width, height, stride):
+  ''' Image surface on frame buffer from byte offset. '''
+  data = (ctypes.c_char * (len(frame) - offset)).from_buffer(frame, offset)
+  return cairo.ImageSurface.create_for_data(data, cairo.FORMAT_ARGB32, width, height, stride)
+
+
+def _sever(member):
+  ''' Pickle of a member of the model's tree, without its parent.  See edit.do_copy(). '''
+  parent = member.parent
+  member.parent = None
+  try:
+    return pickle.dumps(member, pickle.HIGHEST_PROTOCOL)
+  finally:
+    member.parent = parent
+
+
+def _walk(root):
+  ''' Generate root and the drawables of its tree, in pre-order. '''
+  yield root
+  stack = [iter(root)]
+  while stack:
+    for member in stack[-1]:
+      yield member
+      if isinstance(member, list):
+        stack.append(iter(member))
+        break
+    else:
+      stack.pop()
+
+
+def _drawn_state(root):
+  '''
+  Drawn state of the tree of root, as left by a draw:
+  arrays of bounds (x, y, width, height) of every drawable and local extents of every composite.
+  '''
+  drawn_bounds = array.array('i')
+  local_extents = array.array('d')
+  for drawable in _walk(root):
+    drawn = drawable.bounds
+    drawn_bounds.extend((drawn.x, drawn.y, drawn.width, drawn.height))
+    if isinstance(drawable, list):
+      local_extents.extend(drawable.local_extents or NO_EXTENTS)
+  return drawn_bounds, local_extents
+
+
+def _put_drawn_state(root, state, offset_x, offset_y):
+  ''' Set drawn state of the tree of root from _drawn_state() of a copy drawn offset on the device. '''
+  drawn_bounds, local_extents = state
+  bounds_index = 0
+  extents_index = 0
+  for drawable in _walk(root):
+    # Raises ValueError if root has more drawables than the copy
+    x, y, width, height = drawn_bounds[bounds_index:bounds_index + 4]
+    bounds_index += 4
+    drawable.bounds = bounds.Bounds(x + offset_x, y + offset_y, width, height)
+    if isinstance(drawable, list):
+      extents = tuple(local_extents[extents_index:extents_index + 4])
+      extents_index += 4
+      drawable.local_extents = None if extents[0] != extents[0] else extents  # NaN
+  if bounds_index != len(drawn_bounds):
+    raise ValueError("Copy has more drawables")
+
+
+def _path(drawable, root):
+  ''' Indexes from root to drawable, or None if drawable is not in the tree of root. '''
+  path = []
+  while drawable is not root:
+    parent = drawable.parent
+    if parent is None:
+      return None
+    try:
+      path.append(history.index_of(parent, drawable))
+    except ValueError:  # Removed, still refers to its parent
+      return None
+    drawable = parent
+  path.reverse()
+  return path
+
+
+class TileRenderer(object):
+  '''
+  Renders a model by a pool of worker processes.
+  '''
+  def __init__(self, model):
+    self.model = model
+    self.workers = []   # list of (process, inbound queue)
+    self.results = None # queue of (tile index, error or None) from workers
+    self.frame = None   # shared frame buffer
+    self.job = 0        # serial of render, to ignore stale results
+    self.sent = {}      # id -> top level member whose copy workers hold
+    self.dirty = {}     # id -> drawable of the model changed since sent
+    self.order_dirty = True # top level members inserted, removed or reordered
+    self.failed = False
+    self.draw_time = 0  # mSec of workers drawing the last render, summed over tiles
+    history.add_listener(self._changed)
+    atexit.register(self.stop)
+
+
+  def _changed(self, drawable):
+    ''' History listener.  Note drawable, if in my model, as dirty. '''
+    if drawable is self.model:
+      self.order_dirty = True # Splice of the model itself
+      return
+    self.dirty[id(drawable)] = drawable
+
+
+  def render(self, context, rect, lod_enabled, style=None):
+    '''
+    Draw model within rect (x, y, width, height in device coords) onto context,
+    whose transform is the identity.
+    Style, if any, is put before drawing the model, as a port puts its own.
+    Return False if not rendered: caller should draw in this process.
+    Afterwards the model holds the drawn state of the render, as if drawn on context.
+    '''
+    if self.failed:
+      return False
+    x, y, width, height = rect
+    if width <= 0 or height <= 0:
+      return True
+    stride = width * BYTES_PER_PIXEL
+    size = stride * (height + 1)  # A spare row: a tile's surface spans whole rows of the frame
+    try:
+      if self.frame is None or len(self.frame) < size:
+        self.start(size)
+      self._sync()
+      drawn_state = self._render(rect, stride, lod_enabled, style)
+    except (OSError, IOError, RuntimeError) as detail:
+      my_logger.warning("Tile rendering failed, drawing in one process: %s", detail)
+      self.stop()
+      self.failed = True
+      return False
+    self.model.retain(self.model.transform * context.get_matrix())
+    try:
+      _put_drawn_state(self.model, drawn_state, x, y)
+    except ValueError:
+      # Copies differ from the model: resend it all, and draw in this process
+      my_logger.warning("Tile renderers' model is stale")
+      self.sent = {}
+      self.order_dirty = True
+      return False
+    context.save()
+    context.rectangle(x, y, width, height)
+    context.clip()
+    context.set_source_surface(_surface_on(self.frame, 0, width, height, stride), x, y)
+    context.paint()
+    context.restore()
+    return True
+
+
+  def _render(self, rect, stride, lod_enabled, style):
+    ''' Have workers draw all tiles of rect.  Return drawn state of the first tile's copy. '''
+    self.job += 1
+    spec = (self.job, rect, stride, lod_enabled, pickle.dumps(
+      (self.model.translation, self.model.scale, self.model.rotation, self.model.style, style),
+      pickle.HIGHEST_PROTOCOL))
+    all_tiles = tiles(rect, config.TILE_SIZE)
+    for index, tile in enumerate(all_tiles):
+      self.workers[index % len(self.workers)][1].put(("tile", spec, index, tile))
+    self.draw_time = 0
+    drawn_state = None
+    for count in range(len(all_tiles)):
+      while True:
+        try:
+          job, index, error, seconds, state = self.results.get(timeout=config.TILE_RENDER_TIMEOUT)
+        except Queue.Empty:
+          raise RuntimeError("worker timed out")
+        if job == self.job:
+          break
+      if error is not None:
+        raise RuntimeError("worker failed: " + error)
+      self.draw_time += seconds * 1000
+      if state is not None:
+        drawn_state = state
+    return drawn_state
+
+
+  def _sync(self):
+    '''
+    Send workers the top level members new or reordered since last sent,
+    and the subtrees changed, with their paths.
+    '''
+    if not self.dirty and not self.order_dirty:
+      return
+    payloads = {}
+    for member in self.model:
+      if self.sent.get(id(member)) is not member:
+        payloads[id(member)] = _sever(member)
+    order = None
+    if self.order_dirty or payloads:
+      order = [id(member) for member in self.model]
+    updates = []
+    for drawable in self.dirty.values():
+      path = _path(drawable, self.model)
+      if path is None or id(self.model[path[0]]) in payloads:
+        continue  # Not in the model, or sent whole
+      if self._has_dirty_ancestor(drawable):
+        continue  # Sent with its ancestor
+      updates.append((path, _sever(drawable)))
+    for process, inbound in self.workers:
+      inbound.put(("model", order, payloads, updates))
+    self.sent = dict([(id(member), member) for member in self.model])
+    self.dirty = {}
+    self.order_dirty = False
+
+
+  def _has_dirty_ancestor(self, drawable):
+    parent = drawable.parent
+    while parent is not self.model:
+      if self.dirty.get(id(parent)) is parent:
+        return True
+      parent = parent.parent
+    return False
+
+
+  def start(self, size):
+    ''' (Re)start workers on a new frame buffer of size bytes. '''
+    self.stop()
+    self.frame = multiprocessing.sharedctypes.RawArray(ctypes.c_char, size)
+    self.results = multiprocessing.Queue()
+    for count in range(worker_count()):
+      inbound = multiprocessing.Queue()
+      process = multiprocessing.Process(target=_work, args=(self.frame, inbound, self.results),
+        name="pensool tile renderer")
+      process.daemon = True
+      process.start()
+      self.workers.append((process, inbound))
+    # New workers have no copy of the model
+    self.sent = {}
+    self.order_dirty = True
+    my_logger.debug("Started %d tile renderers", len(self.workers))
+
+
+  def stop(self):
+    ''' Stop workers. '''
+    for process, inbound in self.workers:
+      inbound.put(None)
+    for process, inbound in self.workers:
+      process.join(1)
+      if process.is_alive():
+        process.terminate()
+    self.workers = []
+    self.frame = None
+
+
+def _work(frame, inbound, results):
+  ''' Worker process: apply model updates, draw tiles, until None. '''
+  import morph.morph
+  import port
+  root = morph.morph.Morph()
+  # The model as of the fork is stale: pen widths and sprite keys scale with the model drawn
+  # (see style.viewing_matrix(), sprite.draw())
+  config.scheme.model = root
+  members = {}  # id in main process -> member
+  model_error = None  # failure to update the model copy, reported for every tile
+  while True:
+    message = inbound.get()
+    if message is None:
+      return
+    if message[0] == "model":
+      order, payloads, updates = message[1:]
+      try:
+        for key, payload in payloads.items():
+          members[key] = pickle.loads(payload)
+        if order is not None:
+          for key in set(members) - set(order):
+            del members[key]
+          del root[:]
+          for key in order:
+            root.append(members[key])
+        for path, payload in updates:
+          _replace(root, path, pickle.loads(payload))
+      except Exception:
+        model_error = traceback.format_exc()
+      continue
+    spec, index, tile = message[1:]
+    job, rect, stride, lod_enabled, view = spec
+    error = model_error
+    start = time.time()
+    state = None
+    if error is None:
+      try:
+        _draw_tile(frame, root, rect, tile, stride, lod_enabled, pickle.loads(view), port)
+        if index == 0:
+          state = _drawn_state(root)
+      except Exception:
+        error = traceback.format_exc()
+    results.put((job, index, error, time.time() - start, state))
+
+
+def _replace(root, path, drawable):
+  ''' Replace the drawable at path from root, in a worker's copy. '''
+  group = root
+  for index in path[:-1]:
+    group = group[index]
+  list.__setitem__(group, path[-1], drawable)
+  drawable.parent = group
+  group.members_changed()
+
+
+def _draw_tile(frame, root, rect, tile, stride, lod_enabled, view, port):
+  ''' Draw root into tile of frame. '''
+  translation, scale, rotation, root.style, view_style = view
+  root.set_transform(translation, scale, rotation)
+  tile_x, tile_y, width, height = tile
+  surface = _surface_on(frame, tile_y * stride + tile_x * BYTES_PER_PIXEL, width, height, stride)
+  context = port.context_for_surface(surface)
+  context.set_operator(cairo.OPERATOR_CLEAR)
+  context.paint()
+  context.set_operator(cairo.OPERATOR_OVER)
+  # Device coords of the tile's origin
+  context.translate(-(rect[0] + tile_x), -(rect[1] + tile_y))
+  if view_style is not None:
+    view_style.put_to(context)
+  lod.enabled = lod_enabled
+  try:
+    root.draw(context)
+  finally:
+    lod.enabled = False
+  surface.flush()
+
+
+_renderer = None
+
+def renderer():
+  ''' Singleton renderer of the model, created on first use. '''
+  global _renderer
+  if _renderer is None:
+    _renderer = TileRenderer(config.scheme.model)
+  return _renderer
@@ -265,6 +265,10 @@ class Transformer(drawable.Drawable):
     self.transform.scale(delta, delta)
     self.transform.translate(-user_coords.x, -user_coords.y)
     """
+    self.rescale(delta)
+    
+  def rescale(self, delta):
+    ''' Scale by delta.  Not view altering: caller invalidates. '''
     self.scale *= delta
     logging.getLogger('pensool').debug("Zoomed scale " + str(self.scale))
     self.derive_transform()
@@ -0,0 +1,154 @@
+'''
+Watchdog: detect stalls of the main loop, and log where the main thread was.
+
+Everything runs on the GTK main loop, so a slow callback (a pick, an expose, a save)
+freezes the UI.  The watchdog finds such stalls in the field, without reproducing them.
+
+A heartbeat timer on the main loop notes the time every WATCHDOG_HEARTBEAT milliseconds.
+A watchdog thread checks the heartbeat.  When the main loop has not beat for WATCHDOG_THRESHOLD
+milliseconds, the thread logs a warning to the pensool logger with:
+  when the stall began and how long so far
+  the event being dispatched (if any) and when its dispatch began
+  the Python stack of the main thread
+When the main loop beats again, the duration of the stall is logged.
+One stack is logged per stall.
+
+Event context is noted by a gdk event handler that wraps dispatch of every event.
+
+Started after the first frame (see startup.py), since startup has its own budget.
+WATCHDOG_THRESHOLD of zero disables the watchdog.
+
+To test:
+python -m doctest -v watchdog.py
+
+Examples:
+
+  # No report while the main loop beats
+  >>> import watchdog
+  >>> watchdog.main_thread_id = thread.get_ident()
+  >>> watchdog.last_beat = 100.0
+  >>> check(100.2, 0.5) is None
+  True
+
+  # A stall is reported once, with the main thread's stack
+  >>> report = check(101.0, 0.5)
+  >>> "stalled 1000 ms" in report, "no event" in report, "check(101.0, 0.5)" in report
+  (True, True, True)
+  >>> check(102.0, 0.5) is None
+  True
+
+  # Event context
+  >>> watchdog.stalled = None
+  >>> watchdog.current_event = ("button-press", 100.5)
+  >>> "in button-press event dispatched at" in check(101.0, 0.5)
+  True
+'''
+'''
+Copyright 2010, 2011 Lloyd Konneker
+
+This file is part of Pensool.
+
+Pensool is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+'''
+
+import sys
+import thread
+import threading
+import time
+import traceback
+import config
+
+import logging
+my_logger = logging.getLogger('pensool')
+
+last_beat = None      # time of last heartbeat of the main loop
+stalled = None        # time the current stall began, None if not stalled
+current_event = None  # (event type, time its dispatch began) while an event is dispatched
+main_thread_id = None
+_heartbeat = None
+_thread = None
+
+
+def start():
+  '''
+  Start the heartbeat on the main loop, the event handler, and the watchdog thread.
+  Call on the main thread.
+  gobject.threads_init() must have been called before gtk.main() was entered (see pensool.py):
+  else the main loop holds the interpreter lock while waiting, and the thread never runs.
+  '''
+  global main_thread_id, last_beat, _heartbeat, _thread
+  if not config.WATCHDOG_THRESHOLD or _thread is not None:
+    return
+  import gtk
+  import base.timer as timer
+  main_thread_id = thread.get_ident()
+  last_beat = time.time()
+  _heartbeat = timer.Timer()
+  _heartbeat.start(config.WATCHDOG_HEARTBEAT, _beat_cb)
+  gtk.gdk.event_handler_set(_event_handler)
+  _thread = threading.Thread(target=_watch, name="pensool watchdog")
+  _thread.daemon = True
+  _thread.start()
+
+
+def _beat_cb():
+  ''' Heartbeat timer callback, on the main loop. '''
+  global last_beat, stalled
+  last_beat = time.time()
+  if stalled is not None:
+    my_logger.warning("Main loop resumed after stall of %.0f ms", (last_beat - stalled) * 1000)
+    stalled = None
+  return True
+
+
+def _event_handler(event):
+  ''' Dispatch event as gtk would, noting it as context of any stall. '''
+  global current_event
+  import gtk
+  current_event = (event.type.value_nick, time.time())
+  try:
+    gtk.main_do_event(event)
+  finally:
+    current_event = None
+
+
+def _watch():
+  ''' Watchdog thread. '''
+  threshold = config.WATCHDOG_THRESHOLD / 1000.0
+  interval = config.WATCHDOG_HEARTBEAT / 1000.0
+  while True:
+    time.sleep(interval)
+    report = check(time.time(), threshold)
+    if report is not None:
+      my_logger.warning(report)
+
+
+def check(now, threshold):
+  '''
+  Return report of a new stall: no heartbeat for threshold seconds before now.
+  Else None.
+  '''
+  global stalled
+  if stalled is not None or last_beat is None or now - last_beat < threshold:
+    return None
+  stalled = last_beat
+  event = current_event  # Read once, the main thread may change it
+  if event is None:
+    context = "no event"
+  else:
+    context = "in %s event dispatched at %s" % (event[0], _timestamp(event[1]))
+  frame = sys._current_frames().get(main_thread_id)
+  if frame is None:
+    stack = "  (main thread not found)\n"
+  else:
+    stack = "".join(traceback.format_stack(frame))
+  return "Main loop stalled %.0f ms since %s, %s.  Main thread stack:\n%s" % (
+    (now - last_beat) * 1000, _timestamp(last_beat), context, stack)
+
+
+def _timestamp(seconds):
+  ''' Wall clock time with milliseconds. '''
+  return time.strftime("%H:%M:%S", time.localtime(seconds)) + ".%03d" % (seconds % 1 * 1000)